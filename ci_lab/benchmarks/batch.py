@@ -0,0 +1,52 @@
+"""
+Batch Endpoint Benchmark
+
+Sends the same number of increments through the Flask test client one
+PUT /counters/<name> request at a time, then through POST /counters/batch
+with growing batch sizes, and prints the increments per second of each.
+Run it from the ci_lab directory:
+
+    python -m benchmarks.batch --ops 20000 --sizes 10 100 1000
+"""
+import argparse
+import time
+from src.counter import app, COUNTERS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counter batch endpoint benchmark")
+    parser.add_argument("--ops", type=int, default=20000, help="increments per run")
+    parser.add_argument("--counters", type=int, default=100)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args(argv)
+
+    client = app.test_client()
+    names = [f"counter_{i}" for i in range(args.counters)]
+
+    def prepare():
+        COUNTERS.clear()
+        for name in names:
+            COUNTERS.create(name)
+
+    prepare()
+    started = time.perf_counter()
+    for i in range(args.ops):
+        client.put(f"/counters/{names[i % len(names)]}")
+    single = args.ops / (time.perf_counter() - started)
+    print(f"{'requests':<16} {single:>12,.0f} increments/s")
+
+    for size in args.sizes:
+        prepare()
+        started = time.perf_counter()
+        for first in range(0, args.ops, size):
+            batch = [{"op": "increment", "name": names[i % len(names)]}
+                     for i in range(first, min(first + size, args.ops))]
+            client.post("/counters/batch", json=batch)
+        rate = args.ops / (time.perf_counter() - started)
+        assert COUNTERS.total() == args.ops
+        print(f"{'batch of ' + str(size):<16} {rate:>12,.0f} increments/s {rate / single:>6.1f}x")
+    COUNTERS.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Contention Benchmark for the Counter Store
+
+Runs the same increment workload from 1, 2, 4, ... threads against:
+- a plain dict with COUNTERS[name] += 1, the original unsynchronized code
+- a CounterStore with a single shard, i.e. one global lock
+- a CounterStore with lock-striped shards
+
+and prints the increments per second of each, plus the increments the plain
+dict lost. Run it from the ci_lab directory:
+
+    python -m benchmarks.contention --threads 1 2 4 8 --ops 200000
+"""
+import argparse
+import threading
+import time
+from src.counter_store import CounterStore, DEFAULT_SHARDS
+
+
+class PlainDict:
+    """The unsynchronized dict the routes used before the counter store"""
+
+    def __init__(self):
+        self.counters = {}
+
+    def create(self, name):
+        self.counters[name] = 0
+
+    def increment(self, name):
+        self.counters[name] += 1
+
+    def snapshot(self):
+        return dict(self.counters)
+
+
+def run(store, threads, ops, names):
+    """Increment `names` round robin `ops` times in total, return (seconds, lost increments)"""
+    for name in names:
+        store.create(name)
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(per_thread):
+            store.increment(names[(offset + i) % len(names)])
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - started
+    lost = per_thread * threads - sum(store.snapshot().values())
+    return seconds, lost
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counter store contention benchmark")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=200000, help="increments per run")
+    parser.add_argument("--counters", type=int, default=64)
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    args = parser.parse_args(argv)
+
+    names = [f"counter_{i}" for i in range(args.counters)]
+    stores = [
+        ("plain dict", PlainDict),
+        ("global lock", lambda: CounterStore(shards=1)),
+        (f"{args.shards} shards", lambda: CounterStore(shards=args.shards)),
+    ]
+    print(f"{'store':<14} {'threads':>7} {'ops/s':>12} {'lost':>8}")
+    for label, make_store in stores:
+        for threads in args.threads:
+            seconds, lost = run(make_store(), threads, args.ops, names)
+            ops = args.ops // threads * threads
+            print(f"{label:<14} {threads:>7} {ops / seconds:>12,.0f} {lost:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Persistence Benchmark for the Counter Store
+
+Times the same increment workload with persistence off and with each
+durability mode of CounterLog, then times recovering the store from the
+resulting snapshot and log. Run it from the ci_lab directory:
+
+    python -m benchmarks.persistence --ops 100000 --threads 1 8
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from src.counter_log import CounterLog, DURABILITY_MODES
+from src.counter_store import CounterStore
+
+
+def run(store, threads, ops, names):
+    """Increment `names` round robin `ops` times in total from `threads` threads, return seconds"""
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for i in range(per_thread):
+            store.increment(names[(offset + i) % len(names)])
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counter persistence benchmark")
+    parser.add_argument("--ops", type=int, default=100000, help="increments per run")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--counters", type=int, default=1000)
+    parser.add_argument("--modes", nargs="+", choices=("none",) + DURABILITY_MODES,
+                        default=["none", "off", "interval", "group"])
+    args = parser.parse_args(argv)
+
+    names = [f"counter_{i}" for i in range(args.counters)]
+    print(f"{'persistence':<12} {'threads':>7} {'ops/s':>12} {'recovery':>10}")
+    for mode in args.modes:
+        for threads in args.threads:
+            directory = tempfile.mkdtemp(prefix="counter_log_")
+            try:
+                log = None if mode == "none" else CounterLog(directory, durability=mode)
+                store = CounterStore(log=log)
+                for name in names:
+                    store.create(name)
+                seconds = run(store, threads, args.ops, names)
+                recovery = ""
+                if log is not None:
+                    log.close()
+                    started = time.perf_counter()
+                    recovered = CounterStore(log=CounterLog(directory, durability="off"))
+                    recovery = f"{(time.perf_counter() - started) * 1000:.0f}ms"
+                    assert recovered.total() == args.ops // threads * threads
+                    recovered._log.close()
+                ops = args.ops // threads * threads
+                print(f"{mode:<12} {threads:>7} {ops / seconds:>12,.0f} {recovery:>10}")
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
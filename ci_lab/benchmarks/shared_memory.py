@@ -0,0 +1,81 @@
+"""
+Multi-Process Benchmark for the Shared-Memory Counter Store
+
+Runs the same increment workload from 1, 2, 4, ... worker processes, the way
+Gunicorn workers would serve it, against one SharedCounterStore, and prints
+the increments per second, the speedup over one process and the increments
+lost (always 0: every worker sees and updates the same counters).
+
+Throughput can only grow with the processes while there are CPU cores for
+them, compare with os.cpu_count() printed first. Run it from the ci_lab
+directory:
+
+    python -m benchmarks.shared_memory --processes 1 2 4 8 --ops 400000
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from src.shared_counter_store import DEFAULT_SEGMENTS, DEFAULT_SLOTS, SharedCounterStore
+
+
+def worker(name, lock_path, names, ops, offset, barrier):
+    """Attach to the table and increment `names` round robin `ops` times"""
+    store = SharedCounterStore(name, lock_path=lock_path)
+    barrier.wait()
+    for i in range(ops):
+        store.increment(names[(offset + i) % len(names)])
+    store.close()
+
+
+def run(processes, ops, names, segments, slots):
+    """Increment `names` `ops` times in total from `processes` processes, return (seconds, lost increments)"""
+    name = f"bench_counters_{os.getpid()}"
+    lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+    store = SharedCounterStore(name, segments=segments, slots=slots, lock_path=lock_path)
+    try:
+        for counter in names:
+            store.create(counter)
+        per_process = ops // processes
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(processes + 1)
+        workers = [context.Process(target=worker,
+                                   args=(name, lock_path, names, per_process, p, barrier))
+                   for p in range(processes)]
+        for process in workers:
+            process.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for process in workers:
+            process.join()
+        seconds = time.perf_counter() - started
+        lost = per_process * processes - store.total()
+    finally:
+        store.unlink()
+        store.close()
+    return seconds, lost
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared-memory counter store multi-process benchmark")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=400000, help="increments per run")
+    parser.add_argument("--counters", type=int, default=1024)
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS)
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS)
+    args = parser.parse_args(argv)
+
+    names = [f"counter_{i}" for i in range(args.counters)]
+    print(f"{os.cpu_count()} CPU cores")
+    print(f"{'processes':>9} {'ops/s':>12} {'speedup':>8} {'lost':>8}")
+    baseline = None
+    for processes in args.processes:
+        seconds, lost = run(processes, args.ops, names, args.segments, args.slots)
+        rate = args.ops // processes * processes / seconds
+        baseline = baseline or rate
+        print(f"{processes:>9} {rate:>12,.0f} {rate / baseline:>7.2f}x {lost:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Top-N Benchmark for the Counter Store
+
+Compares CounterStore.top(n), which merges the heads of the per-shard value
+indexes, with the full sorted() over every counter the /counters/top/<n>
+route used to run. Run it from the ci_lab directory:
+
+    python -m benchmarks.top_n --sizes 10000 100000 1000000 --n 5
+"""
+import argparse
+import random
+import time
+from src.counter_store import CounterStore
+
+
+def timed(function, repeat):
+    """Best time of `repeat` calls, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counter store top-N benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--n", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    print(f"{'counters':>10} {'full sort':>12} {'index':>12} {'speedup':>9}")
+    for size in args.sizes:
+        store = CounterStore()
+        for i in range(size):
+            store.create(f"counter_{i}", rng.randrange(1000000))
+        counters = store.snapshot()
+
+        def full_sort():
+            return sorted(counters.items(), key=lambda item: item[1], reverse=True)[:args.n]
+
+        sort_time = timed(full_sort, args.repeat)
+        index_time = timed(lambda: store.top(args.n), args.repeat)
+        print(f"{size:>10} {sort_time * 1000:>10.2f}ms {index_time * 1000:>10.3f}ms "
+              f"{sort_time / index_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,63 @@ Counter API Implementation
 """
 from flask import Flask, jsonify, request
 from http import HTTPStatus
+import atexit
+import base64
+import json
+import os
 import re
+from src.counter_log import CounterLog
+from src.counter_store import CounterStore
+from src.shared_counter_store import (
+    DEFAULT_SEGMENTS, DEFAULT_SLOTS, SharedCounterStore, StoreFull)
 
 app = Flask(__name__)
 
-# Dictionary to store counters
-COUNTERS = {}
+def open_counter_log():
+    """
+    Persistence is on when COUNTER_DATA_DIR names a directory for the log and
+    snapshots, COUNTER_DURABILITY picks the fsync mode (see counter_log.py)
+    """
+    directory = os.environ.get("COUNTER_DATA_DIR")
+    if not directory:
+        return None
+    log = CounterLog(directory, durability=os.environ.get("COUNTER_DURABILITY", "interval"))
+    atexit.register(log.close)
+    return log
+
+def open_counter_store():
+    """
+    COUNTER_BACKEND=shared keeps the counters in shared memory named
+    COUNTER_SHM_NAME, one view for every worker process of a multi-process
+    server such as Gunicorn (see shared_counter_store.py); COUNTER_SHM_SEGMENTS
+    and COUNTER_SHM_SLOTS size the table when the first worker creates it.
+    Otherwise the counters live in this process (see counter_store.py).
+    """
+    backend = os.environ.get("COUNTER_BACKEND", "memory")
+    if backend == "memory":
+        return CounterStore(log=open_counter_log())
+    if backend != "shared":
+        raise ValueError("COUNTER_BACKEND must be memory or shared")
+    if os.environ.get("COUNTER_DATA_DIR"):
+        # every worker would replay and append to the same log
+        raise ValueError("COUNTER_DATA_DIR persistence needs COUNTER_BACKEND=memory")
+    store = SharedCounterStore(
+        os.environ.get("COUNTER_SHM_NAME", "ci_lab_counters"),
+        segments=int(os.environ.get("COUNTER_SHM_SEGMENTS", DEFAULT_SEGMENTS)),
+        slots=int(os.environ.get("COUNTER_SHM_SLOTS", DEFAULT_SLOTS)))
+    atexit.register(store.close)
+    return store
+
+# Thread-safe store holding the counters
+COUNTERS = open_counter_store()
+
+# Page size limits of /counters/range
+DEFAULT_RANGE_LIMIT = 100
+MAX_RANGE_LIMIT = 1000
+
+# Most operations accepted by one /counters/batch request
+MAX_BATCH_OPERATIONS = 10000
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
 
 def is_valid_counter_name(name):
     """Validate counter name to ensure it contains only alphanumeric characters"""
@@ -19,38 +70,48 @@ def create_counter(name):
     """Create a new counter"""
     if not is_valid_counter_name(name):
         return jsonify({"error": "Invalid counter name. Only alphanumeric and underscores allowed."}), HTTPStatus.BAD_REQUEST
-    if name in COUNTERS:
+    try:
+        created = COUNTERS.create(name)
+    except StoreFull as error:
+        return jsonify({"error": str(error)}), HTTPStatus.INSUFFICIENT_STORAGE
+    except ValueError as error:
+        # a name longer than a shared memory slot holds
+        return jsonify({"error": str(error)}), HTTPStatus.BAD_REQUEST
+    if not created:
         return jsonify({"error": f"Counter '{name}' already exists"}), HTTPStatus.CONFLICT
-    COUNTERS[name] = 0
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.CREATED
+    return jsonify({name: 0}), HTTPStatus.CREATED
 
 @app.route('/counters/<name>', methods=['GET'])
 def get_counter(name):
     """Retrieve an existing counter"""
-    if name not in COUNTERS:
+    value = COUNTERS.get(name)
+    if value is None:
         return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    return jsonify({name: value}), HTTPStatus.OK
 
 @app.route('/counters/<name>', methods=['PUT'])
 def increment_counter(name):
     """Increment an existing counter"""
-    if name not in COUNTERS:
+    try:
+        value = COUNTERS.increment(name)
+    except ValueError as error:
+        # past the 64-bit range of a shared memory slot
+        return jsonify({"error": str(error)}), HTTPStatus.BAD_REQUEST
+    if value is None:
         return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    COUNTERS[name] += 1
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    return jsonify({name: value}), HTTPStatus.OK
 
 @app.route('/counters/<name>', methods=['DELETE'])
 def delete_counter(name):
     """Delete an existing counter"""
-    if name not in COUNTERS:
+    if not COUNTERS.delete(name):
         return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    del COUNTERS[name]
     return jsonify({"message": f"Counter '{name}' deleted"}), HTTPStatus.NO_CONTENT
 
 @app.route('/counters', methods=['GET'])
 def list_counters():
     """List all counters"""
-    return jsonify(COUNTERS), HTTPStatus.OK
+    return jsonify(COUNTERS.snapshot()), HTTPStatus.OK
 
 @app.route('/counters/reset', methods=['POST'])
 def reset_counters():
@@ -61,33 +122,36 @@ def reset_counters():
 @app.route('/counters/total', methods=['GET'])
 def get_total_counters():
     """Retrieve the sum of all counter values"""
-    total = sum(COUNTERS.values())
+    total = COUNTERS.total()
     return jsonify({"total": total}), HTTPStatus.OK
 
+@app.route('/counters/stats', methods=['GET'])
+def get_counter_stats():
+    """Retrieve the count, total, min, max and value histogram of all counters"""
+    stats = COUNTERS.stats()
+    # JSON object keys are strings, the buckets are listed in value order
+    stats["histogram"] = [{"from": bucket, "counters": counters}
+                          for bucket, counters in stats["histogram"].items()]
+    return jsonify(stats), HTTPStatus.OK
+
 @app.route('/counters/top/<int:n>', methods=['GET'])
 def get_top_n_counters(n):
     """Retrieve the top N highest counters"""
-    if not COUNTERS:
+    # Read the N highest entries from the store's value index
+    top_n = COUNTERS.top(n)
+    if not top_n and not len(COUNTERS):
         return jsonify({"error": "No counters available"}), HTTPStatus.NOT_FOUND
 
-    # Sort by value in descending order
-    sorted_items = sorted(COUNTERS.items(), key=lambda item: item[1], reverse=True)
-
-    # Get top N items
-    top_n = dict(sorted_items[:n])
-
-    return jsonify(top_n), HTTPStatus.OK
+    return jsonify(dict(top_n)), HTTPStatus.OK
 
 @app.route('/counters/bottom/<int:n>', methods=['GET'])
 def get_bottom_n_counters(n):
     """Retrieve the bottom N lowest counters"""
-    if not COUNTERS:
+    # Read the N lowest entries from the store's value index
+    bottom_n = COUNTERS.bottom(n)
+    if not bottom_n and not len(COUNTERS):
         return jsonify({"error": "No counters available"}), HTTPStatus.NOT_FOUND
-    # Sort by value in ascending order (to get the lowest)
-    sorted_items = sorted(COUNTERS.items(), key=lambda item: item[1])
-    # Get bottom N items
-    bottom_n = dict(sorted_items[:n])
-    return jsonify(bottom_n), HTTPStatus.OK
+    return jsonify(dict(bottom_n)), HTTPStatus.OK
 
 @app.route('/counters/<name>/set/<value>', methods=['PUT'])
 def set_counter_value(name, value):
@@ -100,16 +164,22 @@ def set_counter_value(name, value):
         return jsonify({"error": "Invalid counter value"}), HTTPStatus.BAD_REQUEST
     if value < 0:
         return jsonify({"error": "Counter value cannot be negative"}), HTTPStatus.BAD_REQUEST
-    COUNTERS[name] = value
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    # the counter may have been deleted since the check above
+    try:
+        result = COUNTERS.set(name, value)
+    except ValueError as error:
+        # past the 64-bit range of a shared memory slot
+        return jsonify({"error": str(error)}), HTTPStatus.BAD_REQUEST
+    if result is None:
+        return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
+    return jsonify({name: value}), HTTPStatus.OK
 
 @app.route('/counters/<name>/reset', methods=['POST'])
 def reset_single_counter(name):
     """Reset a single counter to zero"""
-    if name not in COUNTERS:
+    if COUNTERS.reset(name) is None:
         return jsonify({"error": f"Counter '{name}' not found"}), HTTPStatus.NOT_FOUND
-    COUNTERS[name] = 0
-    return jsonify({name: COUNTERS[name]}), HTTPStatus.OK
+    return jsonify({name: 0}), HTTPStatus.OK
 
 @app.route('/counters/count', methods=['GET'])
 def get_total_number_of_counters():
@@ -120,12 +190,133 @@ def get_total_number_of_counters():
 @app.route('/counters/greater/<int:threshold>', methods=['GET'])
 def get_counters_greater_than(threshold):
     """Retrieve counters greater than a given threshold"""
-    filtered_counters = {key: val for key, val in COUNTERS.items() if val > threshold}
+    filtered_counters = dict(COUNTERS.range(min_value=threshold + 1))
     return jsonify(filtered_counters), HTTPStatus.OK
 
 @app.route('/counters/less/<int:threshold>', methods=['GET'])
 def get_counters_less_than_threshold(threshold):
     """Get all counters with values less than the given threshold"""
-    filtered_counters = {k: v for k, v in COUNTERS.items() if v < threshold}  # Only keep valid ones
+    filtered_counters = dict(COUNTERS.range(max_value=threshold - 1))  # Only keep valid ones
     return jsonify(filtered_counters), HTTPStatus.OK
 
+def int_arg(name, default=None):
+    """Integer query parameter, raises ValueError if it is given but not an integer"""
+    if name not in request.args:
+        return default
+    try:
+        return int(request.args[name])
+    except ValueError as error:
+        raise ValueError(f"{name} must be an integer") from error
+
+def encode_cursor(value, name):
+    """Opaque cursor pointing just after the (value, name) position"""
+    return base64.urlsafe_b64encode(json.dumps([value, name]).encode()).decode()
+
+def decode_cursor(cursor):
+    """Return the (value, name) position of a cursor, raises ValueError if it is invalid"""
+    try:
+        value, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as error:
+        raise ValueError("Invalid cursor") from error
+    if not isinstance(value, int) or not isinstance(name, str):
+        raise ValueError("Invalid cursor")
+    return value, name
+
+@app.route('/counters/range', methods=['GET'])
+def get_counters_in_range():
+    """Retrieve a page of counters with min <= value <= max, ordered by value then name"""
+    try:
+        min_value = int_arg('min')
+        max_value = int_arg('max')
+        limit = int_arg('limit', DEFAULT_RANGE_LIMIT)
+        if not 1 <= limit <= MAX_RANGE_LIMIT:
+            raise ValueError(f"limit must be from 1 to {MAX_RANGE_LIMIT}")
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as error:
+        return jsonify({"error": str(error)}), HTTPStatus.BAD_REQUEST
+
+    # one extra entry tells whether another page follows
+    page = COUNTERS.range(min_value, max_value, limit + 1, after)
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        name, value = page[-1]
+        next_cursor = encode_cursor(value, name)
+    return jsonify({
+        "counters": [{"name": name, "value": value} for name, value in page],
+        "next_cursor": next_cursor,
+    }), HTTPStatus.OK
+
+def parse_batch_operation(item):
+    """
+    Turn one batch item into an (operation, name, argument) tuple for the
+    store, raises ValueError with the reason if it is invalid
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each operation must be a JSON object")
+    operation, name = item.get("op"), item.get("name")
+    if operation not in ("create", "increment", "set", "delete"):
+        raise ValueError("op must be one of create, increment, set, delete")
+    if not isinstance(name, str) or not is_valid_counter_name(name):
+        raise ValueError("Invalid counter name. Only alphanumeric and underscores allowed.")
+    if operation == "increment":
+        argument = item.get("delta", 1)
+    elif operation == "set":
+        argument = item.get("value")
+    else:
+        argument = 0 if operation == "create" else None
+    if operation in ("increment", "set"):
+        # bool is an int subclass, but true is not a counter value
+        if not isinstance(argument, int) or isinstance(argument, bool):
+            raise ValueError("Invalid counter value")
+        if argument < 0:
+            raise ValueError("Counter value cannot be negative")
+    return operation, name, argument
+
+def batch_result(operation, name, result):
+    """Per-operation response entry, shaped like the single-counter routes"""
+    if isinstance(result, StoreFull):
+        return {"status": HTTPStatus.INSUFFICIENT_STORAGE, "error": str(result)}
+    if isinstance(result, ValueError):
+        return {"status": HTTPStatus.BAD_REQUEST, "error": str(result)}
+    if operation == "create":
+        if not result:
+            return {"status": HTTPStatus.CONFLICT, "error": f"Counter '{name}' already exists"}
+        return {"status": HTTPStatus.CREATED, name: 0}
+    if result is None or result is False:
+        return {"status": HTTPStatus.NOT_FOUND, "error": f"Counter '{name}' not found"}
+    if operation == "delete":
+        return {"status": HTTPStatus.NO_CONTENT}
+    return {"status": HTTPStatus.OK, name: result}
+
+@app.route('/counters/batch', methods=['POST'])
+def batch_counters():
+    """
+    Apply a JSON array (or NDJSON lines) of create, increment (by delta, default 1),
+    set and delete operations and return one result per operation, in order
+    """
+    if request.mimetype in NDJSON_TYPES:
+        try:
+            items = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        except ValueError:
+            return jsonify({"error": "Invalid NDJSON body"}), HTTPStatus.BAD_REQUEST
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({"error": "Body must be a JSON array of operations"}), HTTPStatus.BAD_REQUEST
+    if len(items) > MAX_BATCH_OPERATIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_OPERATIONS} operations per batch"}), HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+    results = [None] * len(items)
+    operations, positions = [], []
+    for position, item in enumerate(items):
+        try:
+            operations.append(parse_batch_operation(item))
+            positions.append(position)
+        except ValueError as error:
+            # invalid operations are reported and skipped, the rest still run
+            results[position] = {"status": HTTPStatus.BAD_REQUEST, "error": str(error)}
+    for position, operation, result in zip(positions, operations, COUNTERS.batch(operations)):
+        results[position] = batch_result(operation[0], operation[1], result)
+    return jsonify({"results": results}), HTTPStatus.OK
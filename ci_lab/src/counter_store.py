@@ -0,0 +1,298 @@
+"""
+Sharded In-Memory Counter Store
+
+Counters are spread over N shards by the hash of their name. Every shard has
+its own lock, so a read-modify-write such as an increment is atomic without
+serializing requests for counters that live in different shards.
+
+Each shard also keeps an ordered index of its counters by (value, name), so
+the top or bottom n counters and the counters within a range of values come
+from merging the matching entries of every shard instead of scanning or
+sorting the whole store.
+
+Shards keep running aggregates too (sum of the values and a power-of-two
+histogram), updated by every mutation, so totals and statistics cost one
+read per shard whatever the number of counters.
+
+Every mutation is one of the OPERATIONS below, applied by _Shard.apply with
+the shard lock held. batch() applies many of them taking each shard lock once.
+
+Given a CounterLog (see counter_log.py) the store recovers its counters from
+it on start and records every change in it, still under the shard lock so
+the log holds the changes of each counter in the order they were made.
+"""
+import heapq
+import threading
+from itertools import islice
+from sortedcontainers import SortedList
+
+DEFAULT_SHARDS = 16
+
+# create: argument is the initial value, result True or False if it exists
+# increment: argument is the delta, result the new value or None if missing
+# set: argument is the value, result the value or None if missing
+# delete: no argument, result True or False if missing
+OPERATIONS = ("create", "increment", "set", "delete")
+
+
+def histogram_bucket(value):
+    """Lower bound of the power-of-two bucket holding value: 0, 1, 2, 4, 8, ..."""
+    if value < 0:
+        return -histogram_bucket(-value)
+    return 1 << (value.bit_length() - 1) if value else 0
+
+
+class _Shard:
+    """One lock-striped slice of the store"""
+
+    __slots__ = ("lock", "counters", "by_value", "total", "histogram")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        # (value, name) of every counter in the shard, kept in order
+        self.by_value = SortedList()
+        # running sum of the values and counters per histogram_bucket
+        self.total = 0
+        self.histogram = {}
+
+    def _count(self, value, sign):
+        self.total += sign * value
+        bucket = histogram_bucket(value)
+        count = self.histogram.get(bucket, 0) + sign
+        if count:
+            self.histogram[bucket] = count
+        else:
+            del self.histogram[bucket]
+
+    def put(self, name, value):
+        """Store a new value for name, keeping the index and aggregates in step (lock held)"""
+        old = self.counters.get(name)
+        if old is not None:
+            self.by_value.remove((old, name))
+            self._count(old, -1)
+        self.counters[name] = value
+        self.by_value.add((value, name))
+        self._count(value, 1)
+
+    def pop(self, name):
+        """Remove name, returns its value or None if it does not exist (lock held)"""
+        value = self.counters.pop(name, None)
+        if value is not None:
+            self.by_value.remove((value, name))
+            self._count(value, -1)
+        return value
+
+    def apply(self, operation, name, argument=None):
+        """Apply one of OPERATIONS to name and return its result (lock held)"""
+        if operation == "create":
+            if name in self.counters:
+                return False
+            self.put(name, argument)
+            return True
+        if operation == "delete":
+            return self.pop(name) is not None
+        current = self.counters.get(name)
+        if current is None:
+            return None
+        if operation == "increment":
+            argument += current
+        elif operation != "set":
+            raise ValueError(f"Unknown counter operation '{operation}'")
+        self.put(name, argument)
+        return argument
+
+    def clear(self):
+        """Remove every counter of the shard (lock held)"""
+        self.counters.clear()
+        self.by_value.clear()
+        self.total = 0
+        self.histogram.clear()
+
+
+class CounterStore:
+    """Thread-safe name -> int counters with lock-striped shards"""
+
+    def __init__(self, shards=DEFAULT_SHARDS, log=None):
+        if shards < 1:
+            raise ValueError("A counter store needs at least one shard")
+        self._shards = tuple(_Shard() for _ in range(shards))
+        self._log = log
+        if log is not None:
+            for name, value in log.open().items():
+                self._shard(name).put(name, value)
+            log.attach(self.snapshot)
+
+    def _shard(self, name):
+        return self._shards[hash(name) % len(self._shards)]
+
+    def _record(self, operation, name, result):
+        """Log the state a successful operation left behind, returns its seq or 0 (shard lock held)"""
+        if self._log is None or result is None or result is False:
+            return 0
+        if operation == "delete":
+            return self._log.append("del", name)
+        value = self._shard(name).counters[name]
+        return self._log.append("put", name, value)
+
+    def _apply(self, operation, name, argument=None):
+        shard = self._shard(name)
+        with shard.lock:
+            result = shard.apply(operation, name, argument)
+            seq = self._record(operation, name, result)
+        if seq:
+            self._log.commit(seq)
+        return result
+
+    def create(self, name, value=0):
+        """Create a counter, returns False if it already exists"""
+        return self._apply("create", name, value)
+
+    def get(self, name):
+        """Return the value of a counter, or None if it does not exist"""
+        # a single dict lookup needs no lock
+        return self._shard(name).counters.get(name)
+
+    def increment(self, name, delta=1):
+        """Add delta to a counter, returns the new value or None if it does not exist"""
+        return self._apply("increment", name, delta)
+
+    def set(self, name, value):
+        """Set a counter, returns the new value or None if it does not exist"""
+        return self._apply("set", name, value)
+
+    def reset(self, name):
+        """Set a counter back to zero, returns 0 or None if it does not exist"""
+        return self.set(name, 0)
+
+    def delete(self, name):
+        """Delete a counter, returns False if it does not exist"""
+        return self._apply("delete", name)
+
+    def batch(self, operations):
+        """
+        Apply (operation, name, argument) tuples and return their results in
+        the same order, see OPERATIONS. The operations of each shard run in
+        request order under a single acquisition of its lock, so no other
+        request sees a shard half way through a batch.
+        """
+        by_shard = {}
+        for position, (operation, name, _) in enumerate(operations):
+            # refuse the whole batch before any of it is applied
+            if operation not in OPERATIONS:
+                raise ValueError(f"Unknown counter operation '{operation}'")
+            by_shard.setdefault(hash(name) % len(self._shards), []).append(position)
+        results = [None] * len(operations)
+        last_seq = 0
+        for index in sorted(by_shard):
+            shard = self._shards[index]
+            with shard.lock:
+                for position in by_shard[index]:
+                    operation, name, argument = operations[position]
+                    results[position] = shard.apply(operation, name, argument)
+                    last_seq = self._record(operation, name, results[position]) or last_seq
+        # one wait covers the whole batch, the log is written in seq order
+        if last_seq:
+            self._log.commit(last_seq)
+        return results
+
+    def clear(self):
+        """Delete all counters"""
+        # all shards at once, so no change can fall between the log record and the clearing
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            for shard in self._shards:
+                shard.clear()
+            seq = self._log.append("clear") if self._log is not None else 0
+        finally:
+            for shard in self._shards:
+                shard.lock.release()
+        if seq:
+            self._log.commit(seq)
+
+    def snapshot(self):
+        """
+        Return a plain dict copy of all counters without taking any lock.
+        Each shard is copied atomically, so the copy never holds a torn value,
+        but shards are copied one after another rather than at a single instant.
+        """
+        result = {}
+        for shard in self._shards:
+            result.update(shard.counters.copy())
+        return result
+
+    def _ordered(self, n, reverse):
+        """First n (value, name) pairs of every shard, merged in order"""
+        heads = []
+        for shard in self._shards:
+            with shard.lock:
+                index = shard.by_value
+                # the last n entries when reversed, the first n otherwise
+                start, stop = (max(len(index) - n, 0), len(index)) if reverse else (0, n)
+                heads.append(list(index.islice(start, stop, reverse=reverse)))
+        merged = heapq.merge(*heads, reverse=reverse)
+        return [(name, value) for value, name in islice(merged, n)]
+
+    def range(self, min_value=None, max_value=None, limit=None, after=None):
+        """
+        Return the counters with min_value <= value <= max_value as (name, value)
+        pairs, ordered by (value, name). None leaves a bound open.
+        after: a (value, name) position, only counters ordered after it are returned
+        limit: the most pairs to return, None for all of them
+        """
+        lower = None if min_value is None else (min_value, "")
+        if after is not None and (lower is None or tuple(after) >= lower):
+            lower, inclusive = tuple(after), False
+        else:
+            inclusive = True
+        # every name sorts after "", so (max_value + 1, "") excludes larger values
+        upper = None if max_value is None else (max_value + 1, "")
+        heads = []
+        for shard in self._shards:
+            with shard.lock:
+                found = shard.by_value.irange(lower, upper, inclusive=(inclusive, False))
+                heads.append(list(islice(found, limit)))
+        merged = heapq.merge(*heads)
+        return [(name, value) for value, name in islice(merged, limit)]
+
+    def top(self, n):
+        """Return the n highest counters as (name, value) pairs, highest first"""
+        return self._ordered(n, reverse=True)
+
+    def bottom(self, n):
+        """Return the n lowest counters as (name, value) pairs, lowest first"""
+        return self._ordered(n, reverse=False)
+
+    def total(self):
+        """Return the sum of all counter values"""
+        # one running total per shard, each read is atomic
+        return sum(shard.total for shard in self._shards)
+
+    def stats(self):
+        """
+        Return count, total, min, max and the power-of-two value histogram
+        ({bucket lower bound: counters}) of all counters, min and max are None
+        when the store is empty
+        """
+        count = total = 0
+        low = high = None
+        histogram = {}
+        for shard in self._shards:
+            with shard.lock:
+                count += len(shard.counters)
+                total += shard.total
+                if shard.by_value:
+                    first, last = shard.by_value[0][0], shard.by_value[-1][0]
+                    low = first if low is None else min(low, first)
+                    high = last if high is None else max(high, last)
+                for bucket, counters in shard.histogram.items():
+                    histogram[bucket] = histogram.get(bucket, 0) + counters
+        return {"count": count, "total": total, "min": low, "max": high,
+                "histogram": dict(sorted(histogram.items()))}
+
+    def __contains__(self, name):
+        return name in self._shard(name).counters
+
+    def __len__(self):
+        return sum(len(shard.counters) for shard in self._shards)
@@ -0,0 +1,486 @@
+"""
+Shared-Memory Counter Store
+
+A CounterStore replacement whose counters live in a
+multiprocessing.shared_memory segment, so every Gunicorn worker process (or
+any other process on the machine) that opens the same name sees and updates
+the same counters.
+
+The segment holds a fixed-size hash table split into independent segments,
+each an open-addressing table of name -> int64 slots with its own header
+(count, total, slots in use). A name always hashes (with a hash that is the
+same in every process) to one segment, and each segment is guarded by:
+    - a threading.Lock, for the threads of this process
+    - an fcntl byte-range lock on a lock file, for the other processes
+so different counters are mostly updated in parallel, like the shards of
+CounterStore. fcntl locks belong to a process, not to a file descriptor, so
+all the handles a process opens on one lock file share a single descriptor
+and a single threading.Lock per segment (see _LockFile).
+
+There is no shared ordered index, so top, bottom and range read every slot:
+O(capacity) instead of O(log N). total() and len() read the segment headers,
+with every segment locked so they add up to one consistent state.
+Names must be ASCII and at most NAME_BYTES long, values must fit an int64:
+anything else raises ValueError before the table is changed.
+"""
+import fcntl
+import hashlib
+import heapq
+import os
+import struct
+import sys
+import tempfile
+import threading
+from contextlib import ExitStack
+from multiprocessing import resource_tracker, shared_memory
+from src.counter_store import OPERATIONS, histogram_bucket
+
+MAGIC = b"CNTRSHM2"
+DEFAULT_SEGMENTS = 64
+DEFAULT_SLOTS = 1024
+# share of the slots of a segment that counters may fill, tombstones (deleted
+# counters) past it are dropped by compacting the segment
+MAX_LOAD = 0.85
+
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+# count, used, total; the sum of many int64 values needs 128 bits
+SEGMENT_HEADER = struct.Struct("<qq16s")
+SEGMENT_HEADER_SIZE = 64
+# value, tag (EMPTY, TOMBSTONE or the name length), name
+SLOT = struct.Struct("<qH118s")
+NAME_BYTES = 118
+EMPTY = 0
+TOMBSTONE = 0xFFFF
+# a slot holds a signed 64-bit value
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+# SharedMemory(track=False) only exists from Python 3.13
+TRACK_ARGUMENT = sys.version_info >= (3, 13)
+
+
+class StoreFull(Exception):
+    """Raised when a segment of the shared table has no free slot left"""
+
+
+def _check_value(value):
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError("Counter value out of range, it must fit in 64 bits")
+
+
+def _hash(encoded):
+    """64-bit hash of a name, the same in every process (unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+
+def _open_shared_memory(name, create, size=0):
+    """
+    Open a SharedMemory block that outlives this process: it must only go
+    away through SharedCounterStore.unlink(), not when one worker exits
+    """
+    if TRACK_ARGUMENT:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    # before Python 3.13 every process registers the block with the resource
+    # tracker, which unlinks it when that process exits
+    block = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def _unlink_shared_memory(block):
+    if not TRACK_ARGUMENT:
+        # unlink() unregisters the block, which must be registered for that
+        resource_tracker.register(block._name, "shared_memory")
+    block.unlink()
+
+
+class _LockFile:
+    """
+    The lock file of a table, opened once per process. Two descriptors of one
+    process do not exclude each other with fcntl locks, and closing either
+    drops the locks taken through both, so every SharedCounterStore of this
+    process on the same file shares the descriptor and a threading.Lock per
+    locked byte, and the last handle to close it closes the descriptor.
+    """
+
+    _open = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, fd, key):
+        self.fd = fd
+        self.key = key
+        self.handles = 0
+        self.locks = {}
+
+    @classmethod
+    def acquire(cls, path):
+        """The _LockFile of path for this process, opened if needed"""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        stat = os.fstat(fd)
+        # a forked child takes locks of its own, through a descriptor of its own
+        key = (os.getpid(), stat.st_dev, stat.st_ino)
+        with cls._open_lock:
+            lock_file = cls._open.get(key)
+            if lock_file is None:
+                lock_file = cls._open[key] = cls(fd, key)
+            else:
+                os.close(fd)
+            lock_file.handles += 1
+        return lock_file
+
+    def release(self):
+        """Give up one handle's use, the last one closes the descriptor"""
+        with self._open_lock:
+            self.handles -= 1
+            if self.handles == 0:
+                del self._open[self.key]
+                os.close(self.fd)
+
+    def thread_lock(self, byte):
+        """The threading.Lock shared by every handle that locks byte"""
+        with self._open_lock:
+            return self.locks.setdefault(byte, threading.Lock())
+
+
+class _Segment:
+    """One lock-protected open-addressing table inside the shared block"""
+
+    __slots__ = ("buf", "offset", "slots", "lock", "lock_fd", "lock_byte")
+
+    def __init__(self, buf, offset, slots, lock_file, lock_byte):
+        self.buf = buf
+        self.offset = offset
+        self.slots = slots
+        self.lock = lock_file.thread_lock(lock_byte)
+        self.lock_fd = lock_file.fd
+        self.lock_byte = lock_byte
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            fcntl.lockf(self.lock_fd, fcntl.LOCK_EX, 1, self.lock_byte)
+        except BaseException:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.lockf(self.lock_fd, fcntl.LOCK_UN, 1, self.lock_byte)
+        self.lock.release()
+
+    def header(self):
+        """(count, total, used) of the segment (lock held)"""
+        count, used, total = SEGMENT_HEADER.unpack_from(self.buf, self.offset)
+        return count, int.from_bytes(total, "little", signed=True), used
+
+    def _set_header(self, count, total, used):
+        SEGMENT_HEADER.pack_into(self.buf, self.offset, count, used,
+                                 total.to_bytes(16, "little", signed=True))
+
+    def _slot_offset(self, index):
+        return self.offset + SEGMENT_HEADER_SIZE + index * SLOT.size
+
+    def _find(self, encoded, start):
+        """(slot of the name or None, first free slot on its probe path or None) (lock held)"""
+        free = None
+        for step in range(self.slots):
+            index = (start + step) % self.slots
+            tag = struct.unpack_from("<H", self.buf, self._slot_offset(index) + 8)[0]
+            if tag == EMPTY:
+                return None, index if free is None else free
+            if tag == TOMBSTONE:
+                if free is None:
+                    free = index
+            elif tag == len(encoded):
+                at = self._slot_offset(index) + 10
+                if self.buf[at:at + tag] == encoded:
+                    return index, free
+        return None, free
+
+    def _value(self, index):
+        return struct.unpack_from("<q", self.buf, self._slot_offset(index))[0]
+
+    def _write(self, index, value, encoded=None):
+        at = self._slot_offset(index)
+        if encoded is None:
+            struct.pack_into("<q", self.buf, at, value)
+        else:
+            SLOT.pack_into(self.buf, at, value, len(encoded), encoded)
+
+    def get(self, encoded, start):
+        """Value of the name or None (lock held)"""
+        index, _ = self._find(encoded, start)
+        return None if index is None else self._value(index)
+
+    def apply(self, operation, encoded, start, argument=None):
+        """Apply one of OPERATIONS, same results as _Shard.apply (lock held)"""
+        index, free = self._find(encoded, start)
+        count, total, used = self.header()
+        if operation == "create":
+            if index is not None:
+                return False
+            _check_value(argument)
+            if count + 1 > self.slots * MAX_LOAD:
+                raise StoreFull("The shared counter table is full")
+            if free is None or used + 1 > self.slots * MAX_LOAD:
+                self._compact()
+                count, total, used = self.header()
+                _, free = self._find(encoded, start)
+            reused = struct.unpack_from("<H", self.buf, self._slot_offset(free) + 8)[0] == TOMBSTONE
+            self._write(free, argument, encoded)
+            self._set_header(count + 1, total + argument, used if reused else used + 1)
+            return True
+        if index is None:
+            return False if operation == "delete" else None
+        old = self._value(index)
+        if operation == "delete":
+            struct.pack_into("<H", self.buf, self._slot_offset(index) + 8, TOMBSTONE)
+            self._set_header(count - 1, total - old, used)
+            return True
+        if operation == "increment":
+            argument += old
+        elif operation != "set":
+            raise ValueError(f"Unknown counter operation '{operation}'")
+        _check_value(argument)
+        self._write(index, argument)
+        self._set_header(count, total - old + argument, used)
+        return argument
+
+    def items(self):
+        """(name, value) of every counter in the segment (lock held)"""
+        result = []
+        for index in range(self.slots):
+            value, tag, name = SLOT.unpack_from(self.buf, self._slot_offset(index))
+            if tag not in (EMPTY, TOMBSTONE):
+                result.append((name[:tag].decode("ascii"), value))
+        return result
+
+    def clear(self):
+        """Empty every slot (lock held)"""
+        start = self._slot_offset(0)
+        self.buf[start:start + self.slots * SLOT.size] = bytes(self.slots * SLOT.size)
+        self._set_header(0, 0, 0)
+
+    def _compact(self):
+        """Rebuild the segment without tombstones (lock held)"""
+        items = self.items()
+        self.clear()
+        total = 0
+        for name, value in items:
+            encoded = name.encode("ascii")
+            _, free = self._find(encoded, (_hash(encoded) >> 16) % self.slots)
+            self._write(free, value, encoded)
+            total += value
+        self._set_header(len(items), total, len(items))
+
+
+class SharedCounterStore:
+    """Counters shared between processes, with the interface of CounterStore"""
+
+    def __init__(self, name, segments=DEFAULT_SEGMENTS, slots=DEFAULT_SLOTS, lock_path=None):
+        """
+        Open the shared table called name, creating it with segments x slots
+        counter slots if no process has yet. An existing table keeps its own size.
+        lock_path: file used for the cross-process locks, next to the system
+        temp files by default
+        """
+        self.name = name
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file = _LockFile.acquire(self.lock_path)
+        # byte 0 of the lock file serializes creating the table, byte 1 + i guards segment i
+        with _Segment(None, 0, 0, self._lock_file, 0):
+            try:
+                self._block = _open_shared_memory(name, create=False)
+            except FileNotFoundError:
+                size = HEADER_SIZE + segments * (SEGMENT_HEADER_SIZE + slots * SLOT.size)
+                self._block = _open_shared_memory(name, create=True, size=size)
+                HEADER.pack_into(self._block.buf, 0, MAGIC, segments, slots)
+        magic, segments, slots = HEADER.unpack_from(self._block.buf, 0)
+        if magic != MAGIC:
+            self._block.close()
+            self._lock_file.release()
+            raise ValueError(f"Shared memory '{name}' does not hold a counter table")
+        size = SEGMENT_HEADER_SIZE + slots * SLOT.size
+        self._segments = tuple(
+            _Segment(self._block.buf, HEADER_SIZE + i * size, slots, self._lock_file, 1 + i)
+            for i in range(segments))
+
+    def _locate(self, name, operation="get"):
+        """
+        (segment, encoded name, first probe slot) of a name, None if the name
+        cannot be stored, which only a create refuses with ValueError
+        """
+        try:
+            encoded = name.encode("ascii")
+        except UnicodeEncodeError:
+            encoded = b""
+        if not encoded or len(encoded) > NAME_BYTES:
+            if operation == "create":
+                raise ValueError(f"Invalid counter name. Only 1 to {NAME_BYTES} ASCII characters "
+                                 "fit a shared memory slot.")
+            return None
+        h = _hash(encoded)
+        segment = self._segments[h % len(self._segments)]
+        # the low bits pick the segment, the others the slot within it
+        return segment, encoded, (h >> 16) % segment.slots
+
+    def _apply(self, operation, name, argument=None):
+        located = self._locate(name, operation)
+        if located is None:
+            return False if operation == "delete" else None
+        segment, encoded, start = located
+        with segment:
+            return segment.apply(operation, encoded, start, argument)
+
+    def create(self, name, value=0):
+        """
+        Create a counter, returns False if it already exists, raises StoreFull
+        if there is no room and ValueError if the name or value does not fit
+        """
+        return self._apply("create", name, value)
+
+    def get(self, name):
+        """Return the value of a counter, or None if it does not exist"""
+        located = self._locate(name)
+        if located is None:
+            return None
+        segment, encoded, start = located
+        # a slot is written in several steps, so reads take the lock too
+        with segment:
+            return segment.get(encoded, start)
+
+    def increment(self, name, delta=1):
+        """
+        Add delta to a counter, returns the new value or None if it does not
+        exist, raises ValueError (the counter unchanged) past the int64 range
+        """
+        return self._apply("increment", name, delta)
+
+    def set(self, name, value):
+        """
+        Set a counter, returns the new value or None if it does not exist,
+        raises ValueError (the counter unchanged) if value does not fit an int64
+        """
+        return self._apply("set", name, value)
+
+    def reset(self, name):
+        """Set a counter back to zero, returns 0 or None if it does not exist"""
+        return self.set(name, 0)
+
+    def delete(self, name):
+        """Delete a counter, returns False if it does not exist"""
+        return self._apply("delete", name)
+
+    def batch(self, operations):
+        """
+        Apply (operation, name, argument) tuples segment by segment, see
+        CounterStore.batch. An operation the table cannot take has the
+        exception as its result, StoreFull for a create finding its segment
+        full, ValueError for a name or value that does not fit; it changes
+        nothing and the other operations still run.
+        """
+        by_segment = {}
+        results = [None] * len(operations)
+        for position, (operation, name, _) in enumerate(operations):
+            # refuse the whole batch before any of it is applied
+            if operation not in OPERATIONS:
+                raise ValueError(f"Unknown counter operation '{operation}'")
+            try:
+                located = self._locate(name, operation)
+            except ValueError as error:
+                results[position] = error
+                continue
+            if located is None:
+                results[position] = False if operation == "delete" else None
+                continue
+            segment, encoded, start = located
+            by_segment.setdefault(segment.lock_byte, (segment, []))[1].append(
+                (position, encoded, start))
+        for key in sorted(by_segment):
+            segment, located = by_segment[key]
+            with segment:
+                for position, encoded, start in located:
+                    operation, _, argument = operations[position]
+                    try:
+                        results[position] = segment.apply(operation, encoded, start, argument)
+                    except (StoreFull, ValueError) as error:
+                        results[position] = error
+        return results
+
+    def clear(self):
+        """Delete all counters"""
+        for segment in self._segments:
+            with segment:
+                segment.clear()
+
+    def snapshot(self):
+        """Return a dict copy of all counters, one segment at a time"""
+        result = {}
+        for segment in self._segments:
+            with segment:
+                result.update(segment.items())
+        return result
+
+    def top(self, n):
+        """Return the n highest counters as (name, value) pairs, highest first"""
+        return [(name, value) for value, name in
+                heapq.nlargest(n, ((value, name) for name, value in self.snapshot().items()))]
+
+    def bottom(self, n):
+        """Return the n lowest counters as (name, value) pairs, lowest first"""
+        return [(name, value) for value, name in
+                heapq.nsmallest(n, ((value, name) for name, value in self.snapshot().items()))]
+
+    def range(self, min_value=None, max_value=None, limit=None, after=None):
+        """Counters with min_value <= value <= max_value, see CounterStore.range"""
+        after = tuple(after) if after is not None else None
+        found = sorted(
+            (value, name) for name, value in self.snapshot().items()
+            if (min_value is None or value >= min_value)
+            and (max_value is None or value <= max_value)
+            and (after is None or (value, name) > after))
+        return [(name, value) for value, name in found[:limit]]
+
+    def _headers(self):
+        """(count, total, used) of every segment, all read while every segment is locked"""
+        with ExitStack() as stack:
+            # always in segment order, so two of these cannot deadlock; every
+            # other operation holds one segment at a time
+            for segment in self._segments:
+                stack.enter_context(segment)
+            return [segment.header() for segment in self._segments]
+
+    def total(self):
+        """Return the sum of all counter values"""
+        return sum(total for _, total, _ in self._headers())
+
+    def stats(self):
+        """Count, total, min, max and value histogram, see CounterStore.stats"""
+        values = list(self.snapshot().values())
+        histogram = {}
+        for value in values:
+            bucket = histogram_bucket(value)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        return {"count": len(values), "total": sum(values),
+                "min": min(values, default=None), "max": max(values, default=None),
+                "histogram": dict(sorted(histogram.items()))}
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return sum(count for count, _, _ in self._headers())
+
+    def close(self):
+        """Detach this handle from the shared table"""
+        self._segments = ()
+        self._block.close()
+        self._lock_file.release()
+
+    def unlink(self):
+        """Remove the shared table and its lock file for every process"""
+        _unlink_shared_memory(self._block)
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
@@ -11,8 +11,9 @@ how to call the web service and assert what it should return.
 - The service must be able to read the counter
 """
 
+import os
 import pytest
-from src import app
+from src import app, counter
 from http import HTTPStatus
 
 @pytest.fixture()
@@ -277,3 +278,170 @@ class TestCounterEndpoints:
         assert response.status_code == HTTPStatus.BAD_REQUEST
 
         # TODO: Add an assertion to verify the error message specifically says 'Invalid counter name'S
+
+    # ===========================
+    # Test: Page through counters within a value range
+    # ===========================
+    def test_counters_in_range(self, client):
+        """It should return counters within min and max, one page at a time"""
+        client.post('/counters/reset')
+        for i in range(7):
+            client.post(f'/counters/r{i}')
+            client.put(f'/counters/r{i}/set/{i * 10}')
+
+        response = client.get('/counters/range?min=10&max=50&limit=2')
+        assert response.status_code == HTTPStatus.OK
+        data = response.get_json()
+        assert data["counters"] == [{"name": "r1", "value": 10}, {"name": "r2", "value": 20}]
+
+        names = [c["name"] for c in data["counters"]]
+        while data["next_cursor"]:
+            data = client.get(f'/counters/range?min=10&max=50&limit=2&cursor={data["next_cursor"]}').get_json()
+            names += [c["name"] for c in data["counters"]]
+        assert names == ["r1", "r2", "r3", "r4", "r5"]
+
+    def test_counters_in_range_rejects_bad_parameters(self, client):
+        """It should return 400 for invalid range parameters"""
+        assert client.get('/counters/range?min=abc').status_code == HTTPStatus.BAD_REQUEST
+        assert client.get('/counters/range?limit=0').status_code == HTTPStatus.BAD_REQUEST
+        assert client.get('/counters/range?cursor=garbage').status_code == HTTPStatus.BAD_REQUEST
+
+    def test_greater_and_less_use_exclusive_thresholds(self, client):
+        """It should exclude counters equal to the threshold"""
+        client.post('/counters/reset')
+        client.post('/counters/a')
+        client.post('/counters/b')
+        client.put('/counters/a/set/10')
+
+        assert client.get('/counters/greater/9').get_json() == {"a": 10}
+        assert client.get('/counters/greater/10').get_json() == {}
+        assert client.get('/counters/less/10').get_json() == {"b": 0}
+
+    # ===========================
+    # Test: Retrieve running aggregates
+    # ===========================
+    def test_total_and_stats(self, client):
+        """It should return the running total and statistics of all counters"""
+        client.post('/counters/reset')
+        client.post('/counters/a')
+        client.post('/counters/b')
+        client.put('/counters/a/set/5')
+        client.put('/counters/b')
+
+        assert client.get('/counters/total').get_json() == {"total": 6}
+        response = client.get('/counters/stats')
+        assert response.status_code == HTTPStatus.OK
+        assert response.get_json() == {
+            "count": 2, "total": 6, "min": 1, "max": 5,
+            "histogram": [{"from": 1, "counters": 1}, {"from": 4, "counters": 1}],
+        }
+
+        client.post('/counters/reset')
+        assert client.get('/counters/stats').get_json() == {
+            "count": 0, "total": 0, "min": None, "max": None, "histogram": []}
+
+    # ===========================
+    # Test: Apply a batch of operations
+    # ===========================
+    def test_batch_operations(self, client):
+        """It should apply a JSON array of operations and report each result in order"""
+        client.post('/counters/reset')
+        response = client.post('/counters/batch', json=[
+            {"op": "create", "name": "a"},
+            {"op": "create", "name": "a"},
+            {"op": "increment", "name": "a", "delta": 5},
+            {"op": "increment", "name": "a"},
+            {"op": "set", "name": "missing", "value": 3},
+            {"op": "create", "name": "b"},
+            {"op": "set", "name": "b", "value": 7},
+            {"op": "delete", "name": "b"},
+        ])
+        assert response.status_code == HTTPStatus.OK
+        assert [r["status"] for r in response.get_json()["results"]] == [
+            HTTPStatus.CREATED, HTTPStatus.CONFLICT, HTTPStatus.OK, HTTPStatus.OK,
+            HTTPStatus.NOT_FOUND, HTTPStatus.CREATED, HTTPStatus.OK, HTTPStatus.NO_CONTENT]
+        assert response.get_json()["results"][3] == {"status": HTTPStatus.OK, "a": 6}
+        assert client.get('/counters').get_json() == {"a": 6}
+
+    def test_batch_ndjson_and_invalid_operations(self, client):
+        """It should accept NDJSON and skip invalid operations with a 400 result"""
+        client.post('/counters/reset')
+        body = '\n'.join([
+            '{"op": "create", "name": "n"}',
+            '{"op": "increment", "name": "n", "delta": -2}',
+            '{"op": "explode", "name": "n"}',
+            '{"op": "create", "name": "bad@name"}',
+            '{"op": "increment", "name": "n", "delta": 2}',
+        ])
+        response = client.post('/counters/batch', data=body, content_type='application/x-ndjson')
+        assert response.status_code == HTTPStatus.OK
+        results = response.get_json()["results"]
+        assert [r["status"] for r in results] == [
+            HTTPStatus.CREATED, HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST,
+            HTTPStatus.BAD_REQUEST, HTTPStatus.OK]
+        assert results[1]["error"] == "Counter value cannot be negative"
+        assert client.get('/counters/n').get_json() == {"n": 2}
+
+    def test_batch_rejects_malformed_body(self, client):
+        """It should return 400 when the body is not a list of operations"""
+        assert client.post('/counters/batch', json={"op": "create"}).status_code == HTTPStatus.BAD_REQUEST
+        response = client.post('/counters/batch', data='{"op": ', content_type='application/x-ndjson')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    # ===========================
+    # Test: Serve the counters from shared memory
+    # ===========================
+    def test_shared_memory_backend(self, client, monkeypatch, tmp_path):
+        """It should keep the routes working on the shared store and report a full table"""
+        from src.shared_counter_store import SharedCounterStore
+        store = SharedCounterStore(f"test_routes_{os.getpid()}", segments=1, slots=4,
+                                   lock_path=str(tmp_path / "counters.lock"))
+        monkeypatch.setattr(counter, "COUNTERS", store)
+        try:
+            for name in ["a", "b", "c"]:
+                assert client.post(f'/counters/{name}').status_code == HTTPStatus.CREATED
+            assert client.put('/counters/a').get_json() == {"a": 1}
+            assert client.get('/counters/top/1').get_json() == {"a": 1}
+            response = client.post('/counters/d')
+            assert response.status_code == HTTPStatus.INSUFFICIENT_STORAGE
+            results = client.post('/counters/batch', json=[{"op": "create", "name": "d"}]).get_json()["results"]
+            assert results[0]["status"] == HTTPStatus.INSUFFICIENT_STORAGE
+            assert client.get('/counters/count').get_json() == {"count": 3}
+        finally:
+            store.unlink()
+            store.close()
+
+    def test_shared_memory_limits(self, client, monkeypatch, tmp_path):
+        """It should answer 400 for names and values a shared memory slot cannot hold"""
+        from src.shared_counter_store import INT64_MAX, NAME_BYTES, SharedCounterStore
+        long_name = 'a' * (NAME_BYTES + 1)
+        # the in-process store has no such limits
+        client.post('/counters/reset')
+        assert client.post(f'/counters/{long_name}').status_code == HTTPStatus.CREATED
+        assert client.put(f'/counters/{long_name}/set/{INT64_MAX + 1}').status_code == HTTPStatus.OK
+
+        store = SharedCounterStore(f"test_limits_{os.getpid()}", segments=1, slots=16,
+                                   lock_path=str(tmp_path / "counters.lock"))
+        monkeypatch.setattr(counter, "COUNTERS", store)
+        try:
+            response = client.post(f'/counters/{long_name}')
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+            assert 'Invalid counter name' in response.get_json()["error"]
+            client.post('/counters/a')
+            client.post('/counters/b')
+            assert client.put(f'/counters/a/set/{INT64_MAX + 1}').status_code == HTTPStatus.BAD_REQUEST
+            assert client.put(f'/counters/a/set/{INT64_MAX}').status_code == HTTPStatus.OK
+            assert client.put('/counters/a').status_code == HTTPStatus.BAD_REQUEST
+            results = client.post('/counters/batch', json=[
+                {"op": "increment", "name": "b"},
+                {"op": "increment", "name": "a"},
+                {"op": "create", "name": long_name},
+                {"op": "set", "name": "b", "value": INT64_MAX + 1},
+            ]).get_json()["results"]
+            assert [r["status"] for r in results] == [
+                HTTPStatus.OK, HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST]
+            assert client.get('/counters').get_json() == {"a": INT64_MAX, "b": 1}
+            assert client.get('/counters/total').get_json() == {"total": INT64_MAX + 1}
+        finally:
+            store.unlink()
+            store.close()
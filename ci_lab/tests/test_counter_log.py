@@ -0,0 +1,137 @@
+"""
+Test Cases for Counter Persistence
+"""
+import os
+import threading
+import pytest
+from src.counter_log import CounterLog
+from src.counter_store import CounterStore
+
+
+def reopen(directory, **options):
+    """A fresh store recovered from the log in directory"""
+    return CounterStore(shards=4, log=CounterLog(directory, **options))
+
+
+class TestCounterLog:
+    """Test cases for CounterLog with CounterStore"""
+
+    def test_recover_after_restart(self, tmp_path):
+        """It should bring back every counter after the store is closed and reopened"""
+        store = reopen(tmp_path)
+        store.create("a")
+        store.create("b")
+        store.increment("a", 5)
+        store.set("b", 9)
+        store.delete("b")
+        store.create("c", 2)
+        store.batch([("increment", "c", 3), ("create", "d", 0), ("delete", "missing", None)])
+        store._log.close()
+
+        recovered = reopen(tmp_path)
+        assert recovered.snapshot() == {"a": 5, "c": 5, "d": 0}
+        assert recovered.stats()["total"] == 10
+        assert recovered.top(3) == [("c", 5), ("a", 5), ("d", 0)]
+        recovered._log.close()
+
+    def test_clear_is_logged(self, tmp_path):
+        """It should not bring back counters that were cleared"""
+        store = reopen(tmp_path)
+        store.create("a")
+        store.clear()
+        store.create("b")
+        store._log.close()
+        recovered = reopen(tmp_path)
+        assert recovered.snapshot() == {"b": 0}
+        recovered._log.close()
+
+    def test_snapshot_and_log_tail(self, tmp_path):
+        """It should recover from a snapshot plus the changes logged after it"""
+        store = reopen(tmp_path, snapshot_every=0)
+        for i in range(10):
+            store.create(f"c{i}", i)
+        store._log.snapshot()
+        store.increment("c1", 100)
+        store.delete("c2")
+        store._log.close()
+
+        segments = [f for f in os.listdir(tmp_path) if f.startswith("log-")]
+        assert len(segments) == 1
+        recovered = reopen(tmp_path)
+        expected = {f"c{i}": i for i in range(10) if i != 2}
+        expected["c1"] = 101
+        assert recovered.snapshot() == expected
+        recovered._log.close()
+
+    def test_background_snapshot(self, tmp_path):
+        """It should snapshot on its own once enough changes are logged"""
+        store = reopen(tmp_path, fsync_interval=0.01, snapshot_every=50)
+        for i in range(200):
+            store.create(f"c{i}")
+        store._log.flush()
+        for _ in range(100):
+            if store._log.snapshot_seq:
+                break
+            threading.Event().wait(0.01)
+        assert store._log.snapshot_seq > 0
+        store._log.close()
+        recovered = reopen(tmp_path)
+        assert len(recovered) == 200
+        recovered._log.close()
+
+    def test_torn_record_is_ignored(self, tmp_path):
+        """It should recover up to a record cut short by a crash"""
+        store = reopen(tmp_path, durability="group")
+        store.create("a")
+        store.increment("a")
+        store._log.close()
+        segment = sorted(f for f in os.listdir(tmp_path) if f.startswith("log-"))[-1]
+        with open(tmp_path / segment, "a", encoding="utf-8") as f:
+            f.write('[3,"put","a",9')
+
+        recovered = reopen(tmp_path)
+        assert recovered.snapshot() == {"a": 1}
+        recovered.increment("a")
+        recovered._log.close()
+        assert reopen(tmp_path, durability="off").snapshot() == {"a": 2}
+
+    def test_torn_first_record_of_a_segment(self, tmp_path):
+        """It should keep changes logged after a torn record that started its segment"""
+        store = reopen(tmp_path, durability="group")
+        store.create("a")
+        store._log.close()
+        # the crash tore the first record of the segment the next one goes to
+        with open(tmp_path / f"log-{2:020d}.jsonl", "w", encoding="utf-8") as f:
+            f.write('[2,"put","a",9')
+
+        recovered = reopen(tmp_path, durability="group")
+        assert recovered.snapshot() == {"a": 0}
+        recovered.create("b", 42)
+        recovered._log.close()
+        again = reopen(tmp_path, durability="group")
+        assert again.snapshot() == {"a": 0, "b": 42}
+        again._log.close()
+
+    def test_group_commit_from_many_threads(self, tmp_path):
+        """It should make every acknowledged change durable with shared fsyncs"""
+        store = reopen(tmp_path, durability="group")
+        for i in range(4):
+            store.create(f"c{i}")
+
+        def worker(name):
+            for _ in range(100):
+                store.increment(name)
+
+        threads = [threading.Thread(target=worker, args=(f"c{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store._log.durable_seq == store._log.seq
+        store._log.close()
+        assert reopen(tmp_path).snapshot() == {f"c{i}": 100 for i in range(4)}
+
+    def test_rejects_unknown_durability(self, tmp_path):
+        """It should refuse an unknown durability mode"""
+        with pytest.raises(ValueError):
+            CounterLog(tmp_path, durability="sometimes")
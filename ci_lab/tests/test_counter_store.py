@@ -0,0 +1,197 @@
+"""
+Test Cases for the Sharded Counter Store
+
+The shared-memory store runs the same cases, it must behave the same
+"""
+import os
+import random
+import threading
+import pytest
+from src.counter_store import CounterStore, histogram_bucket
+from src.shared_counter_store import SharedCounterStore
+
+
+@pytest.fixture(params=["sharded", "shared"])
+def store(request, tmp_path):
+    """Fixture for an empty counter store of each backend"""
+    if request.param == "sharded":
+        yield CounterStore(shards=4)
+        return
+    shared = SharedCounterStore(f"test_counters_{os.getpid()}", segments=4, slots=256,
+                                lock_path=str(tmp_path / "counters.lock"))
+    yield shared
+    shared.unlink()
+    shared.close()
+
+
+class TestCounterStore:
+    """Test cases for CounterStore"""
+
+    def test_create_and_get(self, store):
+        """It should create a counter at zero and refuse duplicates"""
+        assert store.create("a")
+        assert not store.create("a")
+        assert store.get("a") == 0
+        assert store.get("missing") is None
+
+    def test_mutations_on_missing_counter(self, store):
+        """It should return None or False for counters that do not exist"""
+        assert store.increment("missing") is None
+        assert store.set("missing", 3) is None
+        assert store.reset("missing") is None
+        assert not store.delete("missing")
+        assert "missing" not in store
+
+    def test_increment_set_reset_delete(self, store):
+        """It should update a counter and report its new value"""
+        store.create("a")
+        assert store.increment("a") == 1
+        assert store.increment("a", 5) == 6
+        assert store.set("a", 10) == 10
+        assert store.reset("a") == 0
+        assert store.delete("a")
+        assert "a" not in store
+
+    def test_snapshot_and_clear(self, store):
+        """It should copy all shards into one dict and clear them all"""
+        for i in range(20):
+            store.create(f"c{i}", i)
+        assert store.snapshot() == {f"c{i}": i for i in range(20)}
+        assert len(store) == 20
+        store.clear()
+        assert store.snapshot() == {}
+        assert len(store) == 0
+
+    def test_concurrent_increments_are_not_lost(self, store):
+        """It should not lose increments made from many threads"""
+        names = [f"c{i}" for i in range(8)]
+        for name in names:
+            store.create(name)
+
+        def worker():
+            for _ in range(2000):
+                for name in names:
+                    store.increment(name)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store.snapshot() == {name: 8 * 2000 for name in names}
+
+    def test_top_and_bottom(self, store):
+        """It should return the n highest and lowest counters in order"""
+        for i, value in enumerate([5, 1, 9, 3, 7, 0, 8]):
+            store.create(f"c{i}", value)
+        assert store.top(3) == [("c2", 9), ("c6", 8), ("c4", 7)]
+        assert store.bottom(2) == [("c5", 0), ("c1", 1)]
+        assert len(store.top(100)) == 7
+        assert store.top(0) == []
+
+    def test_order_index_follows_mutations(self, store):
+        """It should keep top and bottom in step with every change"""
+        for name in ["a", "b", "c"]:
+            store.create(name)
+        store.increment("a", 4)
+        store.set("b", 10)
+        store.reset("b")
+        store.increment("c", 2)
+        store.delete("a")
+        assert store.top(3) == [("c", 2), ("b", 0)]
+        assert store.bottom(3) == [("b", 0), ("c", 2)]
+        store.clear()
+        assert store.top(3) == []
+
+    def test_top_matches_full_sort(self, store):
+        """It should agree with sorting every counter"""
+        for i in range(200):
+            store.create(f"c{i}", (i * 37) % 101)
+        expected = sorted(store.snapshot().items(), key=lambda item: (item[1], item[0]))
+        assert store.bottom(25) == expected[:25]
+        assert store.top(25) == expected[::-1][:25]
+
+    def test_range(self, store):
+        """It should return the counters within inclusive value bounds in order"""
+        for i, value in enumerate([5, 1, 9, 3, 7, 0, 8, 5]):
+            store.create(f"c{i}", value)
+        assert store.range(3, 7) == [("c3", 3), ("c0", 5), ("c7", 5), ("c4", 7)]
+        assert store.range(min_value=8) == [("c6", 8), ("c2", 9)]
+        assert store.range(max_value=0) == [("c5", 0)]
+        assert store.range(10) == []
+        assert len(store.range()) == 8
+
+    def test_range_pages(self, store):
+        """It should continue a range after a (value, name) position"""
+        for i in range(50):
+            store.create(f"c{i:02}", i % 7)
+        expected = store.range(2, 5)
+        pages, after = [], None
+        while True:
+            page = store.range(2, 5, limit=4, after=after)
+            if not page:
+                break
+            pages.extend(page)
+            name, value = page[-1]
+            after = (value, name)
+        assert pages == expected
+        assert store.range(2, 5, after=(1, "zzz"))[0] == expected[0]
+
+    def test_histogram_bucket(self):
+        """It should bucket values by powers of two"""
+        assert [histogram_bucket(v) for v in [0, 1, 2, 3, 4, 7, 8, 1000]] == [0, 1, 2, 2, 4, 4, 8, 512]
+        assert histogram_bucket(-5) == -4
+
+    def test_aggregates_match_full_recompute(self, store):
+        """It should keep total, count, min, max and histogram equal to a recompute"""
+        rng = random.Random(7)
+        names = [f"c{i}" for i in range(40)]
+        for step in range(3000):
+            name = rng.choice(names)
+            operation = rng.random()
+            if operation < 0.3:
+                store.create(name, rng.randrange(50))
+            elif operation < 0.6:
+                store.increment(name, rng.randrange(1, 20))
+            elif operation < 0.75:
+                store.set(name, rng.randrange(5000))
+            elif operation < 0.85:
+                store.reset(name)
+            elif operation < 0.99:
+                store.delete(name)
+            else:
+                store.clear()
+
+            if step % 100 == 0 or step == 2999:
+                values = list(store.snapshot().values())
+                histogram = {}
+                for value in values:
+                    histogram[histogram_bucket(value)] = histogram.get(histogram_bucket(value), 0) + 1
+                assert store.total() == sum(values)
+                assert store.stats() == {
+                    "count": len(values),
+                    "total": sum(values),
+                    "min": min(values, default=None),
+                    "max": max(values, default=None),
+                    "histogram": dict(sorted(histogram.items())),
+                }
+
+    def test_batch(self, store):
+        """It should apply operations in order and return their results"""
+        results = store.batch([
+            ("create", "a", 0), ("increment", "a", 3), ("create", "a", 0),
+            ("set", "b", 4), ("create", "b", 2), ("delete", "a", None), ("increment", "a", 1),
+        ])
+        assert results == [True, 3, False, None, True, True, None]
+        assert store.snapshot() == {"b": 2}
+
+    def test_batch_refuses_unknown_operations(self, store):
+        """It should not apply any operation of a batch holding an unknown one"""
+        with pytest.raises(ValueError):
+            store.batch([("create", "a", 0), ("explode", "a", None)])
+        assert "a" not in store
+
+    def test_needs_a_shard(self):
+        """It should refuse a store without shards"""
+        with pytest.raises(ValueError):
+            CounterStore(shards=0)
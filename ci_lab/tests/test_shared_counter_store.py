@@ -0,0 +1,174 @@
+"""
+Test Cases for the Shared-Memory Counter Store
+
+What the store has in common with CounterStore is covered by
+test_counter_store.py, these cases cover sharing it between processes
+"""
+import multiprocessing
+import os
+import threading
+import pytest
+from src.shared_counter_store import (
+    INT64_MAX, INT64_MIN, NAME_BYTES, SharedCounterStore, StoreFull, _open_shared_memory,
+    _unlink_shared_memory)
+
+
+@pytest.fixture()
+def shared(tmp_path):
+    """Fixture for the name and lock file of a fresh shared table"""
+    name = f"test_shared_{os.getpid()}"
+    lock_path = str(tmp_path / "counters.lock")
+    store = SharedCounterStore(name, segments=4, slots=64, lock_path=lock_path)
+    yield store, name, lock_path
+    store.unlink()
+    store.close()
+
+
+def increment_all(name, lock_path, names, rounds):
+    """Worker process: attach to the table and increment every name rounds times"""
+    store = SharedCounterStore(name, lock_path=lock_path)
+    for _ in range(rounds):
+        for counter in names:
+            store.increment(counter)
+    store.close()
+
+
+class TestSharedCounterStore:
+    """Test cases for SharedCounterStore"""
+
+    def test_attach_sees_the_same_counters(self, shared):
+        """It should show the changes of one handle to another one"""
+        store, name, lock_path = shared
+        other = SharedCounterStore(name, segments=99, slots=99, lock_path=lock_path)
+        try:
+            store.create("a", 5)
+            assert other.increment("a") == 6
+            assert store.get("a") == 6
+            # the table keeps the size it was created with
+            assert len(other._segments) == 4
+            other.delete("a")
+            assert "a" not in store
+        finally:
+            other.close()
+
+    def test_increments_from_many_processes_are_not_lost(self, shared):
+        """It should not lose increments made from several processes at once"""
+        store, name, lock_path = shared
+        names = [f"c{i}" for i in range(8)]
+        for counter in names:
+            store.create(counter)
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=increment_all, args=(name, lock_path, names, 300))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+        assert store.snapshot() == {counter: 4 * 300 for counter in names}
+        assert store.total() == 8 * 4 * 300
+
+    def test_deleted_slots_are_reused(self, shared):
+        """It should keep room for new counters however many were deleted"""
+        store, _, _ = shared
+        for i in range(1000):
+            assert store.create(f"c{i}", i)
+            assert store.delete(f"c{i}")
+        assert len(store) == 0
+        store.create("a", 1)
+        assert store.snapshot() == {"a": 1}
+
+    def test_full_table(self, shared):
+        """It should raise StoreFull once a segment has no room left"""
+        store, _, _ = shared
+        with pytest.raises(StoreFull):
+            for i in range(4 * 64):
+                store.create(f"c{i}")
+        count = len(store)
+        assert store.total() == 0
+        # a batch reports the full segment for that create only
+        results = store.batch([("create", f"d{i}", 0) for i in range(64)] + [("set", "c0", 3)])
+        assert any(isinstance(result, StoreFull) for result in results)
+        assert results[-1] == 3
+        assert len(store) == count + sum(result is True for result in results)
+
+    def test_unstorable_names(self, shared):
+        """It should refuse to create names a slot cannot hold and not find them"""
+        store, _, _ = shared
+        long_name = "a" * (NAME_BYTES + 1)
+        assert store.create("a" * NAME_BYTES)
+        for name in [long_name, "", "café"]:
+            with pytest.raises(ValueError):
+                store.create(name)
+            assert store.get(name) is None
+            assert store.increment(name) is None
+            assert not store.delete(name)
+        results = store.batch([("increment", long_name, 1), ("delete", long_name, None),
+                               ("create", long_name, 0)])
+        assert results[:2] == [None, False]
+        assert isinstance(results[2], ValueError)
+
+    def test_values_outside_int64(self, shared):
+        """It should refuse values a slot cannot hold and leave the counter unchanged"""
+        store, _, _ = shared
+        with pytest.raises(ValueError):
+            store.create("big", INT64_MAX + 1)
+        assert "big" not in store
+        store.create("a", INT64_MAX - 1)
+        store.create("b", INT64_MAX)
+        assert store.increment("a") == INT64_MAX
+        with pytest.raises(ValueError):
+            store.increment("a")
+        with pytest.raises(ValueError):
+            store.set("a", INT64_MIN - 1)
+        assert store.get("a") == INT64_MAX
+        # the running total is wider than a slot
+        assert store.total() == 2 * INT64_MAX
+        results = store.batch([("increment", "b", 1), ("set", "c", 1), ("set", "b", 0)])
+        assert isinstance(results[0], ValueError)
+        assert results[1:] == [None, 0]
+
+    def test_handles_of_one_process_share_the_locks(self, shared):
+        """It should exclude two handles of one process from each other, and keep one open when the other closes"""
+        store, name, lock_path = shared
+        other = SharedCounterStore(name, lock_path=lock_path)
+        try:
+            assert other._segments[0].lock is store._segments[0].lock
+            assert other._segments[0].lock_fd == store._segments[0].lock_fd
+            store.create("a")
+            threads = [threading.Thread(target=lambda handle: [handle.increment("a") for _ in range(500)],
+                                        args=(handle,))
+                       for handle in [store, other] * 4]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert store.get("a") == 8 * 500
+        finally:
+            other.close()
+        # the descriptor, and with it the locks, stay with the handle still open
+        os.fstat(store._segments[0].lock_fd)
+        assert store.increment("a") == 8 * 500 + 1
+
+    def test_total_waits_for_a_locked_segment(self, shared):
+        """It should read the segment headers under their locks"""
+        store, _, _ = shared
+        store.create("a", 5)
+        totals = []
+        with store._segments[0]:
+            reader = threading.Thread(target=lambda: totals.append((store.total(), len(store))))
+            reader.start()
+            reader.join(0.2)
+            assert reader.is_alive()
+        reader.join()
+        assert totals == [(5, 1)]
+
+    def test_attach_to_foreign_memory(self, tmp_path):
+        """It should refuse shared memory that does not hold a counter table"""
+        block = _open_shared_memory(f"test_foreign_{os.getpid()}", create=True, size=64)
+        try:
+            with pytest.raises(ValueError):
+                SharedCounterStore(block.name, lock_path=str(tmp_path / "foreign.lock"))
+        finally:
+            block.close()
+            _unlink_shared_memory(block)
@@ -1,28 +1,14 @@
 # Author: Matthew Jackson 
 # collects the authors and the dates when they touched each file 
 # in the list of files generated by the adapted file CollectFiles.py
-import json
-import requests
 import csv
 import os
+
+from github_client import github_auth
 print('starting...')
 if not os.path.exists("data"):
  os.makedirs("data")
 
-# GitHub Authentication function
-def github_auth(url, lsttoken, ct):
-    jsonData = None
-    try:
-        ct = ct % len(lstTokens)
-        headers = {'Authorization': 'Bearer {}'.format(lsttoken[ct])}
-        request = requests.get(url, headers=headers)
-        jsonData = json.loads(request.content)
-        ct += 1
-    except Exception as e:
-        pass
-        print(e)
-    return jsonData, ct
-
 # @repo, GitHub repo
 def countfiles(dictfiles, lsttokens, repo, source_ext):
     ipage = 1  # url page counter
@@ -64,29 +50,30 @@ def countfiles(dictfiles, lsttokens, repo, source_ext):
         exit(0)
 # GitHub repo
 repo = 'scottyab/rootbeer'
-print(f"trying repo: {repo}")
 
 # tokens
 lstTokens = []
 
-dictfiles = dict()
-source_ext = [".kt", ".java", ".cpp", ".h", ".c", ".md", ".kts"]
-countfiles(dictfiles, lstTokens, repo, source_ext)
-print('Total number of files: ' + str(len(dictfiles)))
+if __name__ == "__main__":
+    print(f"trying repo: {repo}")
+    dictfiles = dict()
+    source_ext = [".kt", ".java", ".cpp", ".h", ".c", ".md", ".kts"]
+    countfiles(dictfiles, lstTokens, repo, source_ext)
+    print('Total number of files: ' + str(len(dictfiles)))
 
-file = repo.split('/')[1] + "COMMITMORE"
-# change this to the path of your file
-fileOutput = 'data/file_' + file + '.csv'
-rows = ["Filename", "Author", "Date"]
-fileCSV = open(fileOutput, 'w')
-writer = csv.writer(fileCSV)
-writer.writerow(rows)
+    file = repo.split('/')[1] + "COMMITMORE"
+    # change this to the path of your file
+    fileOutput = 'data/file_' + file + '.csv'
+    rows = ["Filename", "Author", "Date"]
+    fileCSV = open(fileOutput, 'w')
+    writer = csv.writer(fileCSV)
+    writer.writerow(rows)
 
-bigcount = None
-bigfilename = None
-for filename, commitData in dictfiles.items():
-    for data in commitData:
-        rows = [filename, data['author'], data['date']]
-        writer.writerow(rows)
-fileCSV.close()
-print(f"saved file to {fileOutput}")
\ No newline at end of file
+    bigcount = None
+    bigfilename = None
+    for filename, commitData in dictfiles.items():
+        for data in commitData:
+            rows = [filename, data['author'], data['date']]
+            writer.writerow(rows)
+    fileCSV.close()
+    print(f"saved file to {fileOutput}")
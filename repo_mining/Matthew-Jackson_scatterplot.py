@@ -7,46 +7,67 @@ import matplotlib.patches as mpatches
 import csv
 import os
 
+from touch_columnar import preferred_path
+from touch_cube import touch_points, update_cube
+from touch_density import MAX_FILE_LABELS, draw_density, use_density
+
 #change file paths as needed
 file = "scatterplot"
-fileOutput = "C:/Users/HP/Desktop/Projects/cs472/group-8/repo_mining/data/RootbeerCommit.png"
-csv_file = "C:/Users/HP/Desktop/Projects/cs472/group-8/repo_mining/data/file_rootbeerCOMMITMORE.csv"
-CommitDF = pd.read_csv(csv_file)
-
-# return weeks since start date
-CommitDF['Date'] = pd.to_datetime(CommitDF['Date'])
-start = CommitDF['Date'].min()
-CommitDF['Week'] = (CommitDF['Date'] - start).dt.days // 7
-
-files = CommitDF['Filename']
-authors = CommitDF['Author'].unique()
-
-# scatter plot
-cmap = plt.get_cmap('tab20')
-author_cmap = {author: cmap(i%20) for i, author in enumerate(authors)}
-CommitDF['Color'] = CommitDF['Author'].map(author_cmap)
-
-plt.figure(figsize=(14,10))
-scatterplot = plt.scatter(
-    x=CommitDF['Week'],
-    y=CommitDF['Filename'],
-    c=CommitDF['Color'],
-    alpha=0.6,
-    edgecolors='w',
-    s=100)
-
-plt.yticks(fontsize=6)
-
-plt.title("Timine of modification by Author and Density")
-plt.xlabel("weeks since start")
-plt.ylabel("Files Modified")
-plt.grid(True, linestyle='--', alpha=0.2)
-
-legend = [
-    mpatches.Patch(color=color, label=author)
-    for author, color, in author_cmap.items()
-]
-plt.legend(handles=legend, title="Authors")
-
-plt.savefig(fileOutput)
-plt.show()
\ No newline at end of file
+fileOutput = "data/RootbeerCommit.png"
+csv_file = "data/file_rootbeerCOMMITMORE.csv"
+# "scatter", "density" (week x file grid colored by the main author of each
+# cell, for very large repos) or "auto"
+render_mode = "auto"
+
+if __name__ == "__main__":
+    # weekly touch cube of the csv (or its .parquet/.feather copy), updated with
+    # the rows added since the last run
+    cube = update_cube(preferred_path(csv_file), 'Filename', 'Author', 'Date')
+
+    # return weeks since the start week
+    start = cube['Week'].min()
+    authors = cube['Author'].unique()
+
+    cmap = plt.get_cmap('tab20')
+    author_cmap = {author: cmap(i%20) for i, author in enumerate(authors)}
+
+    plt.figure(figsize=(14,10))
+    if use_density(render_mode, cube['Touches'].sum()):
+        # binned straight from the cube rows, weighted by their touches;
+        # files and authors numbered in order of first appearance, like the scatter axis
+        weeks = (cube['Week'] - start).dt.days // 7
+        file_codes, file_names = pd.factorize(cube['File'])
+        author_codes, _ = pd.factorize(cube['Author'])
+        draw_density(plt.gca(), weeks, file_codes, author_codes,
+                     weeks.max() + 1, len(file_names),
+                     [author_cmap[author] for author in authors], weights=cube['Touches'])
+        if len(file_names) <= MAX_FILE_LABELS:
+            plt.yticks(range(len(file_names)), file_names)
+    else:
+        # scatter plot, expanded back to one row per touch
+        CommitDF = touch_points(cube)
+        CommitDF['Week'] = (CommitDF['Week'] - start).dt.days // 7
+        CommitDF['Color'] = CommitDF['Author'].astype(object).map(author_cmap)
+        scatterplot = plt.scatter(
+            x=CommitDF['Week'],
+            y=CommitDF['File'],
+            c=CommitDF['Color'],
+            alpha=0.6,
+            edgecolors='w',
+            s=100)
+
+    plt.yticks(fontsize=6)
+
+    plt.title("Timine of modification by Author and Density")
+    plt.xlabel("weeks since start")
+    plt.ylabel("Files Modified")
+    plt.grid(True, linestyle='--', alpha=0.2)
+
+    legend = [
+        mpatches.Patch(color=color, label=author)
+        for author, color, in author_cmap.items()
+    ]
+    plt.legend(handles=legend, title="Authors")
+
+    plt.savefig(fileOutput)
+    plt.show()
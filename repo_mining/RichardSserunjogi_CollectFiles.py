@@ -1,72 +1,76 @@
-import json
-import requests
 import csv
 
 import os
 
+from github_client import API_ROOT, github_auth
+from commit_fetcher import iter_commit_details, MAX_WORKERS
+from crawl_journal import CrawlJournal, journal_path, stub_commit
+import git_backend
+from mining_state import (commit_checkpoint, load_checkpoint, read_touch_counts,
+                          save_checkpoint)
+
 if not os.path.exists("data"):
  os.makedirs("data")
 
  
 
-# GitHub Authentication function
-def github_auth(url, lsttoken, ct):
-    jsonData = None
-    try:
-        ct = ct % len(lstTokens)
-        headers = {'Authorization': 'Bearer {}'.format(lsttoken[ct])}
-        request = requests.get(url, headers=headers)
-        jsonData = json.loads(request.content)
-        ct += 1
-    except Exception as e:
-        pass
-        print(e)
-    return jsonData, ct
-
 # @dictFiles, empty dictionary of files
 # @lstTokens, GitHub authentication tokens
 # @repo, GitHub repo
-def countfiles(dictfiles, lsttokens, repo):
-    ipage = 1  # url page counter
-    ct = 0  # token counter
-
+# @checkpoint, newest commit of the last run, only newer commits are counted
+# @api, 'rest' or 'graphql', how the commit history is listed
+# Returns the checkpoint of the newest commit seen, for the next run
+# Progress is journaled (see crawl_journal.py): if the crawl fails, running it
+# again resumes after the last commit that was counted.
+def countfiles(dictfiles, lsttokens, repo, max_workers=MAX_WORKERS, checkpoint=None, api='rest'):
     # detect languages once
     languages = get_repo_languages(repo, lsttokens)
     print("Detected languages:", languages)
-    
+
+    since = checkpoint['date'] if checkpoint else None
+    newest = checkpoint
+    journal = CrawlJournal(journal_path(repo, 'countfiles'),
+                           {'repo': repo, 'since': since, 'api': api})
+    if journal.resumed:
+        print(f"Resuming from {journal.path}: {len(journal.commits)} commits already counted")
+        for files in journal.commits.values():
+            for filename in files:
+                dictfiles[filename] = dictfiles.get(filename, 0) + 1
+        first = journal.pages[0][3] if journal.pages else []
+        if first and not (checkpoint and first[0]['sha'] == checkpoint['sha']):
+            newest = commit_checkpoint(stub_commit(first[0]))
     try:
-        # loop though all the commit pages until the last returned empty page
-        while True:
-            spage = str(ipage)
-            commitsUrl = 'https://api.github.com/repos/' + repo + '/commits?page=' + spage + '&per_page=100'
-            jsonCommits, ct = github_auth(commitsUrl, lsttokens, ct)
-
-            # break out of the while loop if there are no more commits in the pages
-            if len(jsonCommits) == 0:
+        # commit pages and the per-commit details are fetched concurrently,
+        # max_workers bounds the number of requests in flight
+        for shaObject, shaDetails in iter_commit_details(repo, lsttokens, max_workers, since, api,
+                                                         journal):
+            # since= is inclusive, stop at the commit the last run ended on
+            if checkpoint and shaObject['sha'] == checkpoint['sha']:
                 break
-            # iterate through the list of commits in  spage
-            for shaObject in jsonCommits:
-                sha = shaObject['sha']
-                # For each commit, use the GitHub commit API to extract the files touched by the commit
-                shaUrl = 'https://api.github.com/repos/' + repo + '/commits/' + sha
-                shaDetails, ct = github_auth(shaUrl, lsttokens, ct)
-                filesjson = shaDetails['files']
-                for filenameObj in filesjson:
-                    filename = filenameObj['filename']
-                    # if not is_source_file(filename, languages):
-                    #     continue
-                    # dictfiles[filename] = dictfiles.get(filename, 0) + 1
-                    # print(filename)
-                    if not filename:
-                        continue
-                    # ONLY count source files
-                    if is_source_file(filename, languages):
-                        dictfiles[filename] = dictfiles.get(filename, 0) + 1
-                        print(filename)
-            ipage += 1
+            if newest is checkpoint:
+                newest = commit_checkpoint(shaObject)
+            counted = []
+            filesjson = shaDetails['files']
+            for filenameObj in filesjson:
+                filename = filenameObj['filename']
+                # if not is_source_file(filename, languages):
+                #     continue
+                # dictfiles[filename] = dictfiles.get(filename, 0) + 1
+                # print(filename)
+                if not filename:
+                    continue
+                # ONLY count source files
+                if is_source_file(filename, languages):
+                    dictfiles[filename] = dictfiles.get(filename, 0) + 1
+                    counted.append(filename)
+                    print(filename)
+            journal.commit_done(shaObject['sha'], counted)
     except:
-        print("Error receiving data")
-        exit(0)
+        journal.close()
+        print("Error receiving data, run again to resume from " + journal.path)
+        exit(1)
+    journal.finish()
+    return newest
 
 
 # Retrieve the set of languages used in the given GitHub repo
@@ -76,7 +80,7 @@ def get_repo_languages(repo, lsttokens):
     GET https://api.github.com/repos/{owner}/{repo}/languages
     Returns a set of language names, e.g. {"Java", "Kotlin", "C++", "CMake"}.
     """
-    url = f"https://api.github.com/repos/{repo}/languages"
+    url = f"{API_ROOT}/repos/{repo}/languages"
     data, _ = github_auth(url, lsttokens, 0)
     if data:
         return set(data.keys())
@@ -120,29 +124,50 @@ repo = 'scottyab/rootbeer'
 lstTokens = ["",
              "" ]
 
-languages = get_repo_languages(repo, lstTokens)
-print(f"Repo languages: {languages}")
-
-dictfiles = dict()
-countfiles(dictfiles, lstTokens, repo)
-print('Total number of files: ' + str(len(dictfiles)))
-
-
-file = repo.split('/')[1]
-# change this to the path of your file
-fileOutput = 'data/file_' + file + '.csv'
-rows = ["Filename", "Touches"]
-fileCSV = open(fileOutput, 'w')
-writer = csv.writer(fileCSV)
-writer.writerow(rows)
-
-bigcount = None
-bigfilename = None
-for filename, count in dictfiles.items():
-    rows = [filename, count]
+# "api" mines through the GitHub REST API, "graphql" lists the commit history
+# through the GraphQL API (file lists still come from REST), "git" through a
+# local clone of the repo in data/clones/ (set LOCAL_CLONE to reuse an existing
+# clone or a local bare repo, which runs without any network access)
+BACKEND = "api"
+LOCAL_CLONE = None
+
+if __name__ == "__main__":
+    file = repo.split('/')[1]
+    # change this to the path of your file
+    fileOutput = 'data/file_' + file + '.csv'
+
+    if BACKEND == "git":
+        # no API call for the repo languages, every language we know counts as source
+        repo_path = git_backend.clone_or_fetch(repo, LOCAL_CLONE)
+        dictfiles = git_backend.countfiles(
+            dict(), repo_path, lambda f: is_source_file(f, LANGUAGE_EXTENSIONS.keys()))
+        # the counts cover the clone up to HEAD, a later API run goes on from there
+        checkpoint = git_backend.head_checkpoint(repo_path)
+    else:
+        languages = get_repo_languages(repo, lstTokens)
+        print(f"Repo languages: {languages}")
+
+        # incremental mode: start from the counts of the last run and only mine the
+        # commits made since then, delete data/mining_state.json to rebuild from scratch
+        checkpoint = load_checkpoint(repo, fileOutput)
+        dictfiles = read_touch_counts(fileOutput) if checkpoint else dict()
+        checkpoint = countfiles(dictfiles, lstTokens, repo, checkpoint=checkpoint,
+                                api="graphql" if BACKEND == "graphql" else "rest")
+    print('Total number of files: ' + str(len(dictfiles)))
+
+    rows = ["Filename", "Touches"]
+    fileCSV = open(fileOutput, 'w')
+    writer = csv.writer(fileCSV)
     writer.writerow(rows)
-    if bigcount is None or count > bigcount:
-        bigcount = count
-        bigfilename = filename
-fileCSV.close()
-print('The file ' + bigfilename + ' has been touched ' + str(bigcount) + ' times.')
+
+    bigcount = None
+    bigfilename = None
+    for filename, count in dictfiles.items():
+        rows = [filename, count]
+        writer.writerow(rows)
+        if bigcount is None or count > bigcount:
+            bigcount = count
+            bigfilename = filename
+    fileCSV.close()
+    save_checkpoint(repo, fileOutput, checkpoint)
+    print('The file ' + bigfilename + ' has been touched ' + str(bigcount) + ' times.')
@@ -1,10 +1,19 @@
 
 import csv
 import os
-import time
 
-# Reuse github_auth + countfiles from Richard_CollectFiles.py
-from RichardSserunjogi_CollectFiles import github_auth, countfiles
+# Reuse the language detection and source file filter from RichardSserunjogi_CollectFiles.py
+from RichardSserunjogi_CollectFiles import (get_repo_languages, is_source_file,
+                                            LANGUAGE_EXTENSIONS)
+from commit_fetcher import iter_commit_details, MAX_WORKERS
+from crawl_journal import CrawlJournal, JOURNAL_DIR, journal_path, stub_commit
+from github_client import API_ROOT, github_auth
+from graphql_fetcher import iter_history
+import git_backend
+from touch_writer import TouchWriter
+from touch_columnar import ParquetTouchWriter
+from mining_state import (commit_checkpoint, load_checkpoint, read_touch_counts,
+                          save_checkpoint, STATE_PATH)
 
 
 # Configurations
@@ -12,100 +21,321 @@ repo = "scottyab/rootbeer"
 lstTokens = ["", ""] #DO NOT COMMIT real tokens
 
 OUTPUT_CSV = "data/file_touches_authors_dates.csv"
+COUNTS_CSV = "data/file_" + repo.split("/")[1] + ".csv"
 PER_PAGE = 100
 
+TOUCH_HEADER = ["Filename", "CommitSHA", "AuthorLogin", "AuthorName", "AuthorEmail", "CommitDate"]
+TOUCH_FIELDS = ["filename", "sha", "author_login", "author_name", "author_email", "date_iso"]
+
+# "csv", or "parquet" for a typed columnar dataset (dictionary encoded file
+# and author columns, native timestamps; needs pyarrow, see touch_columnar.py)
+OUTPUT_FORMAT = "csv"
+OUTPUT_PARQUET = "data/file_touches_authors_dates.parquet"
+TOUCH_OUTPUT = OUTPUT_PARQUET if OUTPUT_FORMAT == "parquet" else OUTPUT_CSV
+
+# "api" mines through the GitHub REST API, "graphql" lists the commit history
+# through GraphQL, "git" uses a local clone (see RichardSserunjogi_CollectFiles.py)
+BACKEND = "api"
+LOCAL_CLONE = None
+
+
+# Non-empty REST /commits?path= pages of one file as (page number, commits)
+def iter_path_pages(repo, filename, lstTokens, since=None, until=None, page=1):
+    while True:
+        safe_filename = filename.replace(" ", "%20")
+
+        commitsUrl = (
+            f"{API_ROOT}/repos/{repo}/commits"
+            f"?path={safe_filename}&page={page}&per_page={PER_PAGE}"
+        )
+        if since:
+            commitsUrl += f"&since={since}"
+        if until:
+            commitsUrl += f"&until={until}"
+
+        jsonCommits, _ = github_auth(commitsUrl, lstTokens, 0)
+
+        # stop if no more commits for this file
+        if not jsonCommits:
+            break
+
+        yield page, jsonCommits
+        page += 1
+
+
+# Commits touching one file, through REST /commits?path= pages
+def iter_path_commits(repo, filename, lstTokens, since=None, until=None):
+    for _, jsonCommits in iter_path_pages(repo, filename, lstTokens, since, until):
+        yield from jsonCommits
+
+
+# Touch rows of one file from a page of its commits
+def file_touch_rows(filename, commits, since=None):
+    rows = []
+    for commitObj in commits:
+        sha = commitObj.get("sha")
+
+        # since= is inclusive, this commit is already in the output
+        if since and sha == since["sha"]:
+            continue
+
+        # GitHub user (may be None)
+        authorObj = commitObj.get("author") or {}
+        author_login = authorObj.get("login")
+
+        # Commit metadata (always present)
+        commitMeta = commitObj.get("commit") or {}
+        commitAuthor = commitMeta.get("author") or {}
+
+        rows.append({
+            "filename": filename,
+            "sha": sha,
+            "author_login": author_login,
+            "author_name": commitAuthor.get("name"),
+            "author_email": commitAuthor.get("email"),
+            "date_iso": commitAuthor.get("date")
+        })
+    return rows
+
 
 # Collect touches per file (author + date)
-def collect_file_touches(repo, source_files, lstTokens):
+def collect_file_touches(repo, source_files, lstTokens, since=None, until=None, api="rest",
+                         rows=None, journal=False):
     """
     For each source file, fetch commits touching that file and
     collect (author, date) information.
+    In incremental mode `since` is the checkpoint of the last run and
+    `until` the newest commit seen by countfiles, only commits between
+    the two are collected.
+    With api="graphql" each request returns 100 commits of the file's
+    history through GraphQL instead of REST.
+    Rows are appended to `rows` as they arrive; pass a TouchWriter to
+    stream them to disk instead of keeping them in a list.
+    With journal=True every finished page is journaled (crawl_journal.py):
+    if the crawl is interrupted, calling it again with the same arguments
+    replays the rows of the finished pages into `rows` and goes on with the
+    next page. Over GraphQL a file is journaled once all of its history is in.
     """
-    ct = 0
-    rows = []
+    rows = [] if rows is None else rows
+    since_date = since["date"] if since else None
+    until_date = until["date"] if until else None
+
+    if not journal:
+        for idx, filename in enumerate(source_files, start=1):
+            print(f"[{idx}/{len(source_files)}] Processing: {filename}")
+
+            if api == "graphql":
+                commits = iter_history(repo, lstTokens, since_date, until_date, path=filename)
+            else:
+                commits = iter_path_commits(repo, filename, lstTokens, since_date, until_date)
+            rows.extend(file_touch_rows(filename, commits, since))
+        return rows
+
+    journal = CrawlJournal(journal_path(repo, "file_touches"),
+                           {"repo": repo, "since": since, "until": until, "api": api,
+                            "files": list(source_files)})
+    if journal.resumed:
+        print(f"Resuming from {journal.path}: {len(journal.files_done)} files already collected")
+    # without an upper bound the pages would shift as new commits land
+    until_date = until_date or journal.until
 
     for idx, filename in enumerate(source_files, start=1):
+        pages = journal.file_pages.get(filename, [])
+        for page_rows in pages:
+            rows.extend(page_rows)
+        if filename in journal.files_done:
+            continue
         print(f"[{idx}/{len(source_files)}] Processing: {filename}")
 
-        page = 1
-        while True:
-            safe_filename = filename.replace(" ", "%20")
+        if api == "graphql":
+            commits = iter_history(repo, lstTokens, since_date, until_date, path=filename)
+            file_rows = file_touch_rows(filename, commits, since)
+            rows.extend(file_rows)
+            journal.file_page_done(filename, file_rows, True)
+            continue
 
-            commitsUrl = (
-                f"https://api.github.com/repos/{repo}/commits"
-                f"?path={safe_filename}&page={page}&per_page={PER_PAGE}"
-            )
+        for _, jsonCommits in iter_path_pages(repo, filename, lstTokens, since_date,
+                                              until_date, page=len(pages) + 1):
+            page_rows = file_touch_rows(filename, jsonCommits, since)
+            rows.extend(page_rows)
+            journal.file_page_done(filename, page_rows, False)
+        journal.file_page_done(filename, [], True)
 
-            jsonCommits, ct = github_auth(commitsUrl, lstTokens, ct)
+    journal.finish()
+    return rows
 
-            # stop if no more commits for this file
-            if not jsonCommits:
-                break
 
-            for commitObj in jsonCommits:
-                sha = commitObj.get("sha")
+# Collect touch counts and touches (author + date) in a single pass
+def collect_counts_and_touches(repo, lstTokens, checkpoint=None, max_workers=MAX_WORKERS,
+                               api="rest", rows=None, journal_dir=JOURNAL_DIR):
+    """
+    Walk the commit history once and build both outputs: the touch count
+    of every source file (file_<repo>.csv) and one row per touch with the
+    commit's author and date (file_touches_authors_dates.csv).
+    This replaces countfiles followed by the per-file /commits?path= crawl
+    of collect_file_touches, which fetched every commit once per file it
+    touched. With a checkpoint only the commits made since are collected.
+    api="graphql" lists the history through GraphQL, see iter_commit_details.
+    Touch rows are appended to `rows` (a list, or a TouchWriter to stream them).
+    Progress is journaled like countfiles (crawl_journal.py): if the crawl
+    fails, calling it again with the same arguments replays the commits
+    already collected into `rows` and only fetches the others.
+    Returns (dictfiles, rows, newest checkpoint).
+    """
+    languages = get_repo_languages(repo, lstTokens)
+    print("Detected languages:", languages)
 
-                # GitHub user (may be None)
-                authorObj = commitObj.get("author") or {}
-                author_login = authorObj.get("login")
+    dictfiles = {}
+    rows = [] if rows is None else rows
+    since = checkpoint["date"] if checkpoint else None
+    newest = checkpoint
+    journal = CrawlJournal(journal_path(repo, "touches", journal_dir),
+                           {"repo": repo, "since": since, "api": api})
+    if journal.resumed:
+        print(f"Resuming from {journal.path}: {len(journal.commits)} commits already collected")
+        for commit_rows in journal.commits.values():
+            for row in commit_rows:
+                dictfiles[row["filename"]] = dictfiles.get(row["filename"], 0) + 1
+                rows.append(row)
+        first = journal.pages[0][3] if journal.pages else []
+        if first and not (checkpoint and first[0]["sha"] == checkpoint["sha"]):
+            newest = commit_checkpoint(stub_commit(first[0]))
 
-                # Commit metadata (always present)
-                commitMeta = commitObj.get("commit") or {}
-                commitAuthor = commitMeta.get("author") or {}
+    try:
+        for shaObject, shaDetails in iter_commit_details(repo, lstTokens, max_workers, since, api,
+                                                         journal):
+            sha = shaObject["sha"]
+            # since= is inclusive, stop at the commit the last run ended on
+            if checkpoint and sha == checkpoint["sha"]:
+                break
+            if newest is checkpoint:
+                newest = commit_checkpoint(shaObject)
 
-                rows.append({
+            # a failed request gives GitHub's error message or None, not a commit
+            # that touched nothing: fail before a checkpoint skips past it
+            filesjson = shaDetails.get("files") if isinstance(shaDetails, dict) else None
+            if not isinstance(filesjson, list):
+                raise RuntimeError(f"Could not fetch the files of commit {sha}: {shaDetails}")
+
+            authorObj = shaDetails.get("author") or {}
+            commitAuthor = (shaDetails.get("commit") or {}).get("author") or {}
+
+            commit_rows = []
+            for filenameObj in filesjson:
+                filename = filenameObj.get("filename")
+                if not filename or not is_source_file(filename, languages):
+                    continue
+                dictfiles[filename] = dictfiles.get(filename, 0) + 1
+                commit_rows.append({
                     "filename": filename,
                     "sha": sha,
-                    "author_login": author_login,
+                    "author_login": authorObj.get("login"),
                     "author_name": commitAuthor.get("name"),
                     "author_email": commitAuthor.get("email"),
                     "date_iso": commitAuthor.get("date")
                 })
+            rows.extend(commit_rows)
+            journal.commit_done(sha, commit_rows)
+    except BaseException:
+        journal.close()
+        print("Error receiving data, run again to resume from " + journal.path)
+        raise
+    journal.finish()
 
-            page += 1
+    return dictfiles, rows, newest
 
-    return rows
 
-
-# Write output to CSV 
-def write_touches_csv(output_path, rows):
+# Write touch counts to CSV (same format as RichardSserunjogi_CollectFiles.py)
+def write_counts_csv(output_path, dictfiles):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    with open(output_path, "w", newline="", encoding="utf-8") as f:
+    # written next to the output first, so a crash never leaves half of it
+    tmp = output_path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "Filename",
-            "CommitSHA",
-            "AuthorLogin",
-            "AuthorName",
-            "AuthorEmail",
-            "CommitDate"
-        ])
-
-        for r in rows:
-            writer.writerow([
-                r["filename"],
-                r["sha"],
-                r["author_login"],
-                r["author_name"],
-                r["author_email"],
-                r["date_iso"]
-            ])
+        writer.writerow(["Filename", "Touches"])
+        for filename, count in dictfiles.items():
+            writer.writerow([filename, count])
+    os.replace(tmp, output_path)
 
 
-if __name__ == "__main__":
-    # 1) Call adapted countfiles() from Richard_CollectFiles.py
-    #    This already filters to SOURCE FILES ONLY
-    source_files_dict = {}
-    countfiles(source_files_dict, lstTokens, repo)
+# Write output to CSV 
+def write_touches_csv(output_path, rows, append=False):
+    # appended rows go under the header of the existing file
+    with TouchWriter(output_path, TOUCH_HEADER, TOUCH_FIELDS, append=append) as writer:
+        writer.extend(rows)
+
+
+# Streaming writer for touch rows, a parquet dataset when output_path ends in
+# .parquet (see OUTPUT_FORMAT), a csv otherwise; see touch_writer.py and
+# touch_columnar.py. The rows are staged: they only reach output_path when
+# the writer's commit() is called.
+def open_touches(output_path, append=False):
+    if output_path.endswith(".parquet"):
+        return ParquetTouchWriter(
+            output_path, TOUCH_HEADER, TOUCH_FIELDS, append=append,
+            dictionary_columns=["Filename", "AuthorLogin", "AuthorName", "AuthorEmail"],
+            timestamp_columns=["CommitDate"], staged=True)
+    return TouchWriter(output_path, TOUCH_HEADER, TOUCH_FIELDS, append=append, staged=True)
+
 
-    source_files = list(source_files_dict.keys())
-    print(f"Total source files detected: {len(source_files)}")
+# Mines one repo into counts_csv and touch_output
+def mine_repo(repo, lstTokens, counts_csv=COUNTS_CSV, touch_output=TOUCH_OUTPUT,
+              backend=BACKEND, local_clone=LOCAL_CLONE, max_workers=MAX_WORKERS, sink=None,
+              state_path=STATE_PATH, journal_dir=JOURNAL_DIR):
+    """
+    Runs the single-pass collection for `repo` with the given backend
+    ("api", "graphql" or "git") and writes both outputs, incrementally
+    where a checkpoint allows it.
+    `sink`, when given, is called with the touch writer and returns the
+    list-like object rows are appended to, e.g. to count them for progress.
+    `state_path` is the checkpoint file and `journal_dir` where the crawl
+    journal is kept.
+    Returns the touch counts per file.
+    """
+    sink = sink or (lambda rows: rows)
+    if backend == "git":
+        # one git log pass over a local clone, no API requests
+        repo_path = git_backend.clone_or_fetch(repo, local_clone)
+        with open_touches(touch_output) as touches:
+            counts, _ = git_backend.collect_counts_and_touches(
+                repo_path, lambda f: is_source_file(f, LANGUAGE_EXTENSIONS.keys()), sink(touches))
+            touches.commit()
+        write_counts_csv(counts_csv, counts)
+        # both outputs now cover the clone's HEAD, a later api or graphql run
+        # continues from there instead of appending to them from an older checkpoint
+        newest = git_backend.head_checkpoint(repo_path)
+        save_checkpoint(repo, counts_csv, newest, state_path)
+        save_checkpoint(repo, touch_output, newest, state_path)
+        return counts
+
+    # Both csv files come from one traversal of the commit list. In
+    # incremental mode only commits since the last run are collected and
+    # merged in; if the two outputs are out of step, both are rebuilt.
+    checkpoint = load_checkpoint(repo, touch_output, state_path)
+    if checkpoint != load_checkpoint(repo, counts_csv, state_path):
+        checkpoint = None
 
-    # 2) Collect author + date touches
-    touches = collect_file_touches(repo, source_files, lstTokens)
+    # touch rows are staged as they are mined and only added to the output
+    # (after the existing rows) together with the counts and the checkpoint,
+    # so an interrupted run leaves the outputs as the last checkpoint has them
+    with open_touches(touch_output, append=checkpoint is not None) as touches:
+        new_counts, _, newest = collect_counts_and_touches(
+            repo, lstTokens, checkpoint, max_workers,
+            api="graphql" if backend == "graphql" else "rest", rows=sink(touches),
+            journal_dir=journal_dir)
+        counts = read_touch_counts(counts_csv) if checkpoint else {}
+        for filename, count in new_counts.items():
+            counts[filename] = counts.get(filename, 0) + count
+        print(f"Total source files detected: {len(counts)}")
 
-    # 3) Write results to CSV
-    write_touches_csv(OUTPUT_CSV, touches)
+        touches.commit()
+    write_counts_csv(counts_csv, counts)
+    save_checkpoint(repo, counts_csv, newest, state_path)
+    save_checkpoint(repo, touch_output, newest, state_path)
+    return counts
 
-    print(f"Done. Output written to: {OUTPUT_CSV}")
+
+if __name__ == "__main__":
+    mine_repo(repo, lstTokens)
+    print(f"Done. Output written to: {COUNTS_CSV} and {TOUCH_OUTPUT}")
@@ -1,9 +1,15 @@
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.dates as mdates
+from matplotlib.lines import Line2D
 import os
 
+from figure_jobs import HASH_PATH, FigureJob, render_jobs
+from touch_columnar import preferred_path
+from touch_cube import ranked, touch_points, update_cube
+
 # Configurations
 CSV_PATH = "data/file_touches_authors_dates.csv"
 TOP_N_FILES = 50
@@ -19,157 +25,177 @@ OUTPUT_FIG_TOP_FILES = "data/figures/top_files.png"
 OUTPUT_FIG_BOTTOM_AUTHORS = "data/figures/bottom_authors.png"
 OUTPUT_FIG_BOTTOM_FILES = "data/figures/bottom_files.png"
 
-# Load & preprocess
-df = pd.read_csv(CSV_PATH)
-df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce", utc=True)
-df = df.dropna(subset=[DATE_COL, FILE_COL])
-df[AUTHOR_COL] = df[AUTHOR_COL].fillna("unknown").astype(str)
-
-# Short file names
-df["ShortFile"] = df[FILE_COL].apply(lambda x: os.path.basename(x))
 
-# Week start (calendar)
-df["WeekStart"] = df[DATE_COL].dt.to_period("W").dt.start_time
+# Figures are drawn by figure_jobs worker processes on plain Figure objects,
+# so each renderer only gets the figure and the data it plots.
 
-# Numeric project week (0 = first week of project)
-project_start = df["WeekStart"].min()
-df["ProjectWeek"] = ((df["WeekStart"] - project_start).dt.days // 7).astype(int)
+# One proxy artist per author for the legend
+def author_legend(ax, authors, author_colors, **kwargs):
+    handles = [Line2D([], [], linestyle="", marker="o", markersize=35 ** 0.5,
+                      alpha=0.75, color=color, label=author)
+               for author, color in zip(authors, author_colors)]
+    ax.legend(handles=handles, title="Author", bbox_to_anchor=(1.02, 1), loc="upper left",
+              **kwargs)
 
-# Reduce to top-N files
-top_files = df["ShortFile"].value_counts().head(TOP_N_FILES).index.tolist()
-dff = df[df["ShortFile"].isin(top_files)].copy()
 
-# Map files to x positions
-file_to_x = {f: i for i, f in enumerate(top_files)}
-dff["x"] = dff["ShortFile"].map(file_to_x)
+def set_xtick_labels(ax, **kwargs):
+    for label in ax.get_xticklabels():
+        label.set(**kwargs)
 
-# Colors per author (use matplotlib defaults)
-authors = sorted(dff[AUTHOR_COL].unique())
-color_cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
-author_to_color = {a: color_cycle[i % len(color_cycle)] for i, a in enumerate(authors)}
 
 # Plot 1: Showing Calendar weeks on Y-axis
-plt.figure(figsize=(16, 10))
-for author in authors:
-    sub = dff[dff[AUTHOR_COL] == author]
-    plt.scatter(sub["x"], sub["WeekStart"], label=author, s=35, alpha=0.75,
-                c=author_to_color[author])
+def render_weeks_calendar(fig, top_files, point_x, point_weeks, point_colors,
+                          authors, author_colors):
+    ax = fig.add_subplot()
+    ax.scatter(point_x, point_weeks, s=35, alpha=0.75, c=point_colors)
 
-plt.xticks(range(len(top_files)), top_files, rotation=45, ha="right")
-plt.xlabel("File")
+    ax.set_xticks(range(len(top_files)), top_files, rotation=45, ha="right")
+    ax.set_xlabel("File")
 
-ax = plt.gca()
-ax.yaxis.set_major_locator(mdates.MonthLocator(interval=3))
-ax.yaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
-plt.ylabel("Weeks")
+    ax.yaxis.set_major_locator(mdates.MonthLocator(interval=3))
+    ax.yaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
+    ax.set_ylabel("Weeks")
 
-plt.title("Source File Touches Over Time — Weeks vs Files (Colored by Author)")
-plt.legend(title="Author", bbox_to_anchor=(1.02, 1), loc="upper left")
-plt.tight_layout()
+    ax.set_title("Source File Touches Over Time — Weeks vs Files (Colored by Author)")
+    author_legend(ax, authors, author_colors)
+    fig.tight_layout()
 
-os.makedirs(os.path.dirname(OUTPUT_FIG_CAL), exist_ok=True)
-plt.savefig(OUTPUT_FIG_CAL, dpi=300)
-#plt.show()
 
 # Plot 2: Showing Numeric project weeks on Y-axis (Main scatter plot required for the exercise)
-plt.figure(figsize=(12, 6))
-for author in authors:
-    sub = dff[dff[AUTHOR_COL] == author]
-    plt.scatter(sub["x"], sub["ProjectWeek"], label=author, s=35, alpha=0.75,
-                c=author_to_color[author])
-
-plt.xticks(range(len(top_files)), top_files, rotation=45, ha="right",fontsize=10)
-plt.xlabel("File",  fontsize=12)
-plt.ylabel("Project Weeks (0 = project start)",  fontsize=12)
-
-# Make numeric scale readable
-plt.yticks(range(0, dff["ProjectWeek"].max() + 1, 25), fontsize=10)
-
-plt.title("Source File Touches Over Project Lifetime — Weeks vs Files (Colored by Author)", fontsize=14)
-plt.legend(title="Author", bbox_to_anchor=(1.02, 1), loc="upper left", fontsize=9)
-plt.tight_layout()
-os.makedirs(os.path.dirname(OUTPUT_FIG_NUM), exist_ok=True)
-plt.savefig(OUTPUT_FIG_NUM, dpi=300, bbox_inches="tight")
-#plt.show()
-
-OUTPUT_FIG_CAL, OUTPUT_FIG_NUM
-
-
-### Additional Insights for the executive summary report..
-
-# parse dates
-df['CommitDate'] = pd.to_datetime(df['CommitDate'])
-
-# top authors by touches
-top_authors = df['AuthorLogin'].value_counts().head(15)
-
-top_files = df['ShortFile'].value_counts().head(15)
-
-bottom_authors = df['AuthorLogin'].value_counts().tail(15)
-
-bottom_files = df['ShortFile'].value_counts().tail(15)
-
-top_authors, top_files , bottom_authors , bottom_files
-
-
-plt.figure(figsize=(12, 4))  
-
-plt.subplot(1, 2, 1)
-top_files.plot(kind="bar")
-plt.title("Top Source Files by Touches", fontsize=14)
-plt.ylabel("Number of Touches", fontsize=12)
-plt.xlabel("File", fontsize=12)
-plt.xticks(rotation=45, ha="right", fontsize=10)
-
-plt.subplot(1, 2, 2)
-top_authors.plot(kind="bar")
-plt.title("Top Authors by Source-File Touches", fontsize=14)
-plt.ylabel("Number of Touches", fontsize=12)
-plt.xlabel("Author", fontsize=12)
-plt.xticks(rotation=45, ha="right", fontsize=10)
-
-plt.tight_layout()
-#plt.savefig("figures/bar_charts.png", dpi=300, bbox_inches="tight")
-os.makedirs(os.path.dirname(OUTPUT_FIG_TOP_AUTHORS_AND_FILES), exist_ok=True)
-plt.savefig(OUTPUT_FIG_TOP_AUTHORS_AND_FILES, dpi=300,bbox_inches="tight")
-#plt.show()
-
-plt.figure()
-top_authors.plot(kind='bar')
-plt.title("Top Authors by Source-File Touches")
-plt.ylabel("Number of Touches")
-plt.xlabel("Author")
-plt.tight_layout()
-os.makedirs(os.path.dirname(OUTPUT_FIG_TOP_AUTHORS), exist_ok=True)
-plt.savefig(OUTPUT_FIG_TOP_AUTHORS, dpi=300)
-#plt.show()
-
-plt.figure()
-top_files.plot(kind='bar')
-plt.title("Top Source Files by Touches")
-plt.ylabel("Number of Touches")
-plt.xlabel("File")
-plt.tight_layout()
-os.makedirs(os.path.dirname(OUTPUT_FIG_TOP_FILES), exist_ok=True)
-plt.savefig(OUTPUT_FIG_TOP_FILES, dpi=300)
-#plt.show()
-
-plt.figure()
-bottom_authors.plot(kind='bar')
-plt.title("Bottom Authors by Source-File Touches")
-plt.ylabel("Number of Touches")
-plt.xlabel("Author")
-plt.tight_layout()
-os.makedirs(os.path.dirname(OUTPUT_FIG_BOTTOM_AUTHORS), exist_ok=True)
-plt.savefig(OUTPUT_FIG_BOTTOM_AUTHORS, dpi=300)
-#plt.show()
-
-plt.figure()
-bottom_files.plot(kind='bar')
-plt.title("Bottom Source Files by Touches")
-plt.ylabel("Number of Touches")
-plt.xlabel("File")
-plt.tight_layout()
-os.makedirs(os.path.dirname(OUTPUT_FIG_BOTTOM_FILES), exist_ok=True)
-plt.savefig(OUTPUT_FIG_BOTTOM_FILES, dpi=300)
-#plt.show()
\ No newline at end of file
+def render_weeks_numeric(fig, top_files, point_x, point_weeks, point_colors,
+                         authors, author_colors):
+    ax = fig.add_subplot()
+    ax.scatter(point_x, point_weeks, s=35, alpha=0.75, c=point_colors)
+
+    ax.set_xticks(range(len(top_files)), top_files, rotation=45, ha="right", fontsize=10)
+    ax.set_xlabel("File",  fontsize=12)
+    ax.set_ylabel("Project Weeks (0 = project start)",  fontsize=12)
+
+    # Make numeric scale readable
+    ax.set_yticks(range(0, point_weeks.max() + 1, 25))
+    for label in ax.get_yticklabels():
+        label.set_fontsize(10)
+
+    ax.set_title("Source File Touches Over Project Lifetime — Weeks vs Files (Colored by Author)", fontsize=14)
+    author_legend(ax, authors, author_colors, fontsize=9)
+    fig.tight_layout()
+
+
+def render_top_authors_and_files(fig, top_files, top_authors):
+    ax = fig.add_subplot(1, 2, 1)
+    top_files.plot(kind="bar", ax=ax)
+    ax.set_title("Top Source Files by Touches", fontsize=14)
+    ax.set_ylabel("Number of Touches", fontsize=12)
+    ax.set_xlabel("File", fontsize=12)
+    set_xtick_labels(ax, rotation=45, ha="right", fontsize=10)
+
+    ax = fig.add_subplot(1, 2, 2)
+    top_authors.plot(kind="bar", ax=ax)
+    ax.set_title("Top Authors by Source-File Touches", fontsize=14)
+    ax.set_ylabel("Number of Touches", fontsize=12)
+    ax.set_xlabel("Author", fontsize=12)
+    set_xtick_labels(ax, rotation=45, ha="right", fontsize=10)
+
+    fig.tight_layout()
+
+
+def render_counts_bar(fig, counts, title, xlabel):
+    ax = fig.add_subplot()
+    counts.plot(kind='bar', ax=ax)
+    ax.set_title(title)
+    ax.set_ylabel("Number of Touches")
+    ax.set_xlabel(xlabel)
+    fig.tight_layout()
+
+
+def main(csv_path=CSV_PATH, figure_dir=None):
+    """
+    Renders the figures of the touch log at csv_path (or its columnar copy).
+    figure_dir, when given, replaces data/figures/ in the output paths, so
+    several repos can be plotted side by side (see mine.py).
+    """
+    def output(path):
+        return path if figure_dir is None else os.path.join(figure_dir, os.path.basename(path))
+
+    # Load & preprocess
+    # Touches per (file, author, calendar week), only the rows added to the
+    # log since the last run are read (a .parquet/.feather copy of CSV_PATH
+    # is preferred)
+    cube = update_cube(preferred_path(csv_path), FILE_COL, AUTHOR_COL, DATE_COL)
+
+    # Short file names
+    cube["ShortFile"] = cube["File"].map(os.path.basename)
+
+    # Numeric project week (0 = first week of project)
+    project_start = cube["Week"].min()
+
+    # Reduce to top-N files, one row per touch for the scatter plots
+    top_files = ranked(cube, "File", os.path.basename).head(TOP_N_FILES).index.tolist()
+    dff = touch_points(cube[cube["ShortFile"].isin(top_files)])
+    dff["ShortFile"] = dff["File"].map(os.path.basename)
+    dff["ProjectWeek"] = ((dff["Week"] - project_start).dt.days // 7).astype(int)
+
+    # Map files to x positions
+    file_to_x = {f: i for i, f in enumerate(top_files)}
+    dff["x"] = dff["ShortFile"].map(file_to_x)
+
+    # Colors per author (use matplotlib defaults)
+    authors = sorted(dff["Author"].unique())
+    color_cycle = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+    author_colors = [color_cycle[i % len(color_cycle)] for i in range(len(authors))]
+
+    # Map authors to color codes once and draw all points in a single scatter
+    # call, instead of masking the frame and calling scatter once per author.
+    # Rows are ordered by author (stable) so points layer as they did per author.
+    author_codes = pd.Categorical(dff["Author"], categories=authors).codes
+    order = np.argsort(author_codes, kind="stable")
+    point_x = dff["x"].to_numpy()[order]
+    point_colors = list(np.array(color_cycle, dtype=object)[author_codes[order] % len(color_cycle)])
+
+    jobs = [
+        FigureJob(output(OUTPUT_FIG_CAL), render_weeks_calendar,
+                  (top_files, point_x, dff["Week"].to_numpy()[order], point_colors,
+                   authors, author_colors),
+                  figsize=(16, 10), savefig={"dpi": 300}),
+        FigureJob(output(OUTPUT_FIG_NUM), render_weeks_numeric,
+                  (top_files, point_x, dff["ProjectWeek"].to_numpy()[order], point_colors,
+                   authors, author_colors),
+                  figsize=(12, 6), savefig={"dpi": 300, "bbox_inches": "tight"}),
+    ]
+
+    ### Additional Insights for the executive summary report..
+
+    # top authors by touches, answered from the cube
+    top_authors = ranked(cube, "Author").head(15)
+
+    top_files = ranked(cube, "File", os.path.basename).head(15)
+
+    bottom_authors = ranked(cube, "Author").tail(15)
+
+    bottom_files = ranked(cube, "File", os.path.basename).tail(15)
+
+    jobs += [
+        FigureJob(output(OUTPUT_FIG_TOP_AUTHORS_AND_FILES), render_top_authors_and_files,
+                  (top_files, top_authors),
+                  figsize=(12, 4), savefig={"dpi": 300, "bbox_inches": "tight"}),
+        FigureJob(output(OUTPUT_FIG_TOP_AUTHORS), render_counts_bar,
+                  (top_authors, "Top Authors by Source-File Touches", "Author"),
+                  savefig={"dpi": 300}),
+        FigureJob(output(OUTPUT_FIG_TOP_FILES), render_counts_bar,
+                  (top_files, "Top Source Files by Touches", "File"),
+                  savefig={"dpi": 300}),
+        FigureJob(output(OUTPUT_FIG_BOTTOM_AUTHORS), render_counts_bar,
+                  (bottom_authors, "Bottom Authors by Source-File Touches", "Author"),
+                  savefig={"dpi": 300}),
+        FigureJob(output(OUTPUT_FIG_BOTTOM_FILES), render_counts_bar,
+                  (bottom_files, "Bottom Source Files by Touches", "File"),
+                  savefig={"dpi": 300}),
+    ]
+
+    # Figures are rendered in parallel and written as each one finishes;
+    # a figure whose data has not changed since its png was written is skipped.
+    render_jobs(jobs, hash_path=output(HASH_PATH))
+
+
+if __name__ == "__main__":
+    main()
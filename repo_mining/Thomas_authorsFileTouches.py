@@ -1,26 +1,12 @@
-import json
-import requests
-import csv
-
 import os
 
+from github_client import github_auth
+from touch_writer import TouchWriter
+from touch_columnar import ParquetTouchWriter
+
 if not os.path.exists("data"):
  os.makedirs("data")
 
-# GitHub Authentication function
-def github_auth(url, lsttoken, ct):
-    jsonData = None
-    try:
-        ct = ct % len(lstTokens)
-        headers = {'Authorization': 'Bearer {}'.format(lsttoken[ct])}
-        request = requests.get(url, headers=headers)
-        jsonData = json.loads(request.content)
-        ct += 1
-    except Exception as e:
-        pass
-        print(e)
-    return jsonData, ct
-
 # @authorAndDates, empty dictionary of files, authors and dates
 # @lstTokens, GitHub authentication tokens
 # @repo, GitHub repo
@@ -81,19 +67,22 @@ repo = 'scottyab/rootbeer'
 # I would advise to create more than one token for repos with heavy commits
 lstTokens = []
 
-authorAndDates = []
-collectAuthorAndDates(authorAndDates, lstTokens, repo)
-print('Total number of files: ' + str(len(authorAndDates)))
+# "csv", or "parquet" for a typed columnar dataset (needs pyarrow)
+OUTPUT_FORMAT = "csv"
 
-file = repo.split('/')[1]
-# change this to the path of your file
-fileOutput = 'data/authorsAndDates_' + file + '.csv'
-rows = ["File", "Author", "Date"]
-fileCSV = open(fileOutput, 'w')
-writer = csv.writer(fileCSV)
-writer.writerow(rows)
+if __name__ == "__main__":
+    file = repo.split('/')[1]
+    # change this to the path of your file
+    fileOutput = 'data/authorsAndDates_' + file + '.csv'
 
-for filename, author, date in authorAndDates:
-    rows = [filename, author, date]
-    writer.writerow(rows)
-fileCSV.close()
+    # rows are written to the csv as they are collected instead of being kept in
+    # a list until the end, so an interrupted run keeps what it mined so far
+    if OUTPUT_FORMAT == "parquet":
+        fileOutput = 'data/authorsAndDates_' + file + '.parquet'
+        writer = ParquetTouchWriter(fileOutput, ["File", "Author", "Date"],
+                                    dictionary_columns=["File", "Author"], timestamp_columns=["Date"])
+    else:
+        writer = TouchWriter(fileOutput, ["File", "Author", "Date"])
+    with writer as authorAndDates:
+        collectAuthorAndDates(authorAndDates, lstTokens, repo)
+    print('Total number of files: ' + str(len(authorAndDates)))
@@ -0,0 +1,198 @@
+# Benchmark suite for the collectors, run against fake_github.py.
+# Starts a fake GitHub API with synthetic repos of the given size and
+# latency, runs each collector case on a fresh working directory with the
+# response cache off, and records the wall time and the request metrics of
+# mining_metrics.py per case. Results are saved as JSON; given an earlier
+# result as --baseline, cases that got slower by more than --threshold are
+# reported as regressions and the exit status is 1.
+#
+#   python benchmark.py --commits 1000 --latency-ms 20
+#   python benchmark.py --baseline data/benchmarks/benchmark_20240101-120000.json
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_github
+from mining_metrics import METRICS
+
+RESULTS_DIR = os.path.join('data', 'benchmarks')
+REPO = 'scottyab/rootbeer'
+THRESHOLD = 0.2
+# files crawled one by one in the collect_file_touches cases
+PATH_FILES = 10
+
+
+# Each case is function(modules, args, repos) run inside a fresh working
+# directory; @modules holds the collector modules, imported by main() once
+# the fake server is up.
+def countfiles_case(api):
+    def run(modules, args, repos):
+        dictfiles = {}
+        modules['collect'].countfiles(dictfiles, [''], repos[0], args.workers, api=api)
+        return {'files': len(dictfiles), 'touches': sum(dictfiles.values())}
+    return run
+
+
+def mine_repo_case(backend):
+    def run(modules, args, repos):
+        counts = modules['touches'].mine_repo(repos[0], [''], 'data/counts.csv',
+                                              'data/touches.csv', backend=backend,
+                                              max_workers=args.workers)
+        return {'files': len(counts), 'touches': sum(counts.values())}
+    return run
+
+
+def collect_file_touches_case(api):
+    def run(modules, args, repos):
+        dictfiles = {}
+        modules['collect'].countfiles(dictfiles, [''], repos[0], args.workers)
+        files = sorted(dictfiles, key=dictfiles.get, reverse=True)[:PATH_FILES]
+        METRICS.reset()
+        started = time.perf_counter()
+        rows = modules['touches'].collect_file_touches(repos[0], files, [''], api=api)
+        # only the per-file crawl is timed, countfiles just picks the files
+        return {'files': len(files), 'touches': len(rows),
+                'seconds': time.perf_counter() - started}
+    return run
+
+
+def mine_batch_case(modules, args, repos):
+    # the repos of --repos mined side by side like mine.py --jobs
+    with ThreadPoolExecutor(max_workers=len(repos)) as pool:
+        counts = list(pool.map(lambda repo: modules['touches'].mine_repo(
+            repo, [''], 'data/{}_counts.csv'.format(repo.replace('/', '__')),
+            'data/{}_touches.csv'.format(repo.replace('/', '__')),
+            max_workers=args.workers), repos))
+    return {'repos': len(repos), 'touches': sum(sum(c.values()) for c in counts)}
+
+
+CASES = {
+    'countfiles_rest': countfiles_case('rest'),
+    'countfiles_graphql': countfiles_case('graphql'),
+    'mine_repo_api': mine_repo_case('api'),
+    'mine_repo_graphql': mine_repo_case('graphql'),
+    'file_touches_rest': collect_file_touches_case('rest'),
+    'file_touches_graphql': collect_file_touches_case('graphql'),
+    'mine_batch': mine_batch_case,
+}
+
+
+def run_case(name, modules, args, repos):
+    seconds = []
+    for _ in range(args.repeat):
+        workdir = tempfile.mkdtemp(prefix='benchmark_')
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            os.makedirs('data')
+            METRICS.reset()
+            started = time.perf_counter()
+            # the collectors print every file they see
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out if not args.verbose else sys.stdout):
+                result = CASES[name](modules, args, repos)
+            seconds.append(result.pop('seconds', time.perf_counter() - started))
+            metrics = METRICS.snapshot()
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    # the best run is the least disturbed by the rest of the machine
+    return dict(result, seconds=round(min(seconds), 4),
+                runs=[round(s, 4) for s in seconds], metrics=metrics)
+
+
+# Cases slower than the baseline by more than threshold, as (name, ratio)
+def regressions(results, baseline, threshold=THRESHOLD):
+    slower = []
+    for name, result in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if before and before['seconds'] > 0:
+            ratio = result['seconds'] / before['seconds']
+            if ratio > 1 + threshold:
+                slower.append((name, ratio))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the collectors against a fake GitHub API')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument('--commits', type=int, default=500)
+    parser.add_argument('--files', type=int, default=60)
+    parser.add_argument('--authors', type=int, default=8)
+    parser.add_argument('--repos', type=int, default=3, help='synthetic repos, for mine_batch')
+    parser.add_argument('--latency-ms', type=float, default=10.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='result JSON, default data/benchmarks/benchmark_<time>.json')
+    parser.add_argument('--baseline', help='earlier result JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slowdown ratio above 1 counted as a regression')
+    parser.add_argument('--verbose', action='store_true', help='show the collectors output')
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, time.strftime('benchmark_%Y%m%d-%H%M%S.json')))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    repos = [REPO] + ['fake/repo{}'.format(i) for i in range(1, args.repos)]
+    server, url = fake_github.serve_in_thread(
+        [fake_github.FakeRepo(name, args.commits, args.files, args.authors, seed=i)
+         for i, name in enumerate(repos)],
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000)
+    # github_client reads both at import time, so the collectors are only
+    # imported once they point at the fake server with the cache turned off
+    os.environ['GITHUB_API_URL'] = url
+    os.environ['GITHUB_CACHE'] = ''
+    from github_client import size_connection_pool
+    import RichardSserunjogi_CollectFiles
+    import Richard_authorsFileTouches
+    modules = {'collect': RichardSserunjogi_CollectFiles, 'touches': Richard_authorsFileTouches}
+    size_connection_pool(args.workers * len(repos))
+
+    results = {
+        'params': {k: getattr(args, k) for k in ('commits', 'files', 'authors', 'repos',
+                                                 'latency_ms', 'jitter_ms', 'workers', 'repeat')},
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': {},
+    }
+    try:
+        for name in args.cases:
+            result = run_case(name, modules, args, repos)
+            results['cases'][name] = result
+            m = result['metrics']
+            print('{:<22} {:>8.3f}s {:>6} requests {:>8.1f} req/s  p95 {} ms'.format(
+                name, result['seconds'], m['requests'], m['requests_per_s'],
+                m['latency_ms']['p95']))
+    finally:
+        server.shutdown()
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print('Results written to ' + output)
+
+    if baseline is None:
+        return 0
+    slower = regressions(results, baseline, args.threshold)
+    for name, ratio in slower:
+        print('REGRESSION {}: {:.2f}x the baseline time'.format(name, ratio))
+    if not slower:
+        print('No regressions against ' + args.baseline)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# Concurrent commit fetch engine for the repo_mining scripts.
+# countfiles used to list a page of commits and then request every
+# /commits/{sha} one after another. Here the details are fetched by a bounded
+# thread pool while the next commit page is already being listed, so the
+# round trips overlap instead of adding up.
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from crawl_journal import stub_commit
+from github_client import API_ROOT, github_auth, size_connection_pool
+import graphql_fetcher
+
+API_URL = API_ROOT + '/repos/'
+PER_PAGE = 100
+# number of requests in flight at once, raise it for commit heavy repos
+MAX_WORKERS = 8
+
+
+# @since, optional ISO 8601 date, only list commits made at or after it
+# @until, optional ISO 8601 date, only list commits made at or before it
+def commits_url(repo, page, since=None, until=None):
+    url = API_URL + repo + '/commits?page=' + str(page) + '&per_page=' + str(PER_PAGE)
+    if since:
+        url += '&since=' + since
+    if until:
+        url += '&until=' + until
+    return url
+
+
+def commit_url(repo, sha):
+    return API_URL + repo + '/commits/' + sha
+
+
+def _fetch(url, lsttokens):
+    jsonData, _ = github_auth(url, lsttokens, 0)
+    return jsonData
+
+
+# Page functions return (commits, key of the next page or None)
+def _rest_page(repo, lsttokens, since, until):
+    def fetch_page(ipage):
+        jsonCommits = _fetch(commits_url(repo, ipage, since, until), lsttokens)
+        # stop listing after the last returned empty page
+        if not jsonCommits:
+            return [], None
+        return jsonCommits, ipage + 1
+    return fetch_page
+
+
+def _graphql_page(repo, lsttokens, since, until):
+    def fetch_page(cursor):
+        return graphql_fetcher.fetch_history_page(repo, lsttokens, cursor, since, until)
+    return fetch_page
+
+
+# @repo, GitHub repo
+# @lsttokens, GitHub authentication tokens
+# @max_workers, concurrency limit for the detail requests
+# @since, optional ISO 8601 date, see commits_url
+# @api, 'rest' lists the commits with /commits pages, 'graphql' with
+#       GraphQL history pages; the details always come from REST
+# @journal, optional crawl_journal.CrawlJournal: listed pages are recorded in
+#       it, and on a resumed crawl the journaled pages are not listed again
+#       and their commits already in journal.commits are not yielded
+# Yields (shaObject, shaDetails) for every commit of the repo, in the same
+# order as the commit pages (newest first).
+def iter_commit_details(repo, lsttokens, max_workers=MAX_WORKERS, since=None, api='rest',
+                        journal=None):
+    if max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+    # a journaled crawl keeps to the commits made before it first started
+    until = journal.until if journal else None
+    if api == 'graphql':
+        fetch_page, first = _graphql_page(repo, lsttokens, since, until), None
+    elif api == 'rest':
+        fetch_page, first = _rest_page(repo, lsttokens, since, until), 1
+    else:
+        raise ValueError('unknown api: ' + api)
+    # keep at least this many details queued so the pool never idles while
+    # the consumer catches up, but never more than about two pages
+    window = max(PER_PAGE, 2 * max_workers)
+    pending = deque()
+    # one keep-alive connection per worker
+    size_connection_pool(max_workers)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        listed = False
+        if journal and journal.pages:
+            # pages listed before the restart, only unfinished commits are fetched
+            for _, nextPage, last, stubs in journal.pages:
+                for stub in stubs:
+                    if stub['sha'] not in journal.commits:
+                        pending.append((stub_commit(stub), pool.submit(
+                            _fetch, commit_url(repo, stub['sha']), lsttokens)))
+            listed, first = last, nextPage
+        page = first
+        pageFuture = None if listed else pool.submit(fetch_page, page)
+        while pending or pageFuture is not None:
+            if pageFuture is None:
+                jsonCommits = []
+            else:
+                jsonCommits, nextPage = pageFuture.result()
+                if journal:
+                    journal.page_done(page, nextPage, jsonCommits)
+                page = nextPage
+                # list the next page while the details of this one download
+                pageFuture = pool.submit(fetch_page, nextPage) if nextPage is not None else None
+            for shaObject in jsonCommits:
+                shaUrl = commit_url(repo, shaObject['sha'])
+                pending.append((shaObject, pool.submit(_fetch, shaUrl, lsttokens)))
+
+            while pending and (pageFuture is None or len(pending) > window):
+                shaObject, detailFuture = pending.popleft()
+                yield shaObject, detailFuture.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,147 @@
+# Write-ahead journal for long crawls.
+# countfiles, collect_counts_and_touches and collect_file_touches used to keep
+# everything in memory until the crawl was over, so a crash or a kill on page
+# 300 lost all of it. A CrawlJournal is an append-only JSON lines file that
+# records every finished piece of work before it counts as done: each listed
+# commit page, each commit (with the source files it touched, or its touch
+# rows) and each /commits?path= page of a file (with the touch rows it
+# produced). A restarted crawl replays the
+# journal, skips the finished work and goes on where it stopped. The crawl
+# is pinned to the commits made before it first started (until=), so the
+# pages a resumed run asks for are the same as before. The journal is
+# removed once the crawl is complete.
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+JOURNAL_DIR = os.path.join('data', 'journal')
+# records are flushed to the OS as they are written; fsync (which also
+# survives a power loss) runs at most every FSYNC_EVERY records / FSYNC_SECONDS
+FSYNC_EVERY = 100
+FSYNC_SECONDS = 1.0
+
+
+# data/journal/<task>_<owner>__<name>.jsonl
+def journal_path(repo, task, journal_dir=JOURNAL_DIR):
+    return os.path.join(journal_dir, '{}_{}.jsonl'.format(task, repo.replace('/', '__')))
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class CrawlJournal:
+    """
+    @path, journal file
+    @key, json-able description of the crawl (repo, task, since, ...); a
+          journal written for another key is discarded and started over
+    After loading, the finished work of the previous run is in:
+    pages, [(page, next page, last, [{'sha', 'date'}])] in listing order
+    commits, {sha: payload}
+    file_pages, {filename: [rows of page 1, rows of page 2, ...]}
+    files_done, filenames whose every page is done
+    """
+
+    def __init__(self, path, key, fsync_every=FSYNC_EVERY, fsync_seconds=FSYNC_SECONDS):
+        self.path = path
+        self.key = key
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self.until = None
+        self.pages = []
+        self.commits = {}
+        self.file_pages = {}
+        self.files_done = set()
+        self.resumed = os.path.exists(path) and self._load()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if self.resumed:
+            self.file = open(path, 'a', encoding='utf-8')
+        else:
+            self.until = _now_iso()
+            self.file = open(path, 'w', encoding='utf-8')
+            self._write({'key': key, 'until': self.until})
+            self.sync()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        # a line cut short by a crash is not a record, nor is anything after it
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+        if not records or records[0].get('key') != self.key:
+            return False
+        self.until = records[0]['until']
+        for record in records[1:]:
+            if 'page' in record:
+                self.pages.append((record['page'], record['next'], record['last'],
+                                   record['commits']))
+            elif 'sha' in record:
+                self.commits[record['sha']] = record['data']
+            elif 'file' in record:
+                self.file_pages.setdefault(record['file'], []).append(record['rows'])
+                if record['last']:
+                    self.files_done.add(record['file'])
+        # drop the partial line so new records start on a line of their own
+        good = sum(len(line) + 1 for line in lines[:len(records)])
+        with open(self.path, 'r+', encoding='utf-8') as f:
+            f.truncate(good)
+        return True
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def record(self, record):
+        self._write(record)
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._synced_at >= self.fsync_seconds):
+            self.sync()
+
+    # A listed commit page; @commits, entries of the page
+    def page_done(self, page, next_page, commits):
+        stubs = [{'sha': c['sha'], 'date': c['commit']['committer']['date']} for c in commits]
+        self.pages.append((page, next_page, next_page is None, stubs))
+        self.record({'page': page, 'next': next_page, 'last': next_page is None,
+                     'commits': stubs})
+
+    def commit_done(self, sha, data):
+        self.commits[sha] = data
+        self.record({'sha': sha, 'data': data})
+
+    # One /commits?path= page of filename and the rows it produced
+    def file_page_done(self, filename, rows, last):
+        self.file_pages.setdefault(filename, []).append(rows)
+        if last:
+            self.files_done.add(filename)
+        self.record({'file': filename, 'rows': rows, 'last': last})
+
+    # The crawl is over: nothing to resume, the journal goes away
+    def finish(self):
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
+# A commit list entry rebuilt from a journaled page stub, with the fields
+# the collectors read from it
+def stub_commit(stub):
+    return {'sha': stub['sha'], 'commit': {'committer': {'date': stub['date']}}}
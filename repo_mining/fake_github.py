@@ -0,0 +1,202 @@
+# Local stand-in for the GitHub API, serving synthetic repositories.
+# Implements just what the repo_mining collectors call: the REST commit list
+# (page/per_page/since/until/path), /commits/{sha}, /languages and the GraphQL
+# commit history query of graphql_fetcher. Start it and point the collectors
+# at it with GITHUB_API_URL to mine without network access or tokens:
+#
+#   python fake_github.py --port 8000 --commits 500
+#   GITHUB_API_URL=http://127.0.0.1:8000 GITHUB_CACHE= python Richard_authorsFileTouches.py
+#
+# Every response can be delayed by --latency-ms (+ up to --jitter-ms) to
+# behave more like the real API over the network, see benchmark.py.
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+START_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+EXTENSIONS = ('.java', '.kt', '.cpp', '.h', '.md', '.gradle')
+
+
+def iso(date):
+    return date.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FakeRepo:
+    """
+    A deterministic synthetic repo: `commits` commits (newest first), each
+    touching 1 to `files_per_commit` of `files` paths, by `authors` authors,
+    one commit every `hours` hours from START_DATE.
+    """
+
+    def __init__(self, name='fake/repo', commits=300, files=60, authors=8,
+                 files_per_commit=4, hours=12, seed=0):
+        self.name = name
+        rnd = random.Random(seed)
+        paths = ['src/dir{}/File{}{}'.format(i % 7, i, EXTENSIONS[i % len(EXTENSIONS)])
+                 for i in range(files)]
+        self.commits = []
+        for i in range(commits):
+            author = i % authors if rnd.random() < 0.5 else rnd.randrange(authors)
+            date = iso(START_DATE + timedelta(hours=hours * i))
+            self.commits.append({
+                'sha': hashlib.sha1('{}:{}'.format(name, i).encode()).hexdigest(),
+                'login': 'dev{}'.format(author),
+                'name': 'Developer {}'.format(author),
+                'email': 'dev{}@example.com'.format(author),
+                'date': date,
+                'files': rnd.sample(paths, rnd.randint(1, min(files_per_commit, files))),
+            })
+        self.commits.reverse()
+        self.by_sha = {c['sha']: c for c in self.commits}
+
+    # Commits newest first, filtered like the GitHub commit list
+    def select(self, since=None, until=None, path=None):
+        return [c for c in self.commits
+                if (not since or c['date'] >= since) and (not until or c['date'] <= until)
+                and (not path or path in c['files'])]
+
+    def list_entry(self, c):
+        return {
+            'sha': c['sha'],
+            'commit': {'author': {'name': c['name'], 'email': c['email'], 'date': c['date']},
+                       'committer': {'name': c['name'], 'email': c['email'], 'date': c['date']},
+                       'message': 'commit ' + c['sha'][:7]},
+            'author': {'login': c['login']},
+        }
+
+    def detail(self, c):
+        entry = self.list_entry(c)
+        entry['files'] = [{'filename': f, 'status': 'modified'} for f in c['files']]
+        return entry
+
+    def history_node(self, c):
+        return {'oid': c['sha'], 'committedDate': c['date'],
+                'author': {'name': c['name'], 'email': c['email'], 'date': c['date'],
+                           'user': {'login': c['login']}}}
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    # set by make_server
+    repos = {}  # name -> FakeRepo
+    latency = 0.0
+    jitter = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        body = json.dumps(data).encode()
+        # ETags like GitHub's, so the response cache revalidates with 304s
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        # /repos/{owner}/{name}/...
+        parts = url.path.split('/')
+        repo = self.repos.get('/'.join(parts[2:4])) if parts[1:2] == ['repos'] else None
+        if repo is None:
+            return self.send_json({'message': 'Not Found'}, 404)
+        prefix = '/repos/' + repo.name
+        if url.path == prefix + '/languages':
+            return self.send_json({'Java': 1000, 'Kotlin': 500, 'C++': 200})
+        if url.path == prefix + '/commits':
+            page = int(query.get('page', 1))
+            per_page = int(query.get('per_page', 30))
+            commits = repo.select(query.get('since'), query.get('until'), query.get('path'))
+            chunk = commits[(page - 1) * per_page:page * per_page]
+            return self.send_json([repo.list_entry(c) for c in chunk])
+        if url.path.startswith(prefix + '/commits/'):
+            commit = repo.by_sha.get(url.path.rsplit('/', 1)[1])
+            if commit is None:
+                return self.send_json({'message': 'No commit found for SHA'}, 422)
+            return self.send_json(repo.detail(commit))
+        self.send_json({'message': 'Not Found'}, 404)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/graphql':
+            return self.send_json({'message': 'Not Found'}, 404)
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        # only the history query of graphql_fetcher is supported, it is
+        # answered from the variables alone
+        v = request.get('variables') or {}
+        repo = self.repos.get('{}/{}'.format(v.get('owner'), v.get('name')))
+        if repo is None:
+            return self.send_json({'data': {'repository': None},
+                                   'errors': [{'message': 'Could not resolve to a Repository'}]})
+        commits = repo.select(v.get('since'), v.get('until'), v.get('path'))
+        start = int(v['cursor']) if v.get('cursor') else 0
+        end = start + int(v.get('first', 100))
+        history = {
+            'pageInfo': {'hasNextPage': end < len(commits), 'endCursor': str(end)},
+            'nodes': [repo.history_node(c) for c in commits[start:end]],
+        }
+        self.send_json({'data': {'repository': {
+            'defaultBranchRef': {'target': {'history': history}}}}})
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    # the collectors open many connections at once, a short listen backlog
+    # would turn a benchmark into a measure of connection retries
+    request_queue_size = 128
+
+
+# Returns a server for repos on host:port (port 0 picks a free one)
+# @repos, a FakeRepo or a list of them
+# @latency, @jitter, seconds every response is delayed by, latency plus a
+# uniform random share of jitter
+def make_server(repos, host='127.0.0.1', port=0, latency=0.0, jitter=0.0):
+    if isinstance(repos, FakeRepo):
+        repos = [repos]
+    handler = type('Handler', (FakeGitHubHandler,), {
+        'repos': {repo.name: repo for repo in repos}, 'latency': latency, 'jitter': jitter})
+    return FakeGitHubServer((host, port), handler)
+
+
+# Starts a server in a daemon thread, returns (server, base url)
+def serve_in_thread(repos, host='127.0.0.1', port=0, latency=0.0, jitter=0.0):
+    server = make_server(repos, host, port, latency, jitter)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://{}:{}'.format(*server.server_address)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake GitHub API serving synthetic repos')
+    parser.add_argument('--repo', action='append',
+                        help='owner/name, repeat for several repos (default scottyab/rootbeer)')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--commits', type=int, default=300)
+    parser.add_argument('--files', type=int, default=60)
+    parser.add_argument('--authors', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    names = args.repo or ['scottyab/rootbeer']
+    repos = [FakeRepo(name, args.commits, args.files, args.authors, seed=args.seed)
+             for name in names]
+    server = make_server(repos, port=args.port, latency=args.latency_ms / 1000,
+                         jitter=args.jitter_ms / 1000)
+    print('Fake GitHub API for {} on http://127.0.0.1:{}'.format(', '.join(names),
+                                                                 server.server_address[1]))
+    server.serve_forever()
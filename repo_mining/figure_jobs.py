@@ -0,0 +1,101 @@
+# Parallel figure rendering for the plotting scripts.
+# A FigureJob names an output png, a module level render function and the
+# data it draws. render_jobs() sends the jobs to a (spawned) process pool whose
+# workers use the Agg backend, so figures are drawn side by side instead of
+# one after another on the pyplot state machine. Each worker saves its png
+# as soon as it is done. A job is skipped when the hash of its input data
+# matches the one recorded the last time its png was written.
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+HASH_PATH = os.path.join('data', 'figures', 'figure_hashes.json')
+MAX_WORKERS = os.cpu_count() or 1
+
+# @path, output png
+# @render, module level function(fig, *args) drawing onto a matplotlib Figure
+# @args, data passed to render, it is also what the skip hash is taken over
+# @figsize, Figure size in inches, None for the matplotlib default
+# @savefig, keyword arguments for Figure.savefig
+FigureJob = namedtuple('FigureJob', ['path', 'render', 'args', 'figsize', 'savefig'],
+                       defaults=((), None, {}))
+
+
+def job_hash(job):
+    # the module is left out: it is __main__ when a plotting script is run directly
+    payload = pickle.dumps((job.render.__qualname__, job.args, job.figsize,
+                            sorted(job.savefig.items())), protocol=4)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def load_hashes(path=HASH_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_hashes(hashes, path=HASH_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+# Runs in a worker: draws the job on a fresh Figure and writes the png
+def render_job(job):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=job.figsize)
+    job.render(fig, *job.args)
+    os.makedirs(os.path.dirname(job.path) or '.', exist_ok=True)
+    # save next to the target first so a killed worker never leaves half a png
+    root, ext = os.path.splitext(job.path)
+    tmp = root + '.tmp' + ext
+    fig.savefig(tmp, **job.savefig)
+    os.replace(tmp, job.path)
+    return job.path
+
+
+def render_jobs(jobs, max_workers=MAX_WORKERS, hash_path=HASH_PATH):
+    """
+    Renders @jobs in a process pool and returns the paths that were written.
+    Jobs whose png exists and whose input hash is unchanged are skipped.
+    The hash file is updated after every finished figure.
+    """
+    hashes = load_hashes(hash_path)
+    pending = {}
+    for job in jobs:
+        digest = job_hash(job)
+        if os.path.exists(job.path) and hashes.get(job.path) == digest:
+            print('Unchanged, skipping ' + job.path)
+            continue
+        pending[job.path] = (job, digest)
+
+    written = []
+    if not pending:
+        return written
+    workers = max(1, min(max_workers, len(pending)))
+    # spawned, not forked: a caller may run this from one of its threads while
+    # others hold locks, which a forked child would inherit held
+    with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg,
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(render_job, job): (job, digest)
+                   for job, digest in pending.values()}
+        for future in as_completed(futures):
+            job, digest = futures[future]
+            future.result()
+            hashes[job.path] = digest
+            save_hashes(hashes, hash_path)
+            written.append(job.path)
+            print('Wrote ' + job.path)
+    return written
@@ -0,0 +1,145 @@
+# Local git clone backend for the repo_mining scripts.
+# The REST pipeline costs one request per commit plus one per file path.
+# Here the repository is cloned once (or an existing clone is reused) and a
+# single streaming `git log --name-only` pass yields the files touched, the
+# author and the date of every commit. Works offline against a local bare
+# repo, and produces the same rows as the REST collectors.
+import os
+import subprocess
+from datetime import datetime, timezone
+
+CLONE_DIR = os.path.join('data', 'clones')
+
+# record separator before each commit header, NUL between its fields
+GIT_LOG_FORMAT = '%x1e%H%x00%an%x00%ae%x00%aI'
+
+
+# Local path or clone url for a repo given as 'owner/name'
+def repo_url(repo):
+    if '://' in repo or os.path.exists(repo):
+        return repo
+    return 'https://github.com/' + repo + '.git'
+
+
+# @repo, GitHub repo ('owner/name'), clone url or path of a local repo
+# @clone_dir, where the bare clone lives, reused (and fetched) when present
+# Returns the path to run git log in
+def clone_or_fetch(repo, clone_dir=None, fetch=True):
+    if os.path.isdir(repo):
+        return repo
+    if clone_dir is None:
+        clone_dir = os.path.join(CLONE_DIR, repo.replace('/', '_') + '.git')
+    if os.path.isdir(clone_dir):
+        remotes = subprocess.run(['git', '-C', clone_dir, 'remote'], check=True,
+                                 capture_output=True, text=True).stdout.split()
+        # a local bare repo without a remote is used as it is
+        if fetch and 'origin' in remotes:
+            subprocess.run(['git', '-C', clone_dir, 'fetch', '--quiet', 'origin',
+                            '+refs/heads/*:refs/heads/*'], check=True)
+    else:
+        os.makedirs(os.path.dirname(clone_dir) or '.', exist_ok=True)
+        subprocess.run(['git', 'clone', '--quiet', '--bare', repo_url(repo), clone_dir], check=True)
+    return clone_dir
+
+
+# Same format as the GitHub API, e.g. 2024-10-04T07:42:57Z
+def to_utc_iso(date):
+    return datetime.fromisoformat(date).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+# Yields one dict per commit on the default branch, newest first:
+# {'sha', 'author_name', 'author_email', 'date_iso', 'files'}
+# Merge commits list the files changed against their first parent, like the
+# /commits/{sha} API does.
+def iter_commits(repo_path, rev='HEAD'):
+    cmd = ['git', '-C', repo_path, '-c', 'core.quotePath=false', 'log', rev,
+           '--name-only', '--diff-merges=first-parent', '--format=' + GIT_LOG_FORMAT]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, encoding='utf-8', errors='replace')
+    commit = None
+    try:
+        for line in proc.stdout:
+            line = line.rstrip('\n')
+            if line.startswith('\x1e'):
+                if commit is not None:
+                    yield commit
+                sha, name, email, date = line[1:].split('\x00')
+                commit = {'sha': sha, 'author_name': name, 'author_email': email,
+                          'date_iso': to_utc_iso(date), 'files': []}
+            elif line and commit is not None:
+                commit['files'].append(line)
+        if commit is not None:
+            yield commit
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+# Checkpoint of the commit at @rev, in the form mining_state.commit_checkpoint
+# gives for a /commits entry: {'sha', 'date'} with the committer date in UTC
+def head_checkpoint(repo_path, rev='HEAD'):
+    out = subprocess.run(['git', '-C', repo_path, 'log', '-1', '--format=%H%x00%cI', rev],
+                         check=True, capture_output=True, text=True).stdout.strip()
+    sha, date = out.split('\x00')
+    return {'sha': sha, 'date': to_utc_iso(date)}
+
+
+# Same contract as countfiles in the *_CollectFiles.py scripts
+# @is_source, optional filename filter, every file is counted without it
+def countfiles(dictfiles, repo_path, is_source=None):
+    for commit in iter_commits(repo_path):
+        for filename in commit['files']:
+            if is_source is None or is_source(filename):
+                dictfiles[filename] = dictfiles.get(filename, 0) + 1
+    return dictfiles
+
+
+# Same rows as collect_file_touches in Richard_authorsFileTouches.py; git
+# has no GitHub login, so author_login is left empty
+# @rows, list or TouchWriter the rows are appended to
+def collect_file_touches(repo_path, source_files, rows=None):
+    source_files = set(source_files)
+    rows = [] if rows is None else rows
+    for commit in iter_commits(repo_path):
+        for filename in commit['files']:
+            if filename in source_files:
+                rows.append({
+                    "filename": filename,
+                    "sha": commit['sha'],
+                    "author_login": None,
+                    "author_name": commit['author_name'],
+                    "author_email": commit['author_email'],
+                    "date_iso": commit['date_iso']
+                })
+    return rows
+
+
+# Touch counts and touch rows from the same git log pass
+# Returns (dictfiles, rows) as built by countfiles and collect_file_touches
+def collect_counts_and_touches(repo_path, is_source=None, rows=None):
+    dictfiles = {}
+    rows = [] if rows is None else rows
+    for commit in iter_commits(repo_path):
+        for filename in commit['files']:
+            if is_source is not None and not is_source(filename):
+                continue
+            dictfiles[filename] = dictfiles.get(filename, 0) + 1
+            rows.append({
+                "filename": filename,
+                "sha": commit['sha'],
+                "author_login": None,
+                "author_name": commit['author_name'],
+                "author_email": commit['author_email'],
+                "date_iso": commit['date_iso']
+            })
+    return dictfiles, rows
+
+
+# Same rows as collectAuthorAndDates in Thomas_authorsFileTouches.py
+def collectAuthorAndDates(authorAndDates, repo_path, is_source=None):
+    for commit in iter_commits(repo_path):
+        for filename in commit['files']:
+            if is_source is None or is_source(filename):
+                authorAndDates.append([filename, commit['author_name'],
+                                       commit['date_iso'].split('T')[0]])
+    return authorAndDates
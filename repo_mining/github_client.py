@@ -0,0 +1,171 @@
+# Shared GitHub REST client for the repo_mining scripts.
+# Every *_CollectFiles.py / *_authorsFileTouches.py script used to carry its
+# own copy of github_auth; they now import it from here and share one
+# keep-alive requests.Session with gzip responses.
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# orjson decodes the large commit pages several times faster, fall back to
+# the standard library when it is not installed
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+from mining_metrics import METRICS
+from response_cache import ResponseCache, is_immutable
+from token_pool import MAX_RETRIES, get_token_pool, is_rate_limited, retry_delay
+
+# Base url of the GitHub API, point GITHUB_API_URL at fake_github.py to mine
+# a synthetic repo offline
+API_ROOT = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GRAPHQL_URL = API_ROOT + '/graphql'
+
+# On-disk response cache shared by all scripts, set GITHUB_CACHE to another
+# path to move it, or to an empty string to turn caching off.
+CACHE_PATH = os.getenv('GITHUB_CACHE', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'github_cache.sqlite'))
+
+# keep-alive connections per host, grown by size_connection_pool to match
+# the number of concurrent requests
+POOL_SIZE = 10
+
+_cache = None
+_cache_lock = threading.Lock()
+_session = None
+_pool_size = 0
+_session_lock = threading.Lock()
+
+
+# One requests.Session shared by all scripts, so connections (TCP + TLS) are
+# reused across requests instead of being set up for every call
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update({'Accept': 'application/vnd.github+json',
+                                        'Accept-Encoding': 'gzip'})
+                _mount(session, POOL_SIZE)
+                _session = session
+    return _session
+
+
+def _mount(session, pool_size):
+    global _pool_size
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    _pool_size = pool_size
+
+
+# Makes sure the session keeps at least pool_size connections per host open,
+# called with the number of worker threads before a concurrent crawl
+def size_connection_pool(pool_size):
+    session = get_session()
+    with _session_lock:
+        if pool_size > _pool_size:
+            _mount(session, pool_size)
+
+
+def get_response_cache():
+    global _cache
+    if _cache is None and CACHE_PATH:
+        with _cache_lock:
+            if _cache is None:
+                os.makedirs(os.path.dirname(os.path.abspath(CACHE_PATH)), exist_ok=True)
+                _cache = ResponseCache(CACHE_PATH)
+    return _cache
+
+
+# Sends a request with the healthiest token of lsttoken's TokenPool and
+# retries it while GitHub answers with a rate limit
+# @send, function(headers) -> requests.Response
+# @kind, 'rest' or 'graphql', how the request is counted in METRICS
+def send_with_pool(lsttoken, send, headers=None, kind='rest'):
+    pool = get_token_pool(lsttoken)
+    attempt = 0
+    while True:
+        index, token = pool.acquire()
+        started = time.monotonic()
+        # an empty token is an anonymous request, GitHub rejects an empty Bearer
+        auth = {'Authorization': 'Bearer {}'.format(token)} if token else {}
+        request = send(dict(headers or {}, **auth))
+        METRICS.record_request(kind, time.monotonic() - started, len(request.content),
+                               request.status_code)
+        pool.update(index, request)
+        if not is_rate_limited(request):
+            return request
+        # give up on the request after MAX_RETRIES rate limited responses
+        if attempt == MAX_RETRIES:
+            return request
+        attempt += 1
+        delay = retry_delay(request, attempt)
+        # primary limit: the pool moves on to another token, or sleeps until a reset
+        if delay == 0:
+            continue
+        # secondary limit: back off
+        print('Rate limited on {}, retry {} of {} in {:.0f}s'.format(request.url, attempt, MAX_RETRIES, delay))
+        METRICS.record_rate_limit_wait(delay)
+        time.sleep(delay)
+
+
+# GitHub Authentication function
+# @url, GitHub API url
+# @lsttoken, GitHub authentication tokens
+# @ct, request counter, kept for the callers; the token itself is picked by
+#      the rate-limit aware TokenPool of lsttoken
+def github_auth(url, lsttoken, ct):
+    jsonData = None
+    try:
+        cache = get_response_cache()
+        cached = cache.lookup(url) if cache else None
+        # a commit never changes, so a cached commit is served without a request
+        if cached and is_immutable(url):
+            METRICS.record_cache('hit')
+            return json_loads(cached[1]), ct
+
+        headers = {}
+        if cached and cached[0]:
+            headers['If-None-Match'] = cached[0]
+        request = send_with_pool(lsttoken, lambda h: get_session().get(url, headers=h), headers)
+
+        if cache:
+            METRICS.record_cache('revalidated' if request.status_code == 304 else 'miss')
+        if request.status_code == 304:
+            content = cached[1]
+            cache.refresh(url)
+        else:
+            content = request.content
+            if cache and request.status_code == 200:
+                cache.store(url, request.headers.get('ETag'), content)
+        jsonData = json_loads(content)
+        ct += 1
+    except Exception as e:
+        print(e)
+    return jsonData, ct
+
+
+# Runs a GitHub GraphQL v4 query, returns its 'data' or None on errors
+# @query, GraphQL query text
+# @variables, dict of the query variables
+def github_graphql(query, variables, lsttoken):
+    jsonData = None
+    try:
+        request = send_with_pool(lsttoken, lambda h: get_session().post(
+            GRAPHQL_URL, json={'query': query, 'variables': variables}, headers=h),
+            kind='graphql')
+        response = json_loads(request.content)
+        if response.get('errors'):
+            print(response['errors'])
+        jsonData = response.get('data')
+    except Exception as e:
+        print(e)
+    return jsonData
@@ -0,0 +1,77 @@
+# GraphQL (v4) commit history for the repo_mining scripts.
+# One GraphQL request returns up to 100 commits of the default branch with
+# their author, login and dates, optionally restricted to the commits that
+# touched one path. GraphQL has no list of the files a commit changed, so
+# countfiles still gets the file lists from REST /commits/{sha}, which the
+# response cache keeps forever; collect_file_touches needs no file lists and
+# runs on GraphQL alone.
+from github_client import github_graphql
+
+PER_PAGE = 100
+
+HISTORY_QUERY = '''
+query($owner: String!, $name: String!, $first: Int!, $cursor: String,
+      $since: GitTimestamp, $until: GitTimestamp, $path: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: $first, after: $cursor, since: $since, until: $until, path: $path) {
+            pageInfo { hasNextPage endCursor }
+            nodes {
+              oid
+              committedDate
+              author { name email date user { login } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+'''
+
+
+# Shapes a history node like an entry of the REST /commits list, so the
+# collectors handle both the same way
+def to_rest_commit(node):
+    author = node.get('author') or {}
+    user = author.get('user')
+    return {
+        'sha': node['oid'],
+        'commit': {
+            'author': {'name': author.get('name'), 'email': author.get('email'),
+                       'date': author.get('date')},
+            'committer': {'date': node.get('committedDate')},
+        },
+        'author': {'login': user['login']} if user else None,
+    }
+
+
+# @repo, GitHub repo
+# @cursor, endCursor of the previous page, None for the first page
+# @since, @until, optional ISO 8601 dates
+# @path, optional, only commits that touched this path
+# Returns (commits, next cursor), the cursor is None after the last page
+def fetch_history_page(repo, lsttokens, cursor=None, since=None, until=None, path=None):
+    owner, name = repo.split('/')
+    data = github_graphql(HISTORY_QUERY, {
+        'owner': owner, 'name': name, 'first': PER_PAGE, 'cursor': cursor,
+        'since': since, 'until': until, 'path': path,
+    }, lsttokens)
+    if not data:
+        raise RuntimeError('GraphQL history query failed for ' + repo)
+    history = data['repository']['defaultBranchRef']['target']['history']
+    commits = [to_rest_commit(node) for node in history['nodes']]
+    pageInfo = history['pageInfo']
+    return commits, pageInfo['endCursor'] if pageInfo['hasNextPage'] else None
+
+
+# Yields every commit of the history, newest first, see fetch_history_page
+def iter_history(repo, lsttokens, since=None, until=None, path=None):
+    cursor = None
+    while True:
+        commits, cursor = fetch_history_page(repo, lsttokens, cursor, since, until, path)
+        yield from commits
+        if cursor is None:
+            break
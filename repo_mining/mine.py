@@ -0,0 +1,236 @@
+# Command line entry point for mining a batch of repos in one run.
+# Every repo goes through Richard_authorsFileTouches.mine_repo (touch counts
+# and touch rows in one pass over the history, incremental through the
+# mining_state checkpoints) and, with --plot, Richard_scatterplot.main.
+# Repos are mined concurrently. They share one TokenPool (token_pool.py) and
+# one keep-alive session, so the rate limit budget of the tokens is spread
+# over the whole batch. Progress and throughput of every repo are printed
+# while the batch runs, and once more at the end, together with the request
+# metrics of mining_metrics.py (--metrics also saves them as JSON).
+#
+#   python mine.py scottyab/rootbeer mendhak/gpslogger --plot
+#   python mine.py --repos-file repos.txt --jobs 8 --backend graphql --format parquet
+#
+# Tokens are read from GITHUB_TOKENS (comma separated) or GITHUB_TOKEN.
+# Outputs go to <data-dir>/<owner>__<name>/, the checkpoints of all repos to
+# <data-dir>/mining_state.json, crawl journals to <data-dir>/journal/ and git
+# clones to <data-dir>/clones/.
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from commit_fetcher import MAX_WORKERS
+from github_client import size_connection_pool
+from mining_metrics import METRICS
+import Richard_authorsFileTouches as file_touches
+import Richard_scatterplot as scatterplot
+
+DATA_DIR = 'data'
+JOBS = 4
+REPORT_SECONDS = 10
+
+
+class RepoProgress:
+    """
+    Counters of one repo, written by the thread mining it and read by the
+    reporter thread.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.status = 'queued'
+        self.commits = 0
+        self.touches = 0
+        self.started = None
+        self.mined = None
+        self.finished = None
+        self.error = None
+
+    def start(self):
+        self.status = 'mining'
+        self.started = time.monotonic()
+
+    # mining is over, the rate no longer changes while the figures render
+    def plotting(self):
+        self.status = 'plotting'
+        self.mined = time.monotonic()
+
+    def finish(self, error=None):
+        self.finished = time.monotonic()
+        self.error = error
+        self.status = 'failed' if error else 'done'
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    # touches mined per second
+    def rate(self):
+        if self.started is None:
+            return 0.0
+        elapsed = (self.mined or self.finished or time.monotonic()) - self.started
+        return self.touches / elapsed if elapsed else 0.0
+
+    def line(self):
+        elapsed = self.elapsed()
+        rate = self.rate()
+        text = '{:<32} {:<8} {:>8} commits {:>10} touches {:>9.1f} touches/s {:>7.0f}s'.format(
+            self.repo, self.status, self.commits, self.touches, rate, elapsed)
+        if self.error:
+            text += '  ' + self.error
+        return text
+
+
+class ProgressSink:
+    """
+    List-like wrapper around a touch writer that counts the rows (and the
+    commits they come from) for a RepoProgress.
+    """
+
+    def __init__(self, rows, progress):
+        self.rows = rows
+        self.progress = progress
+        self._last_sha = None
+
+    def append(self, row):
+        self.rows.append(row)
+        self.progress.touches += 1
+        # rows of one commit arrive together
+        if row['sha'] != self._last_sha:
+            self._last_sha = row['sha']
+            self.progress.commits += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+# (counts csv, touch output, figure directory) of a repo
+def repo_paths(repo, data_dir=DATA_DIR, output_format='csv'):
+    owner, name = repo.split('/')
+    repo_dir = os.path.join(data_dir, owner + '__' + name)
+    ext = '.parquet' if output_format == 'parquet' else '.csv'
+    return (os.path.join(repo_dir, 'file_' + name + '.csv'),
+            os.path.join(repo_dir, 'file_touches_authors_dates' + ext),
+            os.path.join(repo_dir, 'figures'))
+
+
+# bare clone of a repo for the git backend
+def clone_path(repo, data_dir=DATA_DIR):
+    return os.path.join(data_dir, 'clones', repo.replace('/', '_') + '.git')
+
+
+def mine_one(repo, tokens, args, progress):
+    progress.start()
+    try:
+        counts_csv, touch_output, figure_dir = repo_paths(repo, args.data_dir, args.format)
+        file_touches.mine_repo(repo, tokens, counts_csv, touch_output, backend=args.backend,
+                               local_clone=clone_path(repo, args.data_dir),
+                               max_workers=args.workers,
+                               sink=lambda rows: ProgressSink(rows, progress),
+                               state_path=os.path.join(args.data_dir, 'mining_state.json'),
+                               journal_dir=os.path.join(args.data_dir, 'journal'))
+        if args.plot:
+            progress.plotting()
+            scatterplot.main(touch_output, figure_dir)
+    # the collectors exit() on some unrecoverable errors, that only ends this repo
+    except (Exception, SystemExit) as e:
+        progress.finish('{}: {}'.format(type(e).__name__, e))
+    else:
+        progress.finish()
+
+
+def report(progress, stop, every):
+    while not stop.wait(every):
+        active = [p for p in progress if p.status not in ('queued', 'done', 'failed')]
+        done = sum(p.status in ('done', 'failed') for p in progress)
+        print('--- {}/{} repos finished'.format(done, len(progress)))
+        for p in active:
+            print(p.line())
+        print('[metrics] ' + METRICS.line())
+
+
+def read_repos(args):
+    repos = list(args.repos)
+    if args.repos_file:
+        with open(args.repos_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    repos.append(line)
+    # keep the first occurrence of each repo
+    return list(dict.fromkeys(repos))
+
+
+def read_tokens():
+    tokens = [t.strip() for t in os.getenv('GITHUB_TOKENS', '').split(',') if t.strip()]
+    if not tokens and os.getenv('GITHUB_TOKEN'):
+        tokens = [os.getenv('GITHUB_TOKEN')]
+    return tokens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mine file touches of many GitHub repos')
+    parser.add_argument('repos', nargs='*', help='repos as owner/name')
+    parser.add_argument('--repos-file', help='file with one owner/name per line, # comments')
+    parser.add_argument('--backend', choices=['api', 'graphql', 'git'],
+                        default=file_touches.BACKEND)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=file_touches.OUTPUT_FORMAT,
+                        help='touch output format (parquet needs pyarrow)')
+    parser.add_argument('--jobs', type=int, default=JOBS, help='repos mined at the same time')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help='concurrent commit requests per repo')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--plot', action='store_true', help='render the figures of every repo')
+    parser.add_argument('--report-every', type=float, default=REPORT_SECONDS, metavar='SECONDS')
+    parser.add_argument('--metrics', metavar='PATH', help='save the request metrics as JSON')
+    args = parser.parse_args(argv)
+
+    repos = read_repos(args)
+    if not repos:
+        parser.error('no repos given')
+    for repo in repos:
+        if repo.count('/') != 1:
+            parser.error('repos must be given as owner/name: ' + repo)
+
+    tokens = read_tokens()
+    if not tokens:
+        print('GITHUB_TOKENS / GITHUB_TOKEN is not set, requests are unauthenticated')
+        tokens = ['']
+    # every repo thread runs up to --workers requests over the shared session
+    size_connection_pool(args.jobs * args.workers)
+
+    progress = [RepoProgress(repo) for repo in repos]
+    stop = threading.Event()
+    reporter = threading.Thread(target=report, args=(progress, stop, args.report_every),
+                                daemon=True)
+    METRICS.reset()
+    reporter.start()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for repo, p in zip(repos, progress):
+            pool.submit(mine_one, repo, tokens, args, p)
+    stop.set()
+    reporter.join()
+
+    elapsed = time.monotonic() - started
+    total = sum(p.touches for p in progress)
+    print('=== {} repos in {:.0f}s, {} touches ({:.1f} touches/s)'.format(
+        len(repos), elapsed, total, total / elapsed if elapsed else 0.0))
+    for p in progress:
+        print(p.line())
+    print('[metrics] ' + METRICS.line())
+    if args.metrics:
+        METRICS.dump(args.metrics)
+    return 1 if any(p.error for p in progress) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
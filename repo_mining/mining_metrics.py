@@ -0,0 +1,124 @@
+# Throughput metrics for the GitHub client.
+# github_client records every request it sends (latency, status, body size),
+# every response cache lookup and every rate limit wait into the process wide
+# METRICS. mine.py prints its one line summary while the crawl runs and can
+# dump the whole snapshot as JSON (--metrics); benchmark.py saves it per case.
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# upper bounds of the latency histogram buckets in milliseconds, the last
+# bucket takes everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Metrics:
+    """
+    Thread safe counters, shared by the commit_fetcher workers and the repo
+    threads of mine.py.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic()
+            self.requests = {}
+            self.statuses = {}
+            self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+            self.bytes = 0
+            self.cache = {'hit': 0, 'revalidated': 0, 'miss': 0}
+            self.rate_limit_waits = 0
+            self.rate_limit_seconds = 0.0
+
+    # One request sent to GitHub
+    # @kind, 'rest' or 'graphql'
+    # @seconds, time until the whole body was in
+    # @nbytes, size of the (decompressed) body
+    def record_request(self, kind, seconds, nbytes, status):
+        ms = seconds * 1000
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            self.latency_buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+            self.latency_total += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            self.bytes += nbytes
+
+    # @outcome, 'hit' (served from the cache without a request), 'revalidated'
+    # (304 Not Modified) or 'miss'
+    def record_cache(self, outcome):
+        with self.lock:
+            self.cache[outcome] += 1
+
+    def record_rate_limit_wait(self, seconds):
+        with self.lock:
+            self.rate_limit_waits += 1
+            self.rate_limit_seconds += seconds
+
+    # Upper bound in ms of the bucket holding the q-th quantile of the
+    # latencies (at most the slowest request), None before the first request
+    def _latency_quantile(self, q):
+        total = sum(self.latency_buckets)
+        if not total:
+            return None
+        slowest = round(self.latency_max * 1000, 2)
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.latency_buckets):
+            seen += count
+            if seen >= q * total:
+                return slowest if bound is None else min(bound, slowest)
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            requests = sum(self.requests.values())
+            lookups = sum(self.cache.values())
+            hits = self.cache['hit'] + self.cache['revalidated']
+            return {
+                'elapsed_s': round(elapsed, 3),
+                'requests': requests,
+                'requests_by_kind': dict(self.requests),
+                'requests_per_s': round(requests / elapsed, 2) if elapsed else 0.0,
+                'statuses': dict(self.statuses),
+                'latency_ms': {
+                    'mean': round(self.latency_total / requests * 1000, 2) if requests else None,
+                    'p50': self._latency_quantile(0.5),
+                    'p95': self._latency_quantile(0.95),
+                    'p99': self._latency_quantile(0.99),
+                    'max': round(self.latency_max * 1000, 2),
+                    # le_ms None is the bucket of everything slower
+                    'buckets': [{'le_ms': bound, 'count': count}
+                                for bound, count in zip(LATENCY_BUCKETS_MS + (None,),
+                                                        self.latency_buckets)],
+                },
+                'bytes': self.bytes,
+                'bytes_per_s': round(self.bytes / elapsed) if elapsed else 0,
+                'cache': dict(self.cache, hit_rate=round(hits / lookups, 4) if lookups else None),
+                'rate_limit': {'waits': self.rate_limit_waits,
+                               'seconds': round(self.rate_limit_seconds, 3)},
+            }
+
+    def line(self):
+        s = self.snapshot()
+        hit_rate = s['cache']['hit_rate']
+        return ('{requests} requests ({requests_per_s:.1f}/s), p50 {p50} ms, p95 {p95} ms, '
+                '{mb:.1f} MB, cache hits {hits}, rate limit waits {waits} ({wait_s:.0f}s)').format(
+            requests=s['requests'], requests_per_s=s['requests_per_s'],
+            p50=s['latency_ms']['p50'], p95=s['latency_ms']['p95'], mb=s['bytes'] / 1e6,
+            hits='-' if hit_rate is None else '{:.0%}'.format(hit_rate),
+            waits=s['rate_limit']['waits'], wait_s=s['rate_limit']['seconds'])
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+
+METRICS = Metrics()
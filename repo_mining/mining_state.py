@@ -0,0 +1,61 @@
+# Checkpoints for incremental mining.
+# The state file records, per repo and per output file, the newest commit
+# (sha and committer date) that the output already covers. A later run asks
+# GitHub only for commits since that date and merges them into the output
+# instead of rebuilding it from scratch.
+import csv
+import json
+import os
+import threading
+
+STATE_PATH = os.path.join('data', 'mining_state.json')
+
+# repos mined side by side (see mine.py) share the state file
+_state_lock = threading.Lock()
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Returns {'sha': ..., 'date': ...} for the last run that produced output,
+# or None when there is nothing to resume from and a full run is needed.
+def load_checkpoint(repo, output, path=STATE_PATH):
+    if not os.path.exists(output):
+        return None
+    return load_state(path).get(repo, {}).get(output)
+
+
+def save_checkpoint(repo, output, checkpoint, path=STATE_PATH):
+    if checkpoint is None:
+        return
+    with _state_lock:
+        state = load_state(path)
+        state.setdefault(repo, {})[output] = checkpoint
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # write to a temp file first so a crash never leaves a truncated state file
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+
+# @shaObject, one entry of a /commits page
+def commit_checkpoint(shaObject):
+    return {'sha': shaObject['sha'],
+            'date': shaObject['commit']['committer']['date']}
+
+
+# Reads a Filename,Touches csv back into a dictfiles dictionary
+def read_touch_counts(path):
+    dictfiles = dict()
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for row in reader:
+            if row:
+                dictfiles[row[0]] = int(row[1])
+    return dictfiles
@@ -1,9 +1,9 @@
-import json
-import requests
 import csv
 
 import os
 
+from commit_fetcher import iter_commit_details, MAX_WORKERS
+
 DATA_DIR = os.path.join("repo_mining", "data")
 if not os.path.exists(DATA_DIR):
  os.makedirs(DATA_DIR)
@@ -11,51 +11,21 @@ if not os.path.exists(DATA_DIR):
 # Only treat these as "source files" for scottyab/rootbeer
 SOURCE_FILE_EXT = (".java", ".kt", ".kts")
 
-# GitHub Authentication function
-def github_auth(url, lsttoken, ct):
-    jsonData = None
-    try:
-        ct = ct % len(lstTokens)
-        headers = {'Authorization': 'Bearer {}'.format(lsttoken[ct])}
-        request = requests.get(url, headers=headers)
-        jsonData = json.loads(request.content)
-        ct += 1
-    except Exception as e:
-        pass
-        print(e)
-    return jsonData, ct
-
 # @dictFiles, empty dictionary of files
 # @lstTokens, GitHub authentication tokens
 # @repo, GitHub repo
-def countfiles(dictfiles, lsttokens, repo):
-    ipage = 1  # url page counter
-    ct = 0  # token counter
-
+def countfiles(dictfiles, lsttokens, repo, max_workers=MAX_WORKERS):
     try:
-        # loop though all the commit pages until the last returned empty page
-        while True:
-            spage = str(ipage)
-            commitsUrl = 'https://api.github.com/repos/' + repo + '/commits?page=' + spage + '&per_page=100'
-            jsonCommits, ct = github_auth(commitsUrl, lsttokens, ct)
-
-            # break out of the while loop if there are no more commits in the pages
-            if len(jsonCommits) == 0:
-                break
-            # iterate through the list of commits in  spage
-            for shaObject in jsonCommits:
-                sha = shaObject['sha']
-                # For each commit, use the GitHub commit API to extract the files touched by the commit
-                shaUrl = 'https://api.github.com/repos/' + repo + '/commits/' + sha
-                shaDetails, ct = github_auth(shaUrl, lsttokens, ct)
-                filesjson = shaDetails['files']
-                for filenameObj in filesjson:
-                    filename = filenameObj['filename']
-                    if not filename.lower().endswith(SOURCE_FILE_EXT):
-                        continue
-                    dictfiles[filename] = dictfiles.get(filename, 0) + 1
-                    print(filename)
-            ipage += 1
+        # commit pages and the per-commit details are fetched concurrently,
+        # max_workers bounds the number of requests in flight
+        for shaObject, shaDetails in iter_commit_details(repo, lsttokens, max_workers):
+            filesjson = shaDetails['files']
+            for filenameObj in filesjson:
+                filename = filenameObj['filename']
+                if not filename.lower().endswith(SOURCE_FILE_EXT):
+                    continue
+                dictfiles[filename] = dictfiles.get(filename, 0) + 1
+                print(filename)
     except:
         print("Error receiving data")
         exit(0)
@@ -72,25 +42,26 @@ repo = 'scottyab/rootbeer'
 # I would advise to create more than one token for repos with heavy commits
 lstTokens = ["", ""]
 
-dictfiles = dict()
-countfiles(dictfiles, lstTokens, repo)
-print('Total number of files: ' + str(len(dictfiles)))
-
-file = repo.split('/')[1]
-# change this to the path of your file
-fileOutput = os.path.join(DATA_DIR, 'nevryk_file_' + file + '.csv')
-rows = ["Filename", "Touches"]
-fileCSV = open(fileOutput, 'w')
-writer = csv.writer(fileCSV)
-writer.writerow(rows)
+if __name__ == "__main__":
+    dictfiles = dict()
+    countfiles(dictfiles, lstTokens, repo)
+    print('Total number of files: ' + str(len(dictfiles)))
 
-bigcount = None
-bigfilename = None
-for filename, count in dictfiles.items():
-    rows = [filename, count]
+    file = repo.split('/')[1]
+    # change this to the path of your file
+    fileOutput = os.path.join(DATA_DIR, 'nevryk_file_' + file + '.csv')
+    rows = ["Filename", "Touches"]
+    fileCSV = open(fileOutput, 'w')
+    writer = csv.writer(fileCSV)
     writer.writerow(rows)
-    if bigcount is None or count > bigcount:
-        bigcount = count
-        bigfilename = filename
-fileCSV.close()
-print('The file ' + bigfilename + ' has been touched ' + str(bigcount) + ' times.')
+
+    bigcount = None
+    bigfilename = None
+    for filename, count in dictfiles.items():
+        rows = [filename, count]
+        writer.writerow(rows)
+        if bigcount is None or count > bigcount:
+            bigcount = count
+            bigfilename = filename
+    fileCSV.close()
+    print('The file ' + bigfilename + ' has been touched ' + str(bigcount) + ' times.')
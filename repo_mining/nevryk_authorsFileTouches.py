@@ -1,27 +1,14 @@
 import csv
-import json
 import os
-import requests
+
+from github_client import github_auth
+from touch_writer import TouchWriter
 
 REPO = "scottyab/rootbeer"
 SOURCE_FILES_CSV = "repo_mining/data/nevryk_file_rootbeer.csv"
 OUTPUT_CSV = "repo_mining/data/nevryk_file_touches_authors_dates.csv"
 
 
-def github_auth(url, lsttoken, ct):
-    jsonData = None
-    try:
-        ct = ct % len(lstTokens)
-        headers = {"Authorization": "Bearer {}".format(lsttoken[ct])}
-        request = requests.get(url, headers=headers)
-        jsonData = json.loads(request.content)
-        ct += 1
-    except Exception as e:
-        pass
-        print(e)
-    return jsonData, ct
-
-
 def load_source_files(path):
     source_files = set()
     with open(path, newline="", encoding="utf-8") as f:
@@ -35,10 +22,11 @@ def load_source_files(path):
     return source_files
 
 
-def collect_file_touches(repo, source_files, lstTokens):
+# rows can be a list or a TouchWriter that streams them to the csv
+def collect_file_touches(repo, source_files, lstTokens, rows=None):
     ipage = 1
     ct = 0
-    rows = []
+    rows = [] if rows is None else rows
 
     while True:
         spage = str(ipage)
@@ -79,12 +67,8 @@ if __name__ == "__main__":
     lstTokens = [token]
 
     source_files = load_source_files(SOURCE_FILES_CSV)
-    touches = collect_file_touches(REPO, source_files, lstTokens)
-
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["filename", "author", "date"])
-        writer.writerows(touches)
+    with TouchWriter(OUTPUT_CSV, ["filename", "author", "date"]) as touches:
+        collect_file_touches(REPO, source_files, lstTokens, touches)
 
     print(f"File written to: {OUTPUT_CSV}")
     print(f"Total author file touches: {len(touches)}")
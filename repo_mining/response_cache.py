@@ -0,0 +1,98 @@
+# Persistent on-disk cache for GitHub API responses.
+# Responses are stored in SQLite: the url table maps every requested url to
+# its ETag and the sha256 digest of the body, and the body itself is stored
+# once per digest, zlib compressed. github_auth revalidates cached urls with
+# If-None-Match (a 304 does not count against the rate limit) and never goes
+# back to the network for a /commits/{sha} url, because a commit never changes.
+# Every other url is dropped once it has not been fetched or revalidated for
+# MAX_AGE seconds, together with the bodies no url points to any more, so
+# list pages of repos that are no longer mined do not pile up.
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# /repos/{owner}/{repo}/commits/{40 hex sha}, without a query string
+IMMUTABLE_URL = re.compile(r'/repos/[^/]+/[^/]+/commits/[0-9a-fA-F]{40}$')
+MAX_AGE = 30 * 24 * 3600
+# query parameters left out of the cache key: a journaled crawl pins its list
+# pages with until=<the time it started>, which differs on every run. Those
+# pages are always revalidated, so the ETag still tells whether they changed.
+VOLATILE_PARAMS = ('until',)
+
+
+def is_immutable(url):
+    return IMMUTABLE_URL.search(url) is not None
+
+
+def cache_key(url):
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if not any(k in VOLATILE_PARAMS for k, _ in query):
+        return url
+    query = [(k, v) for k, v in query if k not in VOLATILE_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query, safe=':/')))
+
+
+class ResponseCache:
+    def __init__(self, path, max_age=MAX_AGE):
+        self.path = path
+        self.lock = threading.Lock()
+        # the cache is shared by the commit_fetcher worker threads
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                          'url TEXT PRIMARY KEY, etag TEXT, digest TEXT NOT NULL, fetched REAL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS blobs ('
+                          'digest TEXT PRIMARY KEY, body BLOB NOT NULL)')
+        self.conn.create_function('is_immutable', 1, is_immutable, deterministic=True)
+        self.conn.commit()
+        if max_age is not None:
+            self.evict(max_age)
+
+    # Returns (etag, body) for a cached url, or None
+    def lookup(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT r.etag, b.body FROM responses r JOIN blobs b ON b.digest = r.digest '
+                'WHERE r.url = ?', (cache_key(url),)).fetchone()
+        if row is None:
+            return None
+        return row[0], zlib.decompress(row[1])
+
+    def store(self, url, etag, body):
+        digest = hashlib.sha256(body).hexdigest()
+        with self.lock:
+            self.conn.execute('INSERT OR IGNORE INTO blobs (digest, body) VALUES (?, ?)',
+                              (digest, zlib.compress(body)))
+            self.conn.execute('INSERT OR REPLACE INTO responses (url, etag, digest, fetched) '
+                              'VALUES (?, ?, ?, ?)', (cache_key(url), etag, digest, time.time()))
+            self.conn.commit()
+
+    # Marks a cached url as still in use, after a 304 revalidated it
+    def refresh(self, url):
+        with self.lock:
+            self.conn.execute('UPDATE responses SET fetched = ? WHERE url = ?',
+                              (time.time(), cache_key(url)))
+            self.conn.commit()
+
+    # Drops the urls other than commits not fetched or refreshed for max_age
+    # seconds and the bodies left without a url, returns how many urls went
+    def evict(self, max_age=MAX_AGE):
+        with self.lock:
+            evicted = self.conn.execute(
+                'DELETE FROM responses WHERE NOT is_immutable(url) AND fetched < ?',
+                (time.time() - max_age,)).rowcount
+            if evicted:
+                self.conn.execute('DELETE FROM blobs WHERE digest NOT IN '
+                                  '(SELECT digest FROM responses)')
+            self.conn.commit()
+        return evicted
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
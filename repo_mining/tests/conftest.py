@@ -0,0 +1,55 @@
+"""
+Fixtures for the repo_mining tests
+
+github_client reads GITHUB_API_URL and GITHUB_CACHE when it is imported, so
+the fake GitHub API (fake_github.py) is started and the collectors pointed
+at it, with the response cache off, before any test module imports them.
+"""
+import os
+import subprocess
+import pytest
+import fake_github
+
+REPO = 'scottyab/rootbeer'
+FAKE_REPO = fake_github.FakeRepo(REPO, commits=250, files=40)
+SERVER, API_URL = fake_github.serve_in_thread(FAKE_REPO)
+os.environ['GITHUB_API_URL'] = API_URL
+os.environ['GITHUB_CACHE'] = ''
+TOKENS = ['test-token']
+
+
+def git(repo, *args, date='2024-10-04T09:42:57+02:00'):
+    """Run git in @repo as a fixed author, committing at @date"""
+    env = dict(os.environ, GIT_AUTHOR_NAME='Ada', GIT_AUTHOR_EMAIL='ada@example.com',
+               GIT_COMMITTER_NAME='Ada', GIT_COMMITTER_EMAIL='ada@example.com',
+               GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date,
+               GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM='1')
+    return subprocess.run(['git', '-C', str(repo), *args], check=True, env=env,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def commit(repo, files, message, date):
+    """Write @files ({path: content}) in the work tree @repo, commit them and return the sha"""
+    for filename, content in files.items():
+        path = repo / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        git(repo, 'add', filename)
+    git(repo, 'commit', '-q', '-m', message, date=date)
+    return git(repo, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run every test in a fresh directory, the scripts write to data/ below it"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    return tmp_path
+
+
+@pytest.fixture()
+def fake_repo():
+    """The served FakeRepo, its commits restored after the test"""
+    commits, by_sha = list(FAKE_REPO.commits), dict(FAKE_REPO.by_sha)
+    yield FAKE_REPO
+    FAKE_REPO.commits, FAKE_REPO.by_sha = commits, by_sha
@@ -0,0 +1,125 @@
+"""
+Test Cases for Richard_authorsFileTouches.py, run against the fake GitHub
+API
+"""
+import csv
+import os
+import pytest
+import Richard_authorsFileTouches as touches
+from mining_metrics import METRICS
+from mining_state import load_checkpoint, read_touch_counts
+from touch_columnar import load_touches
+from tests.conftest import REPO, TOKENS
+from tests.test_collect_files import expected_counts
+
+COUNTS = os.path.join('data', 'counts.csv')
+JOURNAL = os.path.join('data', 'journal', 'touches_scottyab__rootbeer.jsonl')
+
+
+def touch_output(output_format):
+    return os.path.join('data', 'touches.parquet' if output_format == 'parquet' else 'touches.csv')
+
+
+def expected_touches(fake_repo):
+    """(filename, sha, login, date) of every source file touch"""
+    counts = expected_counts(fake_repo)
+    return sorted((filename, commit['sha'], commit['login'], commit['date'])
+                  for commit in fake_repo.commits for filename in commit['files']
+                  if filename in counts)
+
+
+def read_touches(path):
+    """(filename, sha, login, date) of every row of a touch output"""
+    if path.endswith('.parquet'):
+        df = load_touches(path)
+        return sorted(zip(df['Filename'].astype(str), df['CommitSHA'], df['AuthorLogin'].astype(str),
+                          df['CommitDate'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')))
+    with open(path, newline='', encoding='utf-8') as f:
+        return sorted((row['Filename'], row['CommitSHA'], row['AuthorLogin'], row['CommitDate'])
+                      for row in csv.DictReader(f))
+
+
+def mine(output_format='csv', backend='api'):
+    return touches.mine_repo(REPO, TOKENS, COUNTS, touch_output(output_format), backend=backend,
+                             max_workers=4)
+
+
+class TestCollectCountsAndTouches:
+    """Test cases for collect_counts_and_touches"""
+
+    @pytest.mark.parametrize('api', ['rest', 'graphql'])
+    def test_one_traversal(self, fake_repo, api):
+        """It should build the counts and one row per touch, over REST and GraphQL alike"""
+        counts, rows, newest = touches.collect_counts_and_touches(REPO, TOKENS, max_workers=4,
+                                                                  api=api)
+        assert counts == expected_counts(fake_repo)
+        assert sorted((r['filename'], r['sha'], r['author_login'], r['date_iso'])
+                      for r in rows) == expected_touches(fake_repo)
+        assert newest == {'sha': fake_repo.commits[0]['sha'], 'date': fake_repo.commits[0]['date']}
+
+    def test_failed_commit(self, fake_repo):
+        """It should raise on a commit whose details cannot be fetched, not skip it"""
+        fake_repo.by_sha.pop(fake_repo.commits[100]['sha'])
+        with pytest.raises(RuntimeError):
+            touches.collect_counts_and_touches(REPO, TOKENS, max_workers=4)
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet'])
+class TestMineRepo:
+    """Test cases for mine_repo"""
+
+    @pytest.mark.parametrize('backend', ['api', 'graphql'])
+    def test_full_run(self, fake_repo, output_format, backend):
+        """It should write the counts and one row per touch, over REST and GraphQL alike"""
+        counts = mine(output_format, backend)
+        assert counts == expected_counts(fake_repo) == read_touch_counts(COUNTS)
+        assert read_touches(touch_output(output_format)) == expected_touches(fake_repo)
+        assert load_checkpoint(REPO, COUNTS)['sha'] == fake_repo.commits[0]['sha']
+
+    def test_incremental_merge(self, fake_repo, output_format):
+        """It should add the commits made since the last run to both outputs"""
+        full = list(fake_repo.commits)
+        fake_repo.commits = full[80:]
+        mine(output_format)
+        fake_repo.commits = full
+        METRICS.reset()
+        counts = mine(output_format)
+        # languages, the new commits and the commit list pages listing them
+        assert METRICS.snapshot()['requests'] <= 80 + 4
+        assert counts == expected_counts(fake_repo) == read_touch_counts(COUNTS)
+        assert read_touches(touch_output(output_format)) == expected_touches(fake_repo)
+
+    def test_failed_commit_saves_no_checkpoint(self, fake_repo, output_format):
+        """It should stop on a commit whose details cannot be fetched, not skip it"""
+        fake_repo.by_sha.pop(fake_repo.commits[100]['sha'])
+        with pytest.raises(RuntimeError):
+            mine(output_format)
+        assert load_checkpoint(REPO, COUNTS) is None
+        # no rows, and for parquet no part file, hidden or not, is left behind
+        path = touch_output(output_format)
+        assert not os.path.exists(path) or os.path.isdir(path) and not os.listdir(path)
+
+    def test_resume_after_a_failed_incremental_run(self, fake_repo, output_format):
+        """It should resume from the journal and leave no duplicate rows behind"""
+        full = list(fake_repo.commits)
+        fake_repo.commits = full[80:]
+        mine(output_format)
+        fake_repo.commits = full
+        failing = full[50]['sha']
+        detail = fake_repo.by_sha.pop(failing)
+        with pytest.raises(RuntimeError):
+            mine(output_format)
+        assert os.path.exists(JOURNAL)
+        # the output still holds the rows of the first run only
+        fake_repo.commits = full[80:]
+        assert read_touches(touch_output(output_format)) == expected_touches(fake_repo)
+
+        fake_repo.commits = full
+        fake_repo.by_sha[failing] = detail
+        METRICS.reset()
+        counts = mine(output_format)
+        # only the commits missing from the journal are fetched
+        assert METRICS.snapshot()['requests'] <= 80 - 50 + 4
+        assert not os.path.exists(JOURNAL)
+        assert counts == expected_counts(fake_repo) == read_touch_counts(COUNTS)
+        assert read_touches(touch_output(output_format)) == expected_touches(fake_repo)
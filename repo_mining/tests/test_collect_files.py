@@ -0,0 +1,62 @@
+"""
+Test Cases for countfiles in RichardSserunjogi_CollectFiles.py, run against
+the fake GitHub API
+"""
+import os
+import pytest
+import RichardSserunjogi_CollectFiles as collect
+from mining_metrics import METRICS
+from tests.conftest import REPO, TOKENS
+
+SOURCE_EXTENSIONS = ('.java', '.kt', '.cpp', '.h')
+
+
+def expected_counts(fake_repo):
+    """Touches per source file, straight from the synthetic history"""
+    counts = {}
+    for commit in fake_repo.commits:
+        for filename in commit['files']:
+            if filename.endswith(SOURCE_EXTENSIONS):
+                counts[filename] = counts.get(filename, 0) + 1
+    return counts
+
+
+class TestCountFiles:
+    """Test cases for countfiles"""
+
+    @pytest.mark.parametrize('api', ['rest', 'graphql'])
+    def test_counts_match_the_history(self, fake_repo, api):
+        """It should count every touch of every source file over REST and GraphQL alike"""
+        dictfiles = {}
+        newest = collect.countfiles(dictfiles, TOKENS, REPO, max_workers=4, api=api)
+        assert dictfiles == expected_counts(fake_repo)
+        assert newest == {'sha': fake_repo.commits[0]['sha'], 'date': fake_repo.commits[0]['date']}
+        # the journal is gone once the crawl is complete
+        assert not os.listdir(os.path.join('data', 'journal'))
+
+    def test_incremental_counts(self, fake_repo):
+        """It should add only the commits made since the checkpoint"""
+        full = list(fake_repo.commits)
+        fake_repo.commits = full[60:]
+        dictfiles = {}
+        checkpoint = collect.countfiles(dictfiles, TOKENS, REPO, max_workers=4)
+        fake_repo.commits = full
+        newest = collect.countfiles(dictfiles, TOKENS, REPO, max_workers=4, checkpoint=checkpoint)
+        assert dictfiles == expected_counts(fake_repo)
+        assert newest['sha'] == full[0]['sha']
+
+    def test_resume_from_journal(self, fake_repo):
+        """It should resume an interrupted crawl where it stopped and count the same"""
+        failing = fake_repo.commits[150]['sha']
+        detail = fake_repo.by_sha.pop(failing)
+        with pytest.raises(SystemExit):
+            collect.countfiles({}, TOKENS, REPO, max_workers=4)
+        assert os.path.exists(os.path.join('data', 'journal', 'countfiles_scottyab__rootbeer.jsonl'))
+
+        fake_repo.by_sha[failing] = detail
+        METRICS.reset()
+        dictfiles = {}
+        collect.countfiles(dictfiles, TOKENS, REPO, max_workers=4)
+        assert dictfiles == expected_counts(fake_repo)
+        # the commits counted before the failure are not fetched again
+        assert METRICS.snapshot()['requests'] <= len(fake_repo.commits) - 150 + 5
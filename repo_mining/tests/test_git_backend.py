@@ -0,0 +1,115 @@
+"""
+Test Cases for git_backend.py, run against a local repository built in a
+temporary directory
+"""
+import os
+import subprocess
+from datetime import datetime, timedelta
+import pytest
+import git_backend
+import Richard_authorsFileTouches as touches
+from mining_state import load_checkpoint, read_touch_counts
+from tests.conftest import REPO, TOKENS, commit, git
+from tests.test_authors_file_touches import expected_touches, read_touches
+from tests.test_collect_files import expected_counts
+
+COUNTS = os.path.join('data', 'counts.csv')
+TOUCHES = os.path.join('data', 'touches.csv')
+
+
+@pytest.fixture()
+def local_repo(tmp_path):
+    """Fixture for a bare repository with a merge, and the shas it was built from"""
+    work = tmp_path / 'work'
+    work.mkdir()
+    git(work, 'init', '-q', '-b', 'main')
+    shas = {
+        'first': commit(work, {'src/App.java': 'a', 'README.md': 'a'}, 'first',
+                        '2024-10-01T10:00:00+02:00'),
+        'second': commit(work, {'src/App.java': 'b', 'src/util.cpp': 'b'}, 'second',
+                         '2024-10-02T10:00:00+02:00'),
+    }
+    git(work, 'checkout', '-q', '-b', 'feature')
+    shas['feature'] = commit(work, {'src/Feature.kt': 'c'}, 'feature', '2024-10-03T10:00:00+02:00')
+    git(work, 'checkout', '-q', 'main')
+    shas['third'] = commit(work, {'src/util.h': 'd'}, 'third', '2024-10-03T11:00:00+02:00')
+    git(work, 'merge', '-q', '--no-ff', '-m', 'merge', 'feature', date='2024-10-04T09:42:57+02:00')
+    shas['merge'] = git(work, 'rev-parse', 'HEAD')
+    bare = tmp_path / 'bare.git'
+    subprocess.run(['git', 'clone', '-q', '--bare', str(work), str(bare)], check=True)
+    return str(bare), shas
+
+
+class TestGitBackend:
+    """Test cases for the git log backend"""
+
+    def test_iter_commits(self, local_repo):
+        """It should yield every commit newest first, merges against their first parent"""
+        bare, shas = local_repo
+        commits = list(git_backend.iter_commits(bare))
+        assert [c['sha'] for c in commits] == [shas['merge'], shas['third'], shas['feature'],
+                                               shas['second'], shas['first']]
+        assert [sorted(c['files']) for c in commits] == [
+            ['src/Feature.kt'], ['src/util.h'], ['src/Feature.kt'],
+            ['src/App.java', 'src/util.cpp'], ['README.md', 'src/App.java']]
+        assert commits[0]['author_name'] == 'Ada'
+        assert commits[0]['author_email'] == 'ada@example.com'
+        # dates are in UTC, the way the API returns them
+        assert commits[0]['date_iso'] == '2024-10-04T07:42:57Z'
+
+    def test_countfiles(self, local_repo):
+        """It should count every touch, or only those of source files"""
+        bare, _ = local_repo
+        assert git_backend.countfiles({}, bare) == {
+            'README.md': 1, 'src/App.java': 2, 'src/util.cpp': 1, 'src/util.h': 1,
+            'src/Feature.kt': 2}
+        assert git_backend.countfiles({}, bare, lambda f: f.endswith('.java')) == {'src/App.java': 2}
+
+    def test_head_checkpoint(self, local_repo):
+        """It should checkpoint HEAD with its committer date in UTC"""
+        bare, shas = local_repo
+        assert git_backend.head_checkpoint(bare) == {'sha': shas['merge'],
+                                                     'date': '2024-10-04T07:42:57Z'}
+
+    def test_mine_repo(self, local_repo):
+        """It should write the counts and the touch rows of a local repository"""
+        bare, shas = local_repo
+        counts = touches.mine_repo(bare, [], COUNTS, TOUCHES, backend='git')
+        assert counts == {'src/App.java': 2, 'src/util.cpp': 1, 'src/util.h': 1,
+                          'src/Feature.kt': 2}
+        # git has no GitHub login
+        # both outputs are checkpointed at HEAD, with its committer date in UTC
+        assert load_checkpoint(bare, COUNTS) == load_checkpoint(bare, TOUCHES) == {
+            'sha': shas['merge'], 'date': '2024-10-04T07:42:57Z'}
+        assert read_touches(TOUCHES) == sorted(
+            (filename, shas[name], '', date) for filename, name, date in [
+                ('src/Feature.kt', 'merge', '2024-10-04T07:42:57Z'),
+                ('src/util.h', 'third', '2024-10-03T09:00:00Z'),
+                ('src/Feature.kt', 'feature', '2024-10-03T08:00:00Z'),
+                ('src/App.java', 'second', '2024-10-02T08:00:00Z'),
+                ('src/util.cpp', 'second', '2024-10-02T08:00:00Z'),
+                ('src/App.java', 'first', '2024-10-01T08:00:00Z')])
+
+    def test_api_run_after_a_git_run(self, tmp_path, fake_repo):
+        """It should continue a git mined output from its HEAD over the API, not from an older checkpoint"""
+        full = list(fake_repo.commits)
+        fake_repo.commits = full[80:]
+        touches.mine_repo(REPO, TOKENS, COUNTS, TOUCHES, max_workers=4)
+        # a clone whose HEAD is an hour older than commit 40 of the API, the newest
+        # 41 commits are still to be mined
+        head = datetime.strptime(full[40]['date'], '%Y-%m-%dT%H:%M:%SZ') - timedelta(hours=1)
+        work = tmp_path / 'work'
+        work.mkdir()
+        git(work, 'init', '-q', '-b', 'main')
+        commit(work, {'src/App.java': 'a'}, 'first', head.strftime('%Y-%m-%dT%H:%M:%S+00:00'))
+        bare = tmp_path / 'bare.git'
+        subprocess.run(['git', 'clone', '-q', '--bare', str(work), str(bare)], check=True)
+        git_counts = touches.mine_repo(REPO, [], COUNTS, TOUCHES, backend='git',
+                                       local_clone=str(bare))
+        git_rows = read_touches(TOUCHES)
+
+        fake_repo.commits = full
+        counts = touches.mine_repo(REPO, TOKENS, COUNTS, TOUCHES, max_workers=4)
+        fake_repo.commits = full[:41]
+        assert counts == dict(git_counts, **expected_counts(fake_repo)) == read_touch_counts(COUNTS)
+        assert read_touches(TOUCHES) == sorted(git_rows + expected_touches(fake_repo))
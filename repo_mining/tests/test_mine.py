@@ -0,0 +1,38 @@
+"""
+Test Cases for the mine.py command line, run against the fake GitHub API
+"""
+import os
+import github_client
+import mine
+from mining_state import load_checkpoint
+from tests.conftest import API_URL, REPO
+
+
+class TestMine:
+    """Test cases for mine.main"""
+
+    def test_everything_goes_to_the_data_dir(self, fake_repo, monkeypatch):
+        """It should keep the outputs, the checkpoints and the journals under --data-dir"""
+        monkeypatch.setenv('GITHUB_TOKENS', 'test-token')
+        out = os.path.join('out', 'data')
+        assert mine.main([REPO, '--data-dir', out, '--workers', '4']) == 0
+        counts_csv, touch_output, _ = mine.repo_paths(REPO, out)
+        state_path = os.path.join(out, 'mining_state.json')
+        assert load_checkpoint(REPO, counts_csv, state_path)['sha'] == fake_repo.commits[0]['sha']
+        assert load_checkpoint(REPO, touch_output, state_path)['sha'] == fake_repo.commits[0]['sha']
+        assert os.listdir(os.path.join(out, 'journal')) == []
+        assert os.listdir('data') == []
+
+    def test_unauthenticated_requests(self):
+        """It should leave the Authorization header out when there is no token"""
+        sent = []
+
+        def send(headers):
+            sent.append(headers)
+            return github_client.get_session().get(API_URL + '/repos/' + REPO + '/languages',
+                                                   headers=headers)
+
+        assert github_client.send_with_pool([''], send).status_code == 200
+        assert github_client.send_with_pool(['test-token'], send).status_code == 200
+        assert 'Authorization' not in sent[0]
+        assert sent[1]['Authorization'] == 'Bearer test-token'
@@ -0,0 +1,55 @@
+"""
+Test Cases for the on-disk GitHub response cache
+"""
+import time
+from response_cache import MAX_AGE, ResponseCache
+
+LIST_URL = 'https://api.github.com/repos/scottyab/rootbeer/commits?page=1&per_page=100'
+COMMIT_URL = 'https://api.github.com/repos/scottyab/rootbeer/commits/' + 'a' * 40
+
+
+def backdate(cache, url, seconds):
+    cache.conn.execute('UPDATE responses SET fetched = ? WHERE url = ?', (time.time() - seconds, url))
+    cache.conn.commit()
+
+
+class TestResponseCache:
+    """Test cases for ResponseCache"""
+
+    def test_lookup(self, tmp_path):
+        """It should return the ETag and body stored for a url"""
+        cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+        assert cache.lookup(LIST_URL) is None
+        cache.store(LIST_URL, '"etag"', b'[1, 2]')
+        assert cache.lookup(LIST_URL) == ('"etag"', b'[1, 2]')
+        cache.close()
+
+    def test_stale_list_pages_are_evicted(self, tmp_path):
+        """It should drop list pages not used for MAX_AGE, but keep every commit"""
+        path = str(tmp_path / 'cache.sqlite')
+        cache = ResponseCache(path)
+        cache.store(LIST_URL, '"list"', b'[1]')
+        cache.store(LIST_URL + '&since=2024-01-01T00:00:00Z', '"recent"', b'[2]')
+        cache.store(COMMIT_URL, None, b'{}')
+        for url in [LIST_URL, LIST_URL + '&since=2024-01-01T00:00:00Z', COMMIT_URL]:
+            backdate(cache, url, MAX_AGE + 60)
+        # a revalidated page is still in use
+        cache.refresh(LIST_URL + '&since=2024-01-01T00:00:00Z')
+        cache.close()
+
+        cache = ResponseCache(path)
+        assert cache.lookup(LIST_URL) is None
+        assert cache.lookup(LIST_URL + '&since=2024-01-01T00:00:00Z') == ('"recent"', b'[2]')
+        assert cache.lookup(COMMIT_URL) == (None, b'{}')
+        # the body of the evicted page is gone as well
+        assert cache.conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 2
+        cache.close()
+
+    def test_until_is_not_part_of_the_key(self, tmp_path):
+        """It should find a list page pinned to another until, to revalidate it"""
+        cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+        cache.store(LIST_URL + '&until=2024-10-04T07:42:57Z', '"etag"', b'[1]')
+        assert cache.lookup(LIST_URL + '&until=2024-10-05T08:00:00Z') == ('"etag"', b'[1]')
+        assert cache.lookup(LIST_URL) == ('"etag"', b'[1]')
+        assert cache.conn.execute('SELECT url FROM responses').fetchall() == [(LIST_URL,)]
+        cache.close()
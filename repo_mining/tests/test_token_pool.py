@@ -0,0 +1,81 @@
+"""
+Test Cases for the rate-limit aware TokenPool and send_with_pool
+"""
+import time
+import github_client
+import token_pool
+from token_pool import MAX_RETRIES, TokenPool
+
+
+class FakeResponse:
+    """Just what the pool and send_with_pool read from a requests.Response"""
+
+    def __init__(self, status_code=200, remaining='4999', reset=None, url='http://fake/'):
+        self.status_code = status_code
+        self.url = url
+        self.content = b'{"message": "API rate limit exceeded"}' if status_code == 403 else b'{}'
+        self.headers = {'X-RateLimit-Remaining': remaining,
+                        'X-RateLimit-Reset': str(reset if reset is not None else time.time() + 3600)}
+
+
+def rate_limited(reset):
+    return FakeResponse(403, '0', reset)
+
+
+class FakeClock:
+    """Stands in for the time module of token_pool, sleep() only moves the clock on"""
+
+    def __init__(self):
+        self.now = time.time()
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenPool:
+    """Test cases for TokenPool"""
+
+    def test_healthiest_token_first(self):
+        """It should send the next request with the token that has the most requests left"""
+        pool = TokenPool(['a', 'b'])
+        pool.update(0, FakeResponse(remaining='10'))
+        pool.update(1, FakeResponse(remaining='20'))
+        assert pool.acquire() == (1, 'b')
+
+    def test_spent_token_with_a_past_reset(self, monkeypatch):
+        """It should wait before using a spent token again even when its reset is already past"""
+        clock = FakeClock()
+        monkeypatch.setattr(token_pool, 'time', clock)
+        pool = TokenPool(['a'])
+        pool.update(0, rate_limited(clock.now - 60))
+        pool.acquire()
+        assert clock.sleeps == [token_pool.PRIMARY_BACKOFF]
+        # every further hit doubles the wait, a response that goes through starts over
+        pool.update(0, rate_limited(clock.now - 60))
+        pool.acquire()
+        assert clock.sleeps[-1] == 2 * token_pool.PRIMARY_BACKOFF
+        pool.update(0, FakeResponse(reset=clock.now - 60))
+        pool.update(0, rate_limited(clock.now - 60))
+        pool.acquire()
+        assert clock.sleeps[-1] == token_pool.PRIMARY_BACKOFF
+
+    def test_primary_limit_retries_are_counted(self, monkeypatch):
+        """It should give up on a request that stays rate limited after MAX_RETRIES"""
+        clock = FakeClock()
+        monkeypatch.setattr(token_pool, 'time', clock)
+        sent = []
+
+        def send(headers):
+            sent.append(headers)
+            assert len(sent) <= 10 * MAX_RETRIES, 'the request is retried without end'
+            return rate_limited(clock.now - 60)
+
+        response = github_client.send_with_pool(['primary-limit-token'], send)
+        assert response.status_code == 403
+        assert len(sent) == MAX_RETRIES + 1
+        assert clock.sleeps == [token_pool.PRIMARY_BACKOFF * 2 ** i for i in range(MAX_RETRIES)]
@@ -0,0 +1,54 @@
+"""
+Test Cases for the weekly touch cube in touch_cube.py
+"""
+import os
+import touch_cube
+from touch_columnar import ParquetTouchWriter
+from touch_writer import TouchWriter
+
+HEADER = ['Filename', 'AuthorLogin', 'CommitDate']
+# the cube of a log is kept next to it under the same base name
+LOGS = [os.path.join('data', 'touches.csv'), os.path.join('data', 'parquet_touches.parquet')]
+
+
+def touch_rows(count, author='ada'):
+    return [['src/App.java', author, '2024-10-0{}T10:00:00Z'.format(1 + i % 7)]
+            for i in range(count)]
+
+
+def write(path, rows, append=False):
+    if path.endswith('.parquet'):
+        writer = ParquetTouchWriter(path, HEADER, append=append, timestamp_columns=['CommitDate'])
+    else:
+        writer = TouchWriter(path, HEADER, append=append)
+    with writer:
+        writer.extend(rows)
+
+
+def update(path):
+    return touch_cube.update_cube(path, 'Filename', 'AuthorLogin', 'CommitDate')
+
+
+class TestTouchCube:
+    """Test cases for update_cube"""
+
+    def test_appended_rows(self):
+        """It should add the rows appended to a log since the last update"""
+        for path in LOGS:
+            write(path, touch_rows(2))
+            assert update(path)['Touches'].sum() == 2
+            write(path, touch_rows(3, 'bob'), append=True)
+            cube = update(path)
+            assert cube['Touches'].sum() == 5
+            assert touch_cube.ranked(cube, 'Author').to_dict() == {'bob': 3, 'ada': 2}
+
+    def test_rewritten_log(self):
+        """It should rebuild the cube when the log was rewritten rather than appended to"""
+        for path in LOGS:
+            write(path, touch_rows(1))
+            assert update(path)['Touches'].sum() == 1
+            # a rewrite of a parquet dataset reuses the name of its first part
+            write(path, touch_rows(3, 'bob'))
+            cube = update(path)
+            assert cube['Touches'].sum() == 3
+            assert touch_cube.ranked(cube, 'Author').to_dict() == {'bob': 3}
@@ -0,0 +1,28 @@
+"""
+Test Cases for the week x file density grid of touch_density.py
+"""
+import numpy as np
+import touch_density
+
+
+class TestDominantAuthorGrid:
+    """Test cases for dominant_author_grid"""
+
+    def test_touches_and_dominant_author(self):
+        """It should count the touches of every cell and pick its main author"""
+        touches, dominant = touch_density.dominant_author_grid(
+            weeks=[0, 0, 0, 1], files=[0, 0, 0, 1], authors=[1, 0, 1, 0],
+            n_weeks=2, n_files=2, n_authors=2)
+        assert touches.tolist() == [[3, 0], [0, 1]]
+        assert dominant.tolist() == [[1, -1], [-1, 0]]
+
+    def test_weights_match_one_entry_per_touch(self):
+        """It should bin weighted rows, such as cube rows, like the touches they stand for"""
+        rnd = np.random.default_rng(0)
+        weeks, files, authors = (rnd.integers(0, n, 500) for n in (60, 30, 5))
+        # one entry per (week, file, author) with its number of touches
+        keys, weights = np.unique(np.stack([weeks, files, authors]), axis=1, return_counts=True)
+        weighted = touch_density.dominant_author_grid(*keys, 60, 30, 5, weights=weights)
+        expanded = touch_density.dominant_author_grid(*np.repeat(keys, weights, axis=1), 60, 30, 5)
+        assert np.array_equal(weighted[0], expanded[0])
+        assert np.array_equal(weighted[1], expanded[1])
@@ -0,0 +1,71 @@
+"""
+Test Cases for the streaming touch writers, TouchWriter and ParquetTouchWriter
+"""
+import os
+import pytest
+from touch_columnar import ParquetTouchWriter, load_touches
+from touch_writer import TouchWriter
+
+HEADER = ['Filename', 'AuthorLogin', 'CommitDate']
+PATH = os.path.join('data', 'touches.csv')
+DATASET = os.path.join('data', 'touches.parquet')
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+class TestTouchWriter:
+    """Test cases for TouchWriter"""
+
+    def test_staged_rows_reach_the_output_on_commit(self):
+        """It should leave the output alone until commit(), then add the rows after it"""
+        with TouchWriter(PATH, HEADER) as writer:
+            writer.append(['a.java', 'dev0', '2024-01-01T00:00:00Z'])
+        with TouchWriter(PATH, HEADER, append=True, staged=True) as writer:
+            writer.append(['b.java', 'dev1', '2024-01-02T00:00:00Z'])
+            writer.flush()
+            assert read_lines(PATH) == ['Filename,AuthorLogin,CommitDate',
+                                        'a.java,dev0,2024-01-01T00:00:00Z']
+            writer.commit()
+        assert read_lines(PATH) == ['Filename,AuthorLogin,CommitDate',
+                                    'a.java,dev0,2024-01-01T00:00:00Z',
+                                    'b.java,dev1,2024-01-02T00:00:00Z']
+        assert not os.path.exists(PATH + '.part')
+
+    def test_uncommitted_rows_are_dropped(self):
+        """It should start the part of a run that never committed over"""
+        with TouchWriter(PATH, HEADER, staged=True) as writer:
+            writer.append(['a.java', 'dev0', '2024-01-01T00:00:00Z'])
+        assert not os.path.exists(PATH)
+        with TouchWriter(PATH, HEADER, staged=True) as writer:
+            writer.commit()
+        assert read_lines(PATH) == ['Filename,AuthorLogin,CommitDate']
+
+
+class TestParquetTouchWriter:
+    """Test cases for ParquetTouchWriter"""
+
+    def write(self, rows, append=False):
+        with ParquetTouchWriter(DATASET, HEADER, append=append, staged=True) as writer:
+            writer.extend(rows)
+            writer.commit()
+
+    def test_parts_are_added_on_commit(self):
+        """It should add one part per committed writer, or replace the parts without append"""
+        self.write([['a.java', 'dev0', '2024-01-01T00:00:00Z']])
+        self.write([['b.java', 'dev1', '2024-01-02T00:00:00Z']], append=True)
+        assert sorted(load_touches(DATASET)['Filename']) == ['a.java', 'b.java']
+        self.write([['c.java', 'dev2', '2024-01-03T00:00:00Z']])
+        assert list(load_touches(DATASET)['Filename']) == ['c.java']
+
+    def test_failed_run_adds_nothing(self):
+        """It should throw the part away when the with block is left on an exception"""
+        self.write([['a.java', 'dev0', '2024-01-01T00:00:00Z']])
+        with pytest.raises(RuntimeError):
+            with ParquetTouchWriter(DATASET, HEADER, staged=True) as writer:
+                writer.append(['b.java', 'dev1', '2024-01-02T00:00:00Z'])
+                raise RuntimeError('crawl failed')
+        assert list(load_touches(DATASET)['Filename']) == ['a.java']
+        assert os.listdir(DATASET) == ['part-00000.parquet']
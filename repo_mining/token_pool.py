@@ -0,0 +1,106 @@
+# Rate-limit aware token scheduler for github_auth.
+# Instead of rotating through the tokens with ct % len(lsttoken), every
+# response updates the budget of the token that sent it from the
+# X-RateLimit-Remaining / X-RateLimit-Reset headers, and the next request goes
+# out on the token with the most requests left. When every token is spent the
+# pool sleeps until the earliest reset instead of failing the crawl.
+import threading
+import time
+
+from mining_metrics import METRICS
+
+# secondary rate limits do not say when they end, GitHub asks to wait at
+# least a minute and to back off exponentially on repeated hits
+SECONDARY_BACKOFF = 60
+MAX_RETRIES = 5
+# a token that hit its primary limit is kept out of rotation until its reset,
+# and for at least this many seconds, doubled on every further hit: with a
+# skewed clock the reported reset can already be in the past
+PRIMARY_BACKOFF = 1
+
+
+class TokenPool:
+    def __init__(self, tokens):
+        if not tokens:
+            raise ValueError('at least one GitHub token is required')
+        self.tokens = list(tokens)
+        self.lock = threading.Lock()
+        # None = budget unknown until the token's first response comes back
+        self.remaining = [None] * len(self.tokens)
+        self.reset = [0.0] * len(self.tokens)
+        # primary limit hits of each token since its last successful response
+        self.strikes = [0] * len(self.tokens)
+
+    def _budget(self, index, now):
+        if self.reset[index] <= now and self.remaining[index] == 0:
+            # the window has rolled over, the next response reports the new budget
+            self.remaining[index] = None
+        if self.remaining[index] is None:
+            return float('inf')
+        return self.remaining[index]
+
+    # Returns (index, token) of the healthiest token, sleeping while all are exhausted
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                budgets = [self._budget(i, now) for i in range(len(self.tokens))]
+                best = max(range(len(self.tokens)), key=lambda i: budgets[i])
+                if budgets[best] > 0:
+                    if self.remaining[best] is not None:
+                        # reserve the request so concurrent callers spread out
+                        self.remaining[best] -= 1
+                    return best, self.tokens[best]
+                wait = min(self.reset) - now
+            print('All tokens are rate limited, sleeping {:.0f}s until the earliest reset'.format(wait))
+            METRICS.record_rate_limit_wait(max(wait, 1))
+            time.sleep(max(wait, 1))
+
+    # Records the budget reported by a response sent with token index
+    def update(self, index, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        with self.lock:
+            if remaining is not None:
+                self.remaining[index] = int(remaining)
+            if reset is not None:
+                self.reset[index] = float(reset)
+            if remaining == '0' and is_rate_limited(response):
+                self.strikes[index] += 1
+                backoff = PRIMARY_BACKOFF * 2 ** (self.strikes[index] - 1)
+                self.reset[index] = max(self.reset[index], time.time() + backoff)
+            elif response.status_code < 400:
+                self.strikes[index] = 0
+
+
+def is_rate_limited(response):
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    return (response.headers.get('X-RateLimit-Remaining') == '0'
+            or 'Retry-After' in response.headers
+            or b'rate limit' in response.content.lower())
+
+
+# Seconds to wait before retrying a rate limited response, 0 when another
+# token (or the pool's own sleep until reset) can take over right away
+def retry_delay(response, attempt):
+    if 'Retry-After' in response.headers:
+        return float(response.headers['Retry-After'])
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        return 0
+    return SECONDARY_BACKOFF * 2 ** (attempt - 1)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# One pool per token list, shared by every caller that mines with those tokens
+def get_token_pool(lsttoken):
+    key = tuple(lsttoken)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = TokenPool(lsttoken)
+        return _pools[key]
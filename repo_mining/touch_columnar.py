@@ -0,0 +1,220 @@
+# Columnar (Parquet / Feather) storage for mined touch data.
+# Touch logs are written as typed columns: filename and author columns are
+# dictionary encoded, so each distinct value is stored once, and commit dates
+# are a native UTC timestamp column, so readers skip pd.to_datetime entirely.
+# A parquet output is a directory of part files: an incremental run adds a
+# part instead of rewriting the data. A part is written under a hidden name,
+# which parquet readers skip, and only renamed into the dataset once it is
+# complete, so a killed writer never leaves a part without its footer.
+# pyarrow is optional and only needed when a columnar format is used.
+import csv
+import glob
+import os
+from datetime import datetime, timezone
+
+from touch_writer import FLUSH_EVERY
+
+PARQUET_EXT = '.parquet'
+FEATHER_EXTS = ('.feather', '.arrow')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+    except ImportError:
+        raise ImportError('pyarrow is required for parquet/feather output, '
+                          'run: pip install pyarrow')
+    return pyarrow
+
+
+# ISO 8601 date ('2024-10-04T07:42:57Z' or '2024-10-04') -> epoch seconds
+def to_epoch(value):
+    if not value:
+        return None
+    date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp())
+
+
+def schema_for(header, dictionary_columns=(), timestamp_columns=()):
+    pa = _pyarrow()
+    fields = []
+    for name in header:
+        if name in timestamp_columns:
+            fields.append(pa.field(name, pa.timestamp('s', tz='UTC')))
+        elif name in dictionary_columns:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+class ParquetTouchWriter:
+    """
+    Same interface as touch_writer.TouchWriter, writing a parquet dataset.
+    Rows are buffered and written as one row group every FLUSH_EVERY rows.
+    @path, dataset directory; each writer adds one part file to it
+    @append, keep the existing parts, otherwise they are removed when the
+             new part is added
+    @dictionary_columns, @timestamp_columns, see schema_for
+    @staged, the part is only added by commit(); close() without it, or
+             leaving a with block on an exception, throws the part away
+    """
+
+    def __init__(self, path, header, fields=None, append=False,
+                 dictionary_columns=(), timestamp_columns=(), flush_every=FLUSH_EVERY,
+                 staged=False):
+        pa = _pyarrow()
+        os.makedirs(path, exist_ok=True)
+        # parts of writers that were killed before they finished
+        for tmp in glob.glob(os.path.join(path, '.part-*' + PARQUET_EXT + '.tmp')):
+            os.remove(tmp)
+        parts = sorted(glob.glob(os.path.join(path, 'part-*' + PARQUET_EXT)))
+        self.dataset = path
+        self.append_mode = append
+        self.staged = staged
+        self.path = os.path.join(path, 'part-{:05d}{}'.format(len(parts) if append else 0,
+                                                              PARQUET_EXT))
+        self.tmp_path = os.path.join(path, '.' + os.path.basename(self.path) + '.tmp')
+        self.header = list(header)
+        self.fields = fields
+        self.dictionary_columns = set(dictionary_columns)
+        self.timestamp_columns = set(timestamp_columns)
+        self.schema = schema_for(header, dictionary_columns, timestamp_columns)
+        self.flush_every = flush_every
+        self.count = 0
+        self.columns = [[] for _ in self.header]
+        self.writer = pa.parquet.ParquetWriter(self.tmp_path, self.schema, compression='zstd')
+
+    def append(self, row):
+        if self.fields is not None and isinstance(row, dict):
+            row = [row[k] for k in self.fields]
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        self.count += 1
+        if len(self.columns[0]) >= self.flush_every:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        self.writer.write_table(_table(self.header, self.columns,
+                                       self.dictionary_columns, self.timestamp_columns))
+        self.columns = [[] for _ in self.header]
+
+    def __len__(self):
+        return self.count
+
+    # Finish the part and add it to the dataset, replacing the old parts
+    # unless appending
+    def commit(self):
+        self.flush()
+        self.writer.close()
+        self.writer = None
+        if not self.append_mode:
+            for part in glob.glob(os.path.join(self.dataset, 'part-*' + PARQUET_EXT)):
+                os.remove(part)
+        os.replace(self.tmp_path, self.path)
+
+    def close(self):
+        if self.writer is None:
+            return
+        if not self.staged:
+            self.commit()
+            return
+        self.writer.close()
+        self.writer = None
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            # a failed run adds nothing to the dataset
+            self.staged = True
+        self.close()
+
+
+# Converts a touch csv to parquet (dataset directory) or feather (single file,
+# chosen by the .feather/.arrow extension), e.g. for data mined before this
+# format existed
+def convert_csv(csv_path, out_path, dictionary_columns=(), timestamp_columns=()):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if out_path.endswith(FEATHER_EXTS):
+            pa = _pyarrow()
+            columns = list(zip(*reader)) or [[] for _ in header]
+            table = _table(header, columns, dictionary_columns, timestamp_columns)
+            pa.feather.write_feather(table, out_path, compression='zstd')
+            return out_path
+        with ParquetTouchWriter(out_path, header, dictionary_columns=dictionary_columns,
+                                timestamp_columns=timestamp_columns) as writer:
+            writer.extend(reader)
+    return out_path
+
+
+# Typed arrow table from column lists of csv-style values
+def _table(header, columns, dictionary_columns, timestamp_columns):
+    pa = _pyarrow()
+    schema = schema_for(header, dictionary_columns, timestamp_columns)
+    arrays = []
+    for name, field, values in zip(header, schema, columns):
+        # csv has no nulls, an empty cell is a missing value (e.g. no GitHub login)
+        values = [v if v != '' else None for v in values]
+        if name in timestamp_columns:
+            arrays.append(pa.array([to_epoch(v) for v in values], field.type))
+        elif pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, pa.string()))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+# Loads touch data into a DataFrame. Feather files are memory mapped, parquet
+# datasets are read column by column, both come back with categorical
+# filename/author columns and datetime64[UTC] dates. A csv is parsed the old
+# way, with date_columns converted by pd.to_datetime.
+def load_touches(path, date_columns=()):
+    import pandas as pd
+    if path.endswith(FEATHER_EXTS):
+        pa = _pyarrow()
+        return pa.feather.read_table(path, memory_map=True).to_pandas()
+    if os.path.isdir(path) or path.endswith(PARQUET_EXT):
+        return pd.read_parquet(path)
+    df = pd.read_csv(path)
+    for column in date_columns:
+        df[column] = pd.to_datetime(df[column], errors="coerce", utc=True)
+    return df
+
+
+# First existing path of a columnar copy of csv_path (same name with a
+# .feather or .parquet extension), or csv_path itself
+def preferred_path(csv_path):
+    base = os.path.splitext(csv_path)[0]
+    for ext in FEATHER_EXTS + (PARQUET_EXT,):
+        if os.path.exists(base + ext):
+            return base + ext
+    return csv_path
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Convert a touch csv to parquet (directory) or feather (.feather file)')
+    parser.add_argument('csv_path')
+    parser.add_argument('out_path')
+    parser.add_argument('--dictionary', nargs='*', default=[],
+                        help='columns to dictionary encode, e.g. Filename AuthorLogin')
+    parser.add_argument('--timestamp', nargs='*', default=[],
+                        help='ISO 8601 date columns, e.g. CommitDate')
+    args = parser.parse_args()
+    print('Written to', convert_csv(args.csv_path, args.out_path, args.dictionary, args.timestamp))
@@ -0,0 +1,216 @@
+# Weekly aggregation cube over a touch log.
+# The plotting scripts used to bucket the raw touch rows into weeks each on
+# their own and recount the top/bottom files and authors on every run. The
+# cube folds the log once into (File, Author, Week) -> Touches, where Week is
+# the Monday (UTC) the week starts on, and is saved as a small csv next to
+# the log. update_cube() only reads what was added to the log since the cube
+# was saved (the csv tail, or new parquet part files), so an incremental
+# mining run is followed by an incremental cube update. Rows without a date
+# or file are left out and a missing author is counted as 'unknown'.
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+
+from touch_columnar import FEATHER_EXTS, PARQUET_EXT
+
+CUBE_COLUMNS = ['File', 'Author', 'Week', 'Touches']
+KEYS = CUBE_COLUMNS[:3]
+UNKNOWN_AUTHOR = 'unknown'
+CHUNK_ROWS = 100000
+# bytes just before the saved csv offset that must still match, otherwise the
+# log was rewritten rather than appended to and the cube is rebuilt
+TAIL_CHECK = 4096
+
+
+# <log>_cube.csv and its <log>_cube.json state file
+def cube_paths(log_path):
+    base = os.path.splitext(log_path.rstrip('/' + os.sep))[0]
+    return base + '_cube.csv', base + '_cube.json'
+
+
+# Monday 00:00 UTC of the week each date falls in, as naive timestamps
+def week_start(dates):
+    days = pd.to_datetime(dates, errors='coerce', utc=True).dt.tz_convert(None).dt.normalize()
+    return (days - pd.to_timedelta(days.dt.dayofweek, unit='D')).astype('datetime64[ns]')
+
+
+# Raw touch rows -> cube rows, in order of first appearance
+def aggregate(df, file_col, author_col, date_col):
+    rows = pd.DataFrame({
+        'File': df[file_col].astype(object),
+        'Author': df[author_col].astype(object).fillna(UNKNOWN_AUTHOR).astype(str),
+        'Week': week_start(df[date_col]),
+    })
+    rows = rows.dropna(subset=['File', 'Week'])
+    rows['File'] = rows['File'].astype(str)
+    return rows.groupby(KEYS, sort=False).size().rename('Touches').reset_index()
+
+
+def merge(cube, added):
+    if cube is None or cube.empty:
+        return added
+    if added.empty:
+        return cube
+    merged = pd.concat([cube, added], ignore_index=True)
+    return merged.groupby(KEYS, sort=False, as_index=False)['Touches'].sum()
+
+
+def empty_cube():
+    return pd.DataFrame({'File': pd.Series(dtype=object), 'Author': pd.Series(dtype=object),
+                         'Week': pd.Series(dtype='datetime64[ns]'),
+                         'Touches': pd.Series(dtype='int64')})
+
+
+def load_cube(cube_path):
+    if not os.path.exists(cube_path):
+        return empty_cube()
+    # logins such as 'NA' or 'null' are names here, not missing values
+    cube = pd.read_csv(cube_path, dtype={'File': str, 'Author': str, 'Touches': 'int64'},
+                       keep_default_na=False)
+    cube['Week'] = pd.to_datetime(cube['Week']).astype('datetime64[ns]')
+    return cube
+
+
+def save_cube(cube, state, cube_path, state_path):
+    os.makedirs(os.path.dirname(cube_path) or '.', exist_ok=True)
+    # temp files first so a crash never leaves a cube out of step with its state
+    cube.to_csv(cube_path + '.tmp', index=False, date_format='%Y-%m-%d')
+    with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(cube_path + '.tmp', cube_path)
+    os.replace(state_path + '.tmp', state_path)
+
+
+def _tail_digest(f, offset):
+    start = max(0, offset - TAIL_CHECK)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+# Aggregates the csv rows after state['offset'] (every row for a new state).
+# A partly written last line is left for the next update.
+def _read_csv_log(path, state, columns):
+    with open(path, 'rb') as f:
+        header = f.readline()
+        offset = state.get('offset', 0)
+        resume = (offset >= len(header) and state.get('header') == header.decode('utf-8')
+                  and offset <= os.path.getsize(path)
+                  and state.get('tail') == _tail_digest(f, offset))
+        if not resume:
+            offset = len(header)
+        f.seek(offset)
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        data = data[:end]
+        offset += end
+        new_state = {'header': header.decode('utf-8'), 'offset': offset,
+                     'tail': _tail_digest(f, offset)}
+
+    names = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    added = empty_cube()
+    if data.strip():
+        for chunk in pd.read_csv(io.BytesIO(data), names=list(names), header=None,
+                                 usecols=list(columns), chunksize=CHUNK_ROWS):
+            added = merge(added, aggregate(chunk, *columns))
+    return resume, added, new_state
+
+
+# Size and mtime of a file, to tell a rewritten one from the one seen before
+def _fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# Parquet datasets grow by part files: only parts not seen before are read.
+# A rewrite without append reuses the part names, so the cube is rebuilt when
+# a part seen before is gone or no longer has the same fingerprint.
+def _read_parquet_log(path, state, columns):
+    if os.path.isdir(path):
+        names = sorted(p for p in os.listdir(path) if p.endswith(PARQUET_EXT))
+    else:
+        path, names = os.path.dirname(path), [os.path.basename(path)]
+    parts = {name: _fingerprint(os.path.join(path, name)) for name in names}
+    seen = state.get('parts', {})
+    resume = isinstance(seen, dict) and all(parts.get(name) == fp for name, fp in seen.items())
+    added = empty_cube()
+    for name in names:
+        if resume and name in seen:
+            continue
+        df = pd.read_parquet(os.path.join(path, name), columns=list(columns))
+        added = merge(added, aggregate(df, *columns))
+    return resume, added, {'parts': parts}
+
+
+# A feather file is rewritten as a whole: rebuild when it changed
+def _read_feather_log(path, state, columns):
+    stat = os.stat(path)
+    new_state = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if state.get('size') == stat.st_size and state.get('mtime_ns') == stat.st_mtime_ns:
+        return True, empty_cube(), new_state
+    df = pd.read_feather(path, columns=list(columns))
+    return False, aggregate(df, *columns), new_state
+
+
+def update_cube(log_path, file_col, author_col, date_col, cube_path=None):
+    """
+    Brings the cube of @log_path up to date and returns it.
+    @file_col, @author_col, @date_col, column names in the log
+    @cube_path, where to keep the cube, defaults to <log>_cube.csv
+    """
+    default_cube, state_path = cube_paths(log_path)
+    if cube_path is None:
+        cube_path = default_cube
+    else:
+        state_path = os.path.splitext(cube_path)[0] + '.json'
+
+    state = {}
+    if os.path.exists(state_path) and os.path.exists(cube_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+    columns = (file_col, author_col, date_col)
+    if state.get('columns') != list(columns):
+        state = {}
+
+    if log_path.endswith(FEATHER_EXTS):
+        resume, added, source = _read_feather_log(log_path, state.get('source', {}), columns)
+    elif os.path.isdir(log_path) or log_path.endswith(PARQUET_EXT):
+        resume, added, source = _read_parquet_log(log_path, state.get('source', {}), columns)
+    else:
+        resume, added, source = _read_csv_log(log_path, state.get('source', {}), columns)
+
+    cube = merge(load_cube(cube_path), added) if resume and state else added
+    save_cube(cube, {'columns': list(columns), 'source': source}, cube_path, state_path)
+    return cube
+
+
+# Touches per value of @by ('File' or 'Author'), most touched first, ties in
+# order of first appearance like Series.value_counts. @key maps the values
+# first, e.g. os.path.basename to rank files by short name.
+def ranked(cube, by, key=None):
+    values = cube[by] if key is None else cube[by].map(key)
+    totals = cube['Touches'].groupby(values, sort=False).sum()
+    return totals.sort_values(ascending=False, kind='stable')
+
+
+# One row per touch again (File, Author, Week), for scatter plots
+def touch_points(cube, files=None):
+    if files is not None:
+        cube = cube[cube['File'].isin(files)]
+    return cube.loc[cube.index.repeat(cube['Touches']), KEYS].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build or update the weekly cube of a touch log')
+    parser.add_argument('log_path')
+    parser.add_argument('--file-col', default='Filename')
+    parser.add_argument('--author-col', default='AuthorLogin')
+    parser.add_argument('--date-col', default='CommitDate')
+    parser.add_argument('--top', type=int, default=10, help='print the N most touched files')
+    args = parser.parse_args()
+    cube = update_cube(args.log_path, args.file_col, args.author_col, args.date_col)
+    print('{} cube rows, {} touches'.format(len(cube), cube['Touches'].sum()))
+    print(ranked(cube, 'File').head(args.top).to_string())
@@ -0,0 +1,97 @@
+# Density rendering for weeks-vs-files plots of large touch logs.
+# Drawing one marker per touch gets slow and unreadable past a few hundred
+# thousand touches. Here the touches are binned into a week x file grid
+# instead: each cell is painted in the color of the author with the most
+# touches in it, more opaque the more touches it holds, and the grid is
+# drawn as a single image. Drawing cost depends on the grid size only, and
+# the grid is capped at MAX_WEEK_BINS x MAX_FILE_BINS cells.
+import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.patches import Patch
+
+MAX_WEEK_BINS = 2000
+MAX_FILE_BINS = 2000
+# plots above this many touches switch to density in 'auto' mode
+DENSITY_MIN_TOUCHES = 100000
+MIN_ALPHA = 0.25
+# density plots only label the files on the y axis up to this many
+MAX_FILE_LABELS = 200
+
+
+def use_density(mode, touches):
+    if mode == 'auto':
+        return touches > DENSITY_MIN_TOUCHES
+    return mode == 'density'
+
+
+def _bin(values, count, max_bins):
+    if count <= max_bins:
+        return values, count
+    return values * max_bins // count, max_bins
+
+
+def dominant_author_grid(weeks, files, authors, n_weeks, n_files, n_authors, weights=None):
+    """
+    Bins touches into a week x file grid.
+    @weeks, @files, @authors, integer arrays, one entry per touch
+    @n_weeks, @n_files, @n_authors, number of distinct values of each
+    @weights, touches each entry stands for, e.g. the Touches of cube rows;
+              one per entry when None
+    Returns (touches, dominant) arrays of shape (file bins, week bins);
+    dominant is the index of the author with most touches in the cell,
+    -1 for empty cells.
+    """
+    weeks, week_bins = _bin(np.asarray(weeks, dtype=np.int64), n_weeks, MAX_WEEK_BINS)
+    files, file_bins = _bin(np.asarray(files, dtype=np.int64), n_files, MAX_FILE_BINS)
+    authors = np.asarray(authors, dtype=np.int64)
+    cell = files * week_bins + weeks
+
+    # touches per (cell, author), the last entry per cell after sorting by
+    # count is its dominant author
+    if weights is None:
+        touches = np.bincount(cell, minlength=file_bins * week_bins)
+        keys, counts = np.unique(cell * n_authors + authors, return_counts=True)
+    else:
+        weights = np.asarray(weights, dtype=np.int64)
+        touches = np.zeros(file_bins * week_bins, dtype=np.int64)
+        np.add.at(touches, cell, weights)
+        keys, inverse = np.unique(cell * n_authors + authors, return_inverse=True)
+        counts = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(counts, inverse.ravel(), weights)
+    order = np.lexsort((counts, keys // n_authors))
+    keys = keys[order]
+    last = np.append(keys[1:] // n_authors != keys[:-1] // n_authors, True)
+    dominant = np.full(file_bins * week_bins, -1, dtype=np.int64)
+    dominant[keys[last] // n_authors] = keys[last] % n_authors
+    shape = (file_bins, week_bins)
+    return touches.reshape(shape), dominant.reshape(shape)
+
+
+# RGBA image of the grid, alpha grows with log(touches)
+def grid_image(touches, dominant, author_colors):
+    palette = np.array([to_rgba(c) for c in author_colors])
+    image = np.zeros(touches.shape + (4,))
+    filled = dominant >= 0
+    image[filled] = palette[dominant[filled]]
+    scale = np.log1p(touches) / np.log1p(max(touches.max(), 1))
+    image[..., 3] = np.where(filled, MIN_ALPHA + (1 - MIN_ALPHA) * scale, 0)
+    return image
+
+
+def draw_density(ax, weeks, files, authors, n_weeks, n_files, author_colors, weights=None):
+    """
+    Draws the weeks (x) vs files (y) grid on @ax, file i is centered on y=i
+    and week w on x=w like the scatter version.
+    @author_colors, color of each author index
+    @weights, see dominant_author_grid
+    """
+    touches, dominant = dominant_author_grid(weeks, files, authors,
+                                             n_weeks, n_files, len(author_colors), weights)
+    ax.imshow(grid_image(touches, dominant, author_colors), origin='lower',
+              aspect='auto', interpolation='nearest',
+              extent=(-0.5, n_weeks - 0.5, -0.5, n_files - 0.5))
+
+
+# Legend entries for the author colors, the density image has no artists per author
+def author_patches(author_names, author_colors):
+    return [Patch(color=color, label=name) for name, color in zip(author_names, author_colors)]
@@ -0,0 +1,99 @@
+# Streaming CSV output for the touch collectors.
+# The collectors used to keep every touch in a list and only write the csv
+# once the whole crawl was done. A TouchWriter is passed to them in place of
+# that list: every append goes straight to the file, which is flushed every
+# FLUSH_EVERY rows or FLUSH_SECONDS seconds, so memory stays flat and a
+# crashed or interrupted run still leaves the rows mined so far on disk.
+# A staged writer (staged=True) streams to <path>.part instead and only
+# moves the rows into path on commit(), so a run whose progress is not yet
+# checkpointed (see Richard_authorsFileTouches.py) never leaves rows
+# in the output that the next run would write again.
+import csv
+import os
+import shutil
+import time
+
+FLUSH_EVERY = 1000
+FLUSH_SECONDS = 5.0
+
+
+class TouchWriter:
+    """
+    List-like csv sink: append(row) writes the row right away.
+    @path, output csv, its directory is created if needed
+    @header, header row, only written when the file is (re)created
+    @fields, keys to pick from dict rows, in header order; list rows are
+             written as they are
+    @append, add rows to an existing file instead of truncating it
+    @staged, write to <path>.part, path is only changed by commit()
+    """
+
+    def __init__(self, path, header, fields=None, append=False,
+                 flush_every=FLUSH_EVERY, flush_seconds=FLUSH_SECONDS, staged=False):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        append = append and os.path.exists(path)
+        self.path = path
+        self.fields = fields
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.count = 0
+        self.append_mode = append
+        self.part_path = path + '.part' if staged else None
+        if staged:
+            # the part of an earlier run that never committed is started over
+            self.file = open(self.part_path, 'w', newline='', encoding='utf-8')
+        else:
+            self.file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if staged or not append:
+            self.writer.writerow(header)
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def append(self, row):
+        if self.fields is not None and isinstance(row, dict):
+            row = [row[k] for k in self.fields]
+        self.writer.writerow(row)
+        self.count += 1
+        self._unflushed += 1
+        if (self._unflushed >= self.flush_every
+                or time.monotonic() - self._flushed_at >= self.flush_seconds):
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        self.file.flush()
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def __len__(self):
+        return self.count
+
+    # Staged writer: move the rows written so far into path, after the rows
+    # already there in append mode, and close the writer
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.close()
+        if not self.append_mode:
+            os.replace(self.part_path, self.path)
+            return
+        with open(self.part_path, 'rb') as part, open(self.path, 'ab') as out:
+            part.readline()  # header
+            shutil.copyfileobj(part, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.remove(self.part_path)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,13 +1,32 @@
 """
 Counter API Implementation
 """
+import atexit
+import os
 from flask import Flask, jsonify
 from . import status
+from .counter_log import CounterLog
 
 app = Flask(__name__)
 
 COUNTERS = {}
 
+# Persistence is on when COUNTER_DATA_DIR names a directory for the log and
+# snapshots, COUNTER_DURABILITY picks the fsync mode (see counter_log.py)
+LOG = None
+if os.environ.get("COUNTER_DATA_DIR"):
+    LOG = CounterLog(os.environ["COUNTER_DATA_DIR"],
+                     durability=os.environ.get("COUNTER_DURABILITY", "interval"))
+    COUNTERS.update(LOG.open())
+    # dict.copy() runs without releasing the GIL, so the copy is never torn
+    LOG.attach(COUNTERS.copy)
+    atexit.register(LOG.close)
+
+def save_counter(name):
+    """Log the current value of a counter when persistence is on"""
+    if LOG is not None:
+        LOG.commit(LOG.append("put", name, COUNTERS[name]))
+
 def counter_exists(name):
   """Check if counter exists"""
   return name in COUNTERS
@@ -22,6 +41,7 @@ def create_counter(name):
     if counter_exists(name):
         return jsonify({"error": f"Counter {name} already exists"}), status.HTTP_409_CONFLICT
     COUNTERS[name] = 0
+    save_counter(name)
     return jsonify({name: COUNTERS[name]}), status.HTTP_201_CREATED
 
 @app.route('/counters/<name>', methods=['GET'])
@@ -0,0 +1,198 @@
+"""
+Durable Counter Persistence
+
+A write-ahead log plus snapshots that let counters survive a restart.
+
+Every change is appended to the log as the state it leaves behind:
+    [seq, "put", name, value]   the counter now holds value
+    [seq, "del", name]          the counter is gone
+    [seq, "clear"]              every counter is gone
+Replaying such records is idempotent, so a snapshot may be copied while
+changes keep coming in: records newer than the snapshot are replayed over it
+and simply restate whatever the copy already saw.
+
+Records are buffered in memory and written out in groups, so durability costs
+one fsync per group instead of one per change:
+    "interval"  a background thread writes and fsyncs every fsync_interval
+                seconds; a crash loses at most that much (the default)
+    "group"     commit() waits until the record is fsynced, callers arriving
+                during an fsync share the next one
+    "off"       records are written without fsync, for tests and benchmarks
+
+The log is split into segments named after their first seq. Once enough
+records pile up, the background thread writes a snapshot and deletes the
+segments it covers, so recovery reads one snapshot plus a short log tail.
+"""
+import json
+import os
+import threading
+
+DURABILITY_MODES = ("interval", "group", "off")
+FSYNC_INTERVAL = 0.05
+SNAPSHOT_EVERY = 100000
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PREFIX = "log-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class CounterLog:
+    """Append-only, group-committed log of counter changes with snapshots"""
+
+    def __init__(self, directory, durability="interval", fsync_interval=FSYNC_INTERVAL,
+                 snapshot_every=SNAPSHOT_EVERY):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {', '.join(DURABILITY_MODES)}")
+        self.directory = directory
+        self.durability = durability
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        # lock guards seq and pending, io_lock the files; io_lock comes first
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.seq = 0
+        self.durable_seq = 0
+        self.snapshot_seq = 0
+        self.pending = []
+        self.file = None
+        self.source = None
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _segments(self):
+        """(first seq, path) of every log segment, oldest first"""
+        segments = []
+        for entry in os.listdir(self.directory):
+            if entry.startswith(SEGMENT_PREFIX) and entry.endswith(SEGMENT_SUFFIX):
+                first = int(entry[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                segments.append((first, os.path.join(self.directory, entry)))
+        return sorted(segments)
+
+    def _open_segment(self, first):
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first:020d}{SEGMENT_SUFFIX}")
+        self.file = open(path, "a", encoding="utf-8")
+
+    def open(self):
+        """Recover the counters from the snapshot and the log, then start logging"""
+        os.makedirs(self.directory, exist_ok=True)
+        counters = {}
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            counters = snapshot["counters"]
+            self.seq = self.snapshot_seq = snapshot["seq"]
+        for _, path in self._segments():
+            good = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated record")
+                        record = json.loads(line)
+                    except ValueError:
+                        # a record cut short by a crash, nothing after it was acknowledged
+                        break
+                    good += len(line)
+                    if record[0] <= self.snapshot_seq:
+                        continue
+                    apply_record(counters, record)
+                    self.seq = max(self.seq, record[0])
+            if good < os.path.getsize(path):
+                # drop the torn tail: the next segment may be this very file
+                # (when the torn record was its first), and records appended
+                # after a torn line would be lost with it on the next recovery
+                os.truncate(path, good)
+        self.durable_seq = self.seq
+        self._open_segment(self.seq + 1)
+        if self.durability != "group" or self.snapshot_every:
+            self._flusher = threading.Thread(target=self._run, daemon=True)
+            self._flusher.start()
+        return counters
+
+    def attach(self, source):
+        """Set the function returning a dict of all counters, used for snapshots"""
+        self.source = source
+
+    def append(self, *change):
+        """Buffer a change record, returns its seq for commit()"""
+        with self.lock:
+            self.seq += 1
+            self.pending.append(json.dumps([self.seq, *change], separators=(",", ":")) + "\n")
+            return self.seq
+
+    def commit(self, seq):
+        """In "group" mode, wait until the record seq is on disk"""
+        if self.durability == "group" and seq:
+            self.flush(seq)
+
+    def flush(self, seq=None):
+        """Write (and fsync) the buffered records; with seq, stop early once it is durable"""
+        with self.io_lock:
+            # whoever held io_lock before may already have written this record
+            if seq is not None and self.durable_seq >= seq:
+                return
+            self._write_pending()
+
+    def _write_pending(self):
+        """Write the buffered records to the current segment (io_lock held)"""
+        with self.lock:
+            lines, self.pending = self.pending, []
+            target = self.seq
+        if lines:
+            self.file.write("".join(lines))
+            self.file.flush()
+            if self.durability != "off":
+                os.fsync(self.file.fileno())
+        self.durable_seq = target
+        return target
+
+    def snapshot(self):
+        """Write a snapshot of the attached counters and drop the log segments it covers"""
+        with self.io_lock:
+            # every record up to covered goes into the segments being retired
+            covered = self._write_pending()
+            self.file.close()
+            self._open_segment(covered + 1)
+        counters = self.source()
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"seq": covered, "counters": counters}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self.snapshot_seq = covered
+        for first, segment in self._segments():
+            if first <= covered:
+                os.remove(segment)
+
+    def _run(self):
+        interval = self.fsync_interval if self.durability != "group" else 1.0
+        while not self._stop.wait(interval):
+            if self.durability != "group":
+                self.flush()
+            if (self.source is not None and self.snapshot_every
+                    and self.seq - self.snapshot_seq >= self.snapshot_every):
+                self.snapshot()
+
+    def close(self):
+        """Stop the background thread and write out everything still buffered"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self.io_lock:
+            if self.file is not None and not self.file.closed:
+                self._write_pending()
+                self.file.close()
+
+
+def apply_record(counters, record):
+    """Replay one log record onto a dict of counters"""
+    change = record[1]
+    if change == "put":
+        counters[record[2]] = record[3]
+    elif change == "del":
+        counters.pop(record[2], None)
+    elif change == "clear":
+        counters.clear()
+    else:
+        raise ValueError(f"Unknown log record {record!r}")
@@ -0,0 +1,68 @@
+"""
+Test Cases for Counter Persistence
+"""
+import os
+import pytest
+from src import counter
+from src.counter_log import CounterLog
+
+
+@pytest.fixture()
+def client():
+    """Fixture for Flask test client"""
+    return counter.app.test_client()
+
+
+class TestCounterLog:
+    """Test cases for the counter log"""
+
+    def test_created_counters_survive_restart(self, client, tmp_path, monkeypatch):
+        """It should recover counters created through the API"""
+        log = CounterLog(tmp_path, durability="group")
+        monkeypatch.setattr(counter, "COUNTERS", log.open())
+        monkeypatch.setattr(counter, "LOG", log)
+        client.post('/counters/saved1')
+        client.post('/counters/saved2')
+        log.close()
+
+        recovered = CounterLog(tmp_path)
+        assert recovered.open() == {"saved1": 0, "saved2": 0}
+        recovered.close()
+
+    def test_snapshot_and_torn_record(self, tmp_path):
+        """It should recover from a snapshot plus the log, up to a torn record"""
+        counters = {}
+        log = CounterLog(tmp_path, durability="off", snapshot_every=0)
+        log.open()
+        log.attach(counters.copy)
+        counters["a"] = 1
+        log.append("put", "a", 1)
+        log.snapshot()
+        counters["b"] = 2
+        log.append("put", "b", 2)
+        log.append("del", "a")
+        log.close()
+        segment = sorted(f for f in os.listdir(tmp_path) if f.startswith("log-"))[-1]
+        with open(tmp_path / segment, "a", encoding="utf-8") as f:
+            f.write('[9,"clear"')
+
+        recovered = CounterLog(tmp_path)
+        assert recovered.open() == {"b": 2}
+        recovered.close()
+
+    def test_torn_first_record_of_a_segment(self, tmp_path):
+        """It should keep records logged after a torn record that started its segment"""
+        log = CounterLog(tmp_path, durability="group", snapshot_every=0)
+        log.open()
+        log.commit(log.append("put", "a", 1))
+        log.close()
+        with open(tmp_path / f"log-{2:020d}.jsonl", "w", encoding="utf-8") as f:
+            f.write('[2,"put","a",9')
+
+        recovered = CounterLog(tmp_path, durability="group", snapshot_every=0)
+        assert recovered.open() == {"a": 1}
+        recovered.commit(recovered.append("put", "b", 42))
+        recovered.close()
+        again = CounterLog(tmp_path)
+        assert again.open() == {"a": 1, "b": 42}
+        again.close()